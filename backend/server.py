@@ -1,21 +1,44 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, File, UploadFile, Form
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, File, UploadFile, Form, Query, Request, WebSocket, WebSocketDisconnect
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.responses import Response, StreamingResponse
+from fastapi.encoders import jsonable_encoder
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import CursorType, ReturnDocument, InsertOne, UpdateOne, DeleteOne
+from pymongo.errors import DuplicateKeyError, BulkWriteError, PyMongoError
 import os
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, Field, ValidationError
+from typing import List, Optional, Dict, Any, AsyncIterator
 import uuid
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+import calendar
 import jwt
 import bcrypt
 import requests
+import httpx
 import json
 import base64
+import gzip
 import asyncio
+import hashlib
+import hmac
+import itertools
+import time
+import re
+import unicodedata
+from array import array
+from functools import lru_cache
+from contextlib import asynccontextmanager
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from PIL import Image, ImageOps
+import numpy as np
+from cachetools import LRUCache, TTLCache
+import msgpack
 from emergentintegrations.llm.chat import LlmChat, UserMessage, ImageContent
 
 ROOT_DIR = Path(__file__).parent
@@ -39,6 +62,9 @@ JOIN_CODE = os.environ.get('JOIN_CODE', 'GROW2024')
 
 # LLM Integration
 EMERGENT_LLM_KEY = 'sk-emergent-13f73B6A44a8cEd496'
+AI_BACKEND = os.environ.get('AI_BACKEND', 'emergent')  # emergent, litellm, fake
+AI_MODEL = os.environ.get('AI_MODEL', 'gpt-4o-mini')
+PLANT_EXPERT_SYSTEM_MESSAGE = "You are an expert gardener helping allotment holders with plant care advice. Provide practical, actionable advice in a friendly tone. Include specific steps they can take."
 
 # Models
 class User(BaseModel):
@@ -75,6 +101,9 @@ class DiaryEntry(BaseModel):
     weather: Optional[str] = None
     tags: List[str] = []
 
+class DiaryEntryView(DiaryEntry):
+    weather_context: Optional[Dict[str, Any]] = None  # recorded conditions on the day, derived on read
+
 class DiaryEntryCreate(BaseModel):
     plot_number: str
     entry_type: str
@@ -83,6 +112,32 @@ class DiaryEntryCreate(BaseModel):
     photos: List[str] = []
     tags: List[str] = []
 
+class DiaryEntryUpdate(BaseModel):
+    plot_number: Optional[str] = None
+    entry_type: Optional[str] = None
+    title: Optional[str] = None
+    content: Optional[str] = None
+    photos: Optional[List[str]] = None
+    tags: Optional[List[str]] = None
+
+class TagCount(BaseModel):
+    tag: str
+    count: int
+
+class EventRecurrence(BaseModel):
+    freq: str  # daily, weekly, monthly
+    interval: int = 1
+    until: Optional[datetime] = None
+    count: Optional[int] = None
+
+class EventException(BaseModel):
+    occurrence: datetime  # original start of the occurrence being changed
+    cancelled: bool = False
+    title: Optional[str] = None
+    description: Optional[str] = None
+    date: Optional[datetime] = None
+    location: Optional[str] = None
+
 class Event(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     title: str
@@ -94,6 +149,10 @@ class Event(BaseModel):
     created_by: str
     rsvp_list: List[str] = []
     comments: List[Dict[str, Any]] = []
+    recurrence: Optional[EventRecurrence] = None
+    recurrence_end: Optional[datetime] = None  # start of the last occurrence, None if open-ended
+    exceptions: List[EventException] = []
+    occurrence_start: Optional[datetime] = None  # set on occurrences expanded from a recurring event
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 class EventCreate(BaseModel):
@@ -103,6 +162,7 @@ class EventCreate(BaseModel):
     location: str
     bring_list: List[str] = []
     cover_photo: Optional[str] = None
+    recurrence: Optional[EventRecurrence] = None
 
 class CommunityPost(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -110,16 +170,42 @@ class CommunityPost(BaseModel):
     username: str
     content: str
     photos: List[str] = []
-    reactions: Dict[str, List[str]] = {}  # reaction_type: [user_ids]
+    reaction_counts: Dict[str, int] = {}  # reaction_type: count
     comments: List[Dict[str, Any]] = []
     is_pinned: bool = False
     is_announcement: bool = False
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
+class CommunityPostView(CommunityPost):
+    my_reactions: List[str] = []  # reaction types used by the requesting user
+
 class PostCreate(BaseModel):
     content: str
     photos: List[str] = []
 
+class CommentCreate(BaseModel):
+    content: str
+
+class PostFeatureUpdate(BaseModel):
+    is_pinned: Optional[bool] = None
+    is_announcement: Optional[bool] = None
+
+class FeedPage(BaseModel):
+    posts: List[CommunityPostView]
+    next_cursor: Optional[str] = None
+
+REACTION_TYPES = {"like", "love", "helpful"}
+
+class PostReaction(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    post_id: str
+    user_id: str
+    reaction_type: str
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class ReactionToggle(BaseModel):
+    reaction_type: str
+
 class Task(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     title: str
@@ -151,6 +237,19 @@ class Plant(BaseModel):
     planting_guide: Dict[str, Any] = {}
     harvest_info: Dict[str, Any] = {}
     common_issues: List[str] = []
+    aliases: List[str] = []  # common alternative names, e.g. "toms", "courgette"
+    image_url: Optional[str] = None
+
+class PlantCreate(BaseModel):
+    name: str
+    scientific_name: Optional[str] = None
+    category: str
+    description: str
+    care_instructions: Dict[str, Any] = {}
+    planting_guide: Dict[str, Any] = {}
+    harvest_info: Dict[str, Any] = {}
+    common_issues: List[str] = []
+    aliases: List[str] = []
     image_url: Optional[str] = None
 
 class AIQueryRequest(BaseModel):
@@ -158,6 +257,23 @@ class AIQueryRequest(BaseModel):
     question: str
     photo_base64: Optional[str] = None
 
+class AIAdviceJob(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    user_id: str
+    status: str = "queued"  # queued, running, done, failed
+    plant_name: Optional[str] = None
+    question: str
+    photo_base64: Optional[str] = None  # preprocessed; dropped once the job finishes
+    photo_hash: Optional[str] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    attempts: int = 0
+    available_at: datetime = Field(default_factory=datetime.utcnow)
+    lease_until: Optional[datetime] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
 # Plot Inspections Models
 class Plot(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -255,6 +371,109 @@ class DocumentUpload(BaseModel):
     mime_type: Optional[str] = None
     expires_at: Optional[str] = None
 
+# Chat Models
+class ChatRoom(BaseModel):
+    id: str
+    kind: str  # site, event, direct
+    name: str
+    event_id: Optional[str] = None
+    member_ids: List[str] = []  # only used by direct rooms
+    last_message_at: Optional[datetime] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class ChatMessage(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    room_id: str
+    user_id: str
+    username: str
+    content: str
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class ChatMessageCreate(BaseModel):
+    content: str
+
+class DirectRoomCreate(BaseModel):
+    user_id: str
+
+class ChatReadUpdate(BaseModel):
+    last_read_at: datetime
+
+class ChatHistoryPage(BaseModel):
+    messages: List[ChatMessage]
+    next_cursor: Optional[str] = None
+
+# Offline Sync Models
+class SyncMutation(BaseModel):
+    idempotency_key: str  # generated by the client when the mutation is queued
+    type: str  # diary.create, post.create, task.create, inspection.create, event.rsvp
+    payload: Dict[str, Any] = {}
+
+class SyncMutationBatch(BaseModel):
+    mutations: List[SyncMutation]
+
+class SyncMutationResult(BaseModel):
+    idempotency_key: str
+    status: str  # applied, duplicate, in_progress, rejected, failed
+    status_code: int
+    data: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+class SyncMutationResponse(BaseModel):
+    results: List[SyncMutationResult]
+
+# Response encoding
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+
+def accepts_msgpack(request: Request) -> bool:
+    """True when the Accept header prefers MessagePack to JSON; JSON stays the default"""
+    msgpack_q = json_q = 0.0
+    for media_range in request.headers.get("accept", "").split(","):
+        media_type, _, params = media_range.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        media_type = media_type.strip().lower()
+        if media_type in MSGPACK_MEDIA_TYPES:
+            msgpack_q = max(msgpack_q, quality)
+        elif media_type in ("application/json", "application/*", "*/*"):
+            json_q = max(json_q, quality)
+    return msgpack_q > 0 and msgpack_q >= json_q
+
+def msgpack_default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.dict()
+    if isinstance(value, datetime):
+        # Stored datetimes are naive UTC
+        return msgpack.Timestamp.from_datetime(value if value.tzinfo else value.replace(tzinfo=timezone.utc))
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+def packb(content: Any) -> bytes:
+    return msgpack.packb(content, default=msgpack_default, use_bin_type=True, datetime=False)
+
+class NegotiatedResponse(Response):
+    """JSON by default, MessagePack for clients that ask for it; MessagePack datetimes are native timestamps.
+
+    Endpoints return it directly, so their response_model only documents the shape.
+    """
+    def __init__(self, request: Request, content: Any, status_code: int = 200, headers: Optional[Dict[str, str]] = None):
+        self.use_msgpack = accepts_msgpack(request)
+        super().__init__(content, status_code, headers, MSGPACK_MEDIA_TYPES[0] if self.use_msgpack else "application/json")
+        self.headers["Vary"] = "Accept"
+    
+    def render(self, content: Any) -> bytes:
+        if self.use_msgpack:
+            return packb(content)
+        return json.dumps(jsonable_encoder(content), ensure_ascii=False, separators=(",", ":")).encode('utf-8')
+
 # Inspection utilities
 def calculate_inspection_score(use_status: str, upkeep: str) -> int:
     """Calculate inspection score based on use status and upkeep"""
@@ -272,6 +491,1317 @@ def calculate_inspection_score(use_status: str, upkeep: str) -> int:
     
     return use_points.get(use_status, 0) + upkeep_points.get(upkeep, 0)
 
+# Event recurrence utilities
+RECURRENCE_FREQUENCIES = {"daily", "weekly", "monthly"}
+RECURRENCE_MAX_COUNT = 1000
+DEFAULT_EVENT_WINDOW_DAYS = 90
+
+def to_utc_naive(value: Optional[datetime]) -> Optional[datetime]:
+    """Normalise to the naive UTC datetimes MongoDB hands back"""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+def nth_occurrence(start: datetime, recurrence: EventRecurrence, n: int) -> Optional[datetime]:
+    """Start of the nth occurrence, or None if it falls on a day the month doesn't have"""
+    if recurrence.freq == "daily":
+        return start + timedelta(days=n * recurrence.interval)
+    if recurrence.freq == "weekly":
+        return start + timedelta(weeks=n * recurrence.interval)
+    months = start.month - 1 + n * recurrence.interval
+    year, month = start.year + months // 12, months % 12 + 1
+    if start.day > calendar.monthrange(year, month)[1]:
+        return None
+    return start.replace(year=year, month=month)
+
+def first_index_on_or_after(start: datetime, recurrence: EventRecurrence, moment: datetime) -> int:
+    """Smallest occurrence index whose start can be >= moment, without walking the series"""
+    if moment <= start:
+        return 0
+    if recurrence.freq == "monthly":
+        months = (moment.year - start.year) * 12 + moment.month - start.month
+        return max(0, months // recurrence.interval - 1)
+    step = timedelta(days=recurrence.interval) if recurrence.freq == "daily" else timedelta(weeks=recurrence.interval)
+    return (moment - start) // step
+
+def occurrence_starts(start: datetime, recurrence: EventRecurrence, window_start: datetime, window_end: datetime):
+    """Yield original occurrence starts within [window_start, window_end)"""
+    until = to_utc_naive(recurrence.until)
+    if recurrence.count is not None and recurrence.freq == "monthly" and start.day > 28:
+        # As in RFC 5545, COUNT only counts real occurrences, so months without the day can't be skipped over blind
+        n = emitted = 0
+    else:
+        n = emitted = first_index_on_or_after(start, recurrence, window_start)
+    while recurrence.count is None or emitted < recurrence.count:
+        occurrence = nth_occurrence(start, recurrence, n)
+        n += 1
+        if occurrence is None:
+            continue
+        emitted += 1
+        if occurrence >= window_end or (until and occurrence > until):
+            return
+        if occurrence >= window_start:
+            yield occurrence
+
+def calculate_recurrence_end(start: datetime, recurrence: EventRecurrence) -> Optional[datetime]:
+    if recurrence.until:
+        return to_utc_naive(recurrence.until)
+    if recurrence.count:
+        last, n, emitted = None, 0, 0
+        while emitted < recurrence.count:
+            occurrence = nth_occurrence(start, recurrence, n)
+            n += 1
+            if occurrence is not None:
+                last, emitted = occurrence, emitted + 1
+        return last
+    return None
+
+def expand_event(event: Dict[str, Any], window_start: datetime, window_end: datetime) -> List[Dict[str, Any]]:
+    """Expand a stored recurring event into its occurrences within the window"""
+    recurrence = EventRecurrence(**event["recurrence"])
+    exceptions = {to_utc_naive(exc["occurrence"]): exc for exc in event.get("exceptions", [])}
+    
+    def build(occurrence: datetime, exception: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        instance = {**event, "date": occurrence, "occurrence_start": occurrence, "exceptions": []}
+        if exception:
+            for field in ("title", "description", "date", "location"):
+                if exception.get(field) is not None:
+                    instance[field] = to_utc_naive(exception[field]) if field == "date" else exception[field]
+        return instance
+    
+    occurrences = []
+    for occurrence in occurrence_starts(event["date"], recurrence, window_start, window_end):
+        exception = exceptions.pop(occurrence, None)
+        if exception and exception.get("cancelled"):
+            continue
+        instance = build(occurrence, exception)
+        if window_start <= instance["date"] < window_end:
+            occurrences.append(instance)
+    
+    # Occurrences moved into the window from outside it
+    for occurrence, exception in exceptions.items():
+        moved_to = to_utc_naive(exception.get("date"))
+        if exception.get("cancelled") or not moved_to or not (window_start <= moved_to < window_end):
+            continue
+        if window_start <= occurrence < window_end or not is_event_occurrence(event, occurrence):
+            continue
+        occurrences.append(build(occurrence, exception))
+    return occurrences
+
+def is_event_occurrence(event: Dict[str, Any], occurrence: datetime) -> bool:
+    recurrence = EventRecurrence(**event["recurrence"])
+    return occurrence in occurrence_starts(event["date"], recurrence, occurrence, occurrence + timedelta(seconds=1))
+
+# Change sequence for delta sync
+CHANGE_INFLIGHT_GRACE_SECONDS = 60  # a reservation older than this belongs to a writer that died
+
+@asynccontextmanager
+async def change_seqs(count: int = 1):
+    """Reserve `count` consecutive change sequence numbers for writes about to happen; yields the first.
+
+    The reservation is announced (with the counter value read beforehand as a
+    floor) before the counter moves, and withdrawn once the writes are done, so
+    change_seq_horizon never lets a sync cursor pass a write that hasn't landed.
+    """
+    floor = await db.counters.find_one({"_id": "change_seq"})
+    reservation = await db.change_inflight.insert_one({"floor": floor["value"] if floor else 0, "at": datetime.utcnow()})
+    try:
+        counter = await db.counters.find_one_and_update(
+            {"_id": "change_seq"}, {"$inc": {"value": count}}, upsert=True, return_document=ReturnDocument.AFTER
+        )
+        yield counter["value"] - count + 1
+    finally:
+        await db.change_inflight.delete_one({"_id": reservation.inserted_id})
+
+async def change_seq_horizon() -> int:
+    """The highest change sequence number at or below which every write has landed"""
+    counter = await db.counters.find_one({"_id": "change_seq"})
+    oldest = await db.change_inflight.find_one(
+        {"at": {"$gt": datetime.utcnow() - timedelta(seconds=CHANGE_INFLIGHT_GRACE_SECONDS)}}, sort=[("floor", 1)]
+    )
+    latest = counter["value"] if counter else 0
+    return min(latest, oldest["floor"]) if oldest else latest
+
+async def record_tombstone(collection: str, document_id: str, seq: int, user_id: Optional[str] = None) -> None:
+    """Deletes leave a tombstone so delta sync can tell clients to drop their copy"""
+    await db.tombstones.insert_one({
+        "collection": collection, "id": document_id, "user_id": user_id, "change_seq": seq, "deleted_at": datetime.utcnow()
+    })
+
+# iCalendar utilities
+DEFAULT_EVENT_DURATION = timedelta(hours=2)
+ICS_CACHE_TTL_SECONDS = 300
+ics_cache: TTLCache = TTLCache(maxsize=4096, ttl=ICS_CACHE_TTL_SECONDS)
+
+def sign_calendar_subject(subject: str) -> str:
+    """Calendar feed token: subject ("site" or a user id) plus an HMAC, verifiable without a lookup"""
+    signature = hmac.new(JWT_SECRET.encode('utf-8'), f"calendar:{subject}".encode('utf-8'), hashlib.sha256).hexdigest()
+    return f"{subject}.{signature[:32]}"
+
+def verify_calendar_token(token: str) -> Optional[str]:
+    subject, _, _ = token.rpartition(".")
+    if subject and hmac.compare_digest(sign_calendar_subject(subject), token):
+        return subject
+    return None
+
+def ics_escape(text: str) -> str:
+    return (text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+            .replace("\r\n", "\\n").replace("\n", "\\n"))
+
+def ics_datetime(value: datetime) -> str:
+    return to_utc_naive(value).strftime("%Y%m%dT%H%M%SZ")
+
+def fold_ics_line(line: str) -> str:
+    """Fold content lines at 75 octets as RFC 5545 requires"""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line
+    parts, start = [], 0
+    while start < len(encoded):
+        end = min(start + (75 if not parts else 74), len(encoded))
+        while end < len(encoded) and (encoded[end] & 0xC0) == 0x80:
+            end -= 1  # don't split a multi-byte character
+        parts.append(encoded[start:end].decode('utf-8'))
+        start = end
+    return "\r\n ".join(parts)
+
+def ics_stamp(item: Dict[str, Any], fallback: datetime) -> str:
+    # DTSTAMP comes from the stored document, not the render time, so an unchanged feed renders
+    # byte-for-byte the same and keeps its ETag between polls
+    return ics_datetime(item.get("created_at") or fallback)
+
+def ics_event_lines(event: Dict[str, Any]) -> List[str]:
+    stamp = ics_stamp(event, event["date"])
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:{event['id']}@growing-together",
+        f"DTSTAMP:{stamp}",
+        f"DTSTART:{ics_datetime(event['date'])}",
+        f"DTEND:{ics_datetime(event['date'] + DEFAULT_EVENT_DURATION)}",
+        f"SUMMARY:{ics_escape(event['title'])}",
+        f"DESCRIPTION:{ics_escape(event.get('description') or '')}",
+        f"LOCATION:{ics_escape(event.get('location') or '')}",
+    ]
+    recurrence = event.get("recurrence")
+    if recurrence:
+        rule = f"RRULE:FREQ={recurrence['freq'].upper()};INTERVAL={recurrence.get('interval', 1)}"
+        if recurrence.get("until"):
+            rule += f";UNTIL={ics_datetime(recurrence['until'])}"
+        elif recurrence.get("count"):
+            rule += f";COUNT={recurrence['count']}"
+        lines.append(rule)
+        for exception in event.get("exceptions", []):
+            if exception.get("cancelled"):
+                lines.append(f"EXDATE:{ics_datetime(exception['occurrence'])}")
+    lines.append("END:VEVENT")
+    
+    # Changed occurrences are separate VEVENTs sharing the series UID
+    for exception in event.get("exceptions", []) if recurrence else []:
+        if exception.get("cancelled"):
+            continue
+        start = exception.get("date") or exception["occurrence"]
+        lines.extend([
+            "BEGIN:VEVENT",
+            f"UID:{event['id']}@growing-together",
+            f"DTSTAMP:{stamp}",
+            f"RECURRENCE-ID:{ics_datetime(exception['occurrence'])}",
+            f"DTSTART:{ics_datetime(start)}",
+            f"DTEND:{ics_datetime(start + DEFAULT_EVENT_DURATION)}",
+            f"SUMMARY:{ics_escape(exception.get('title') or event['title'])}",
+            f"DESCRIPTION:{ics_escape(exception.get('description') or event.get('description') or '')}",
+            f"LOCATION:{ics_escape(exception.get('location') or event.get('location') or '')}",
+            "END:VEVENT",
+        ])
+    return lines
+
+def ics_task_lines(task: Dict[str, Any]) -> List[str]:
+    due = to_utc_naive(task["due_date"]).date()
+    stamp = ics_stamp(task, task["due_date"])
+    return [
+        "BEGIN:VEVENT",
+        f"UID:task-{task['id']}@growing-together",
+        f"DTSTAMP:{stamp}",
+        f"DTSTART;VALUE=DATE:{due.strftime('%Y%m%d')}",
+        f"DTEND;VALUE=DATE:{(due + timedelta(days=1)).strftime('%Y%m%d')}",
+        f"SUMMARY:{ics_escape('Task: ' + task['title'])}",
+        f"DESCRIPTION:{ics_escape(task.get('description') or '')}",
+        "END:VEVENT",
+    ]
+
+def render_ics(name: str, events: List[Dict[str, Any]], tasks: List[Dict[str, Any]]) -> bytes:
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//Growing Together//Allotment Calendar//EN",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{ics_escape(name)}",
+        "REFRESH-INTERVAL;VALUE=DURATION:PT30M",
+    ]
+    for event in events:
+        lines.extend(ics_event_lines(event))
+    for task in tasks:
+        lines.extend(ics_task_lines(task))
+    lines.append("END:VCALENDAR")
+    return ("\r\n".join(fold_ics_line(line) for line in lines) + "\r\n").encode('utf-8')
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+# Feed utilities
+FEATURED_POSTS_TTL_SECONDS = 60  # bounds staleness for writes made by other workers
+featured_posts_cache: TTLCache = TTLCache(maxsize=1, ttl=FEATURED_POSTS_TTL_SECONDS)
+
+def invalidate_featured_posts() -> None:
+    featured_posts_cache.clear()
+
+def encode_feed_cursor(post: Dict[str, Any]) -> str:
+    raw = json.dumps([post["created_at"].isoformat(), post["id"]])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+def decode_feed_cursor(cursor: str) -> tuple:
+    try:
+        created_at, post_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return datetime.fromisoformat(created_at), post_id
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+# Real-time pub/sub
+STREAM_QUEUE_SIZE = 100
+STREAM_HEARTBEAT_SECONDS = 15
+COMMUNITY_TOPIC = "community"
+SYSTEM_TOPIC = "system"  # cache invalidations between workers
+WORKER_ID = str(uuid.uuid4())
+
+def user_topic(user_id: str) -> str:
+    return f"user:{user_id}"
+
+class Subscription:
+    """A connection's bounded inbox; a slow reader is told to resync instead of stalling publishers"""
+    def __init__(self, topics: List[str]):
+        self.topics = topics
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+    
+    def offer(self, message: Dict[str, Any]) -> None:
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"type": "resync", "data": {}})
+
+class BrokerBackend:
+    """Transport between workers; delivers every published message to each worker's deliver callback"""
+    async def start(self, deliver) -> None:
+        self.deliver = deliver
+    
+    async def publish(self, topic: str, message: Dict[str, Any]) -> None:
+        raise NotImplementedError
+    
+    async def stop(self) -> None:
+        pass
+
+class InMemoryBrokerBackend(BrokerBackend):
+    """Single-process fan-out"""
+    async def publish(self, topic: str, message: Dict[str, Any]) -> None:
+        self.deliver(topic, message)
+
+class MongoBrokerBackend(BrokerBackend):
+    """Multi-worker fan-out through a capped collection tailed by every worker"""
+    def __init__(self, collection_name: str = "broker_messages", size_bytes: int = 16 * 1024 * 1024):
+        self.collection_name = collection_name
+        self.size_bytes = size_bytes
+        self.task: Optional[asyncio.Task] = None
+    
+    async def start(self, deliver) -> None:
+        await super().start(deliver)
+        if self.collection_name not in await db.list_collection_names():
+            await db.create_collection(self.collection_name, capped=True, size=self.size_bytes)
+        self.task = asyncio.create_task(self.tail())
+    
+    async def tail(self) -> None:
+        collection = db[self.collection_name]
+        latest = await collection.find_one(sort=[("$natural", -1)])
+        last_id = latest["_id"] if latest else None
+        while True:
+            try:
+                query = {"_id": {"$gt": last_id}} if last_id else {}
+                cursor = collection.find(query, cursor_type=CursorType.TAILABLE_AWAIT)
+                async for document in cursor:
+                    last_id = document["_id"]
+                    self.deliver(document["topic"], document["message"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Broker tail error: {e}")
+            await asyncio.sleep(1)
+    
+    async def publish(self, topic: str, message: Dict[str, Any]) -> None:
+        await db[self.collection_name].insert_one({"topic": topic, "message": message})
+    
+    async def stop(self) -> None:
+        if self.task:
+            self.task.cancel()
+
+class Broker:
+    """Topic -> local subscriptions registry in front of a pluggable backend"""
+    def __init__(self, backend: BrokerBackend):
+        self.backend = backend
+        self.subscriptions: Dict[str, set] = {}
+        self.sequence = itertools.count(1)
+    
+    async def start(self) -> None:
+        await self.backend.start(self.deliver)
+    
+    async def stop(self) -> None:
+        await self.backend.stop()
+    
+    def subscribe(self, topics: List[str]) -> Subscription:
+        subscription = Subscription(topics)
+        for topic in topics:
+            self.subscriptions.setdefault(topic, set()).add(subscription)
+        return subscription
+    
+    def unsubscribe(self, subscription: Subscription) -> None:
+        for topic in subscription.topics:
+            subscribers = self.subscriptions.get(topic)
+            if subscribers:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self.subscriptions[topic]
+    
+    def deliver(self, topic: str, message: Dict[str, Any]) -> None:
+        for subscription in list(self.subscriptions.get(topic, ())):
+            subscription.offer(message)
+    
+    async def publish(self, topic: str, event_type: str, data: Any) -> None:
+        try:
+            await self.backend.publish(topic, {"type": event_type, "data": jsonable_encoder(data)})
+        except Exception as e:
+            # Real-time delivery is best effort; the write itself already succeeded
+            logger.warning(f"Broker publish error: {e}")
+
+broker = Broker(MongoBrokerBackend() if os.environ.get('BROKER_BACKEND') == 'mongo' else InMemoryBrokerBackend())
+
+def format_sse(event_type: str, data: Any, event_id: Optional[int] = None) -> str:
+    message = f"event: {event_type}\ndata: {json.dumps(data)}\n\n"
+    return f"id: {event_id}\n{message}" if event_id is not None else message
+
+# Chat utilities
+CHAT_MESSAGE_MAX_LENGTH = 2000
+CHAT_HISTORY_BUCKET_BATCH = 4
+
+def chat_topic(room_id: str) -> str:
+    return f"chat:{room_id}"
+
+def chat_bucket(moment: datetime) -> datetime:
+    """Messages are stored one document per room per hour"""
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+def direct_room_id(user_a: str, user_b: str) -> str:
+    return "direct:" + ":".join(sorted([user_a, user_b]))
+
+# Search index
+SEARCH_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "have", "i", "in", "is", "it",
+    "its", "my", "of", "on", "or", "that", "the", "this", "to", "was", "were", "with", "we", "you"
+}
+SEARCH_TOKEN_RE = re.compile(r"[a-z0-9]+")
+BM25_K1 = 1.2
+BM25_B = 0.75
+SEARCH_COMPACT_MIN_RETIRED = 1000  # below this, retired documents cost less than renumbering
+
+@lru_cache(maxsize=100000)
+def stem(word: str) -> str:
+    """Light English suffix stripping: blights/blighted/blighting -> blight"""
+    if len(word) <= 3 or word.isdigit():
+        return word
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"
+    if word.endswith("oes") and len(word) > 4:
+        return word[:-2]  # tomatoes -> tomato
+    if word.endswith("sses"):
+        return word[:-2]
+    for suffix in ("ing", "ed"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[:-len(suffix)]
+            if len(word) > 3 and word[-1] == word[-2] and word[-1] not in "lsz":
+                word = word[:-1]  # running -> run
+            return word
+    if word.endswith("ly") and len(word) > 5:
+        return word[:-2]
+    if word.endswith("es") and word[-3:-2] in ("s", "x", "z", "h") and len(word) > 4:
+        return word[:-2]
+    if word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+def tokenize(text: str) -> List[str]:
+    return [stem(token) for token in SEARCH_TOKEN_RE.findall(text.lower()) if token not in SEARCH_STOPWORDS]
+
+class SearchIndex:
+    """In-memory inverted index with BM25 ranking.
+
+    Postings are packed into arrays of document numbers and term frequencies
+    so scoring a term is a couple of vectorised NumPy passes. Updates append a
+    new document number and retire the old one; once retired numbers outnumber
+    live ones the index is compacted and renumbered.
+    """
+    def __init__(self):
+        self.postings: Dict[str, tuple] = {}  # term -> (doc numbers, term frequencies)
+        self.doc_numbers: Dict[str, int] = {}  # "kind:id" -> live document number
+        self.docs: List[Optional[Dict[str, Any]]] = []  # document number -> result metadata
+        self.lengths = array("I")
+        self.alive = array("B")
+        self.owners = array("I")  # 0 for public documents, else the owner's code
+        self.kinds = array("B")
+        self.owner_codes: Dict[str, int] = {}
+        self.kind_codes: Dict[str, int] = {}
+        self.total_length = 0
+        self.live_count = 0
+    
+    def add(self, kind: str, doc_id: str, title: str, fields: List[str], owner_id: Optional[str] = None, date: Optional[datetime] = None) -> None:
+        """Index a document; owner_id marks it private to that user (and admins)"""
+        self.remove(kind, doc_id)
+        # Titles count twice so they outrank passing mentions in body text
+        terms = tokenize(title) * 2 + [term for field in fields for term in tokenize(field or "")]
+        if not terms:
+            return
+        number = len(self.docs)
+        snippet = next((field for field in fields if field), "")[:200]
+        self.docs.append({"kind": kind, "id": doc_id, "title": title, "snippet": snippet, "date": date})
+        self.doc_numbers[f"{kind}:{doc_id}"] = number
+        self.lengths.append(len(terms))
+        self.alive.append(1)
+        self.owners.append(self.owner_codes.setdefault(owner_id, len(self.owner_codes) + 1) if owner_id else 0)
+        self.kinds.append(self.kind_codes.setdefault(kind, len(self.kind_codes) + 1))
+        self.total_length += len(terms)
+        self.live_count += 1
+        
+        frequencies: Dict[str, int] = {}
+        for term in terms:
+            frequencies[term] = frequencies.get(term, 0) + 1
+        for term, frequency in frequencies.items():
+            numbers, counts = self.postings.setdefault(term, (array("I"), array("H")))
+            numbers.append(number)
+            counts.append(min(frequency, 65535))
+    
+    def remove(self, kind: str, doc_id: str) -> None:
+        number = self.doc_numbers.pop(f"{kind}:{doc_id}", None)
+        if number is None:
+            return
+        self.alive[number] = 0
+        self.docs[number] = None
+        self.total_length -= self.lengths[number]
+        self.live_count -= 1
+        retired = len(self.docs) - self.live_count
+        if retired > max(SEARCH_COMPACT_MIN_RETIRED, self.live_count):
+            self.compact()
+    
+    def compact(self) -> None:
+        """Drop retired documents from every array and posting list, renumbering the live ones"""
+        keep = np.flatnonzero(np.frombuffer(self.alive, dtype=np.uint8))
+        renumber = np.full(len(self.docs), -1, dtype=np.int64)
+        renumber[keep] = np.arange(len(keep))
+        postings = {}
+        for term, (numbers, counts) in self.postings.items():
+            numbers = renumber[np.frombuffer(numbers, dtype=np.uint32)]
+            live = numbers >= 0
+            if live.any():
+                postings[term] = (
+                    array("I", numbers[live].astype(np.uint32).tobytes()),
+                    array("H", np.frombuffer(counts, dtype=np.uint16)[live].tobytes())
+                )
+        self.postings = postings
+        self.docs = [self.docs[number] for number in keep]
+        self.doc_numbers = {key: int(renumber[number]) for key, number in self.doc_numbers.items()}
+        self.lengths = array("I", np.frombuffer(self.lengths, dtype=np.uint32)[keep].tobytes())
+        self.owners = array("I", np.frombuffer(self.owners, dtype=np.uint32)[keep].tobytes())
+        self.kinds = array("B", np.frombuffer(self.kinds, dtype=np.uint8)[keep].tobytes())
+        self.alive = array("B", b"\x01" * len(keep))
+    
+    def search(self, query: str, user: User, kinds: Optional[List[str]] = None, offset: int = 0, limit: int = 20) -> Dict[str, Any]:
+        terms = set(tokenize(query))
+        if not terms or not self.live_count:
+            return {"total": 0, "results": []}
+        
+        lengths = np.frombuffer(self.lengths, dtype=np.uint32).astype(np.float64)
+        alive = np.frombuffer(self.alive, dtype=np.uint8).astype(bool)
+        average_length = self.total_length / self.live_count
+        scores = np.zeros(len(self.docs), dtype=np.float64)
+        for term in terms:
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            numbers = np.frombuffer(posting[0], dtype=np.uint32)
+            frequencies = np.frombuffer(posting[1], dtype=np.uint16).astype(np.float64)
+            # Retired documents still sit in postings until compaction; statistics count live ones only
+            document_frequency = int(alive[numbers].sum())
+            if not document_frequency:
+                continue
+            idf = np.log(1 + (self.live_count - document_frequency + 0.5) / (document_frequency + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[numbers] / average_length)
+            scores += np.bincount(numbers, weights=idf * frequencies * (BM25_K1 + 1) / (frequencies + norm), minlength=len(scores))
+        
+        visible = alive & (scores > 0)
+        if user.role != "admin":
+            owners = np.frombuffer(self.owners, dtype=np.uint32)
+            visible &= (owners == 0) | (owners == self.owner_codes.get(user.id, -1))
+        if kinds:
+            kind_codes = [self.kind_codes[kind] for kind in kinds if kind in self.kind_codes]
+            visible &= np.isin(np.frombuffer(self.kinds, dtype=np.uint8), kind_codes)
+        
+        candidates = np.flatnonzero(visible)
+        wanted = min(offset + limit, len(candidates))
+        if wanted == 0:
+            return {"total": int(len(candidates)), "results": []}
+        top = candidates[np.argpartition(-scores[candidates], wanted - 1)[:wanted]]
+        top = top[np.argsort(-scores[top], kind="stable")][offset:]
+        return {
+            "total": int(len(candidates)),
+            "results": [{**self.docs[number], "score": round(float(scores[number]), 4)} for number in top]
+        }
+
+search_index = SearchIndex()
+
+def index_diary_entry(entry: Dict[str, Any]) -> None:
+    search_index.add("diary", entry["id"], entry["title"], [entry["content"], " ".join(entry.get("tags", []))],
+                     owner_id=entry["user_id"], date=entry.get("date"))
+
+def index_post(post: Dict[str, Any]) -> None:
+    search_index.add("post", post["id"], "", [post["content"]], date=post.get("created_at"))
+
+def index_plant(plant: Dict[str, Any]) -> None:
+    search_index.add("plant", plant["id"], plant["name"], [plant.get("scientific_name") or "", plant.get("description") or ""])
+
+def index_event(event: Dict[str, Any]) -> None:
+    search_index.add("event", event["id"], event["title"], [event.get("description") or ""], date=event.get("date"))
+
+# Search kind -> (collection, fields the indexer reads, indexer)
+SEARCH_SOURCES = {
+    "diary": ("diary_entries", ["id", "user_id", "title", "content", "tags", "date"], index_diary_entry),
+    "post": ("posts", ["id", "content", "created_at"], index_post),
+    "plant": ("plants", ["id", "name", "scientific_name", "description"], index_plant),
+    "event": ("events", ["id", "title", "description", "date"], index_event),
+}
+
+def apply_search_update(kind: str, doc_id: str, document: Optional[Dict[str, Any]]) -> None:
+    if document is None:
+        search_index.remove(kind, doc_id)
+    else:
+        SEARCH_SOURCES[kind][2](document)
+
+async def update_search_index(kind: str, doc_id: str, document: Optional[Dict[str, Any]] = None) -> None:
+    """Index (or, without a document, drop) a document here and tell every other worker to re-read it"""
+    apply_search_update(kind, doc_id, document)
+    # Only the reference goes over the broker; private diary text stays in the database
+    await broker.publish(SYSTEM_TOPIC, "search.update", {"origin": WORKER_ID, "kind": kind, "id": doc_id})
+
+async def follow_search_update(data: Dict[str, Any]) -> None:
+    """Apply another worker's index change from the document's current state"""
+    collection_name, fields, _ = SEARCH_SOURCES[data["kind"]]
+    document = await db[collection_name].find_one({"id": data["id"]}, {"_id": 0, **{field: 1 for field in fields}})
+    apply_search_update(data["kind"], data["id"], document)
+
+async def build_search_index() -> SearchIndex:
+    """Index every searchable collection, yielding to the event loop between batches"""
+    global search_index
+    fresh = SearchIndex()
+    previous, search_index = search_index, fresh  # writes during the build land in the new index
+    try:
+        for collection_name, fields, index_document in SEARCH_SOURCES.values():
+            count = 0
+            projection = {"_id": 0, **{field: 1 for field in fields}}
+            async for document in db[collection_name].find({}, projection).batch_size(1000):
+                index_document(document)
+                count += 1
+                if count % 1000 == 0:
+                    await asyncio.sleep(0)
+    except Exception:
+        search_index = previous
+        raise
+    return fresh
+
+# Plant typeahead
+SUGGEST_NODE_LIMIT = 10
+SUGGEST_MIN_SIMILARITY = 0.25
+
+def normalise_label(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
+    return " ".join(re.findall(r"[a-z0-9]+", text.lower()))
+
+def trigrams(text: str) -> set:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class PlantSuggestIndex:
+    """Immutable prefix trie plus trigram index over plant names, scientific names and aliases.
+
+    Each trie node keeps its best few entries precomputed, so a prefix lookup
+    is a walk of len(query) dict hops. Trigram similarity only runs when the
+    prefixes don't fill the page, which is what catches typos like "tomatoe".
+    """
+    def __init__(self, plants: List[Dict[str, Any]]):
+        self.entries: List[tuple] = []  # (label, plant summary, field)
+        for plant in plants:
+            summary = {"id": plant["id"], "name": plant["name"], "scientific_name": plant.get("scientific_name")}
+            labels = [(plant["name"], "name"), (plant.get("scientific_name") or "", "scientific_name")]
+            labels += [(alias, "alias") for alias in plant.get("aliases", [])]
+            for label, field in labels:
+                normalised = normalise_label(label)
+                if normalised:
+                    self.entries.append((normalised, summary, field))
+        
+        # Prefer whole-label prefixes over word prefixes, then names over aliases, then shorter labels
+        field_rank = {"name": 0, "scientific_name": 1, "alias": 2}
+        self.trie: Dict[str, Any] = {"": []}  # the "" key holds a node's ranked entry numbers
+        for number, (label, _, field) in enumerate(self.entries):
+            starts = [0] + [i + 1 for i, char in enumerate(label) if char == " "]
+            for position, start in enumerate(starts):
+                node = self.trie
+                for char in label[start:]:
+                    node = node.setdefault(char, {"": []})
+                    node[""].append((position > 0, field_rank[field], len(label), number))
+        for node in self._nodes(self.trie):
+            # Several entries can point at one plant, so keep spares for de-duplication
+            node[""] = [number for *_, number in sorted(set(node[""]))][:SUGGEST_NODE_LIMIT * 3]
+        
+        self.trigram_index: Dict[str, List[int]] = {}
+        self.trigram_counts: List[int] = []
+        for number, (label, _, _) in enumerate(self.entries):
+            grams = trigrams(label)
+            self.trigram_counts.append(len(grams))
+            for gram in grams:
+                self.trigram_index.setdefault(gram, []).append(number)
+    
+    def _nodes(self, node: Dict[str, Any]):
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            yield current
+            stack.extend(child for key, child in current.items() if key)
+    
+    def suggest(self, query: str, limit: int = 8) -> List[Dict[str, Any]]:
+        query = normalise_label(query)
+        if not query:
+            return []
+        results: List[Dict[str, Any]] = []
+        seen = set()
+        
+        def take(number: int, score: float) -> None:
+            label, summary, field = self.entries[number]
+            if summary["id"] not in seen:
+                seen.add(summary["id"])
+                results.append({**summary, "matched": label, "field": field, "score": round(score, 3)})
+        
+        node = self.trie
+        for char in query:
+            node = node.get(char)
+            if node is None:
+                break
+        else:
+            for number in node[""]:
+                take(number, 1.0)
+                if len(results) >= limit:
+                    return results
+        
+        query_grams = trigrams(query)
+        overlaps: Dict[int, int] = {}
+        for gram in query_grams:
+            for number in self.trigram_index.get(gram, ()):
+                overlaps[number] = overlaps.get(number, 0) + 1
+        scored = []
+        for number, overlap in overlaps.items():
+            similarity = overlap / (len(query_grams) + self.trigram_counts[number] - overlap)
+            if similarity >= SUGGEST_MIN_SIMILARITY:
+                scored.append((similarity, number))
+        for similarity, number in sorted(scored, key=lambda item: -item[0]):
+            take(number, similarity)
+            if len(results) >= limit:
+                break
+        return results
+
+class PlantLibrarySnapshot:
+    """The whole plant library, validated and serialised once per load"""
+    def __init__(self, plants: List[Dict[str, Any]]):
+        self.plants = tuple(Plant(**plant).dict() for plant in plants)
+        self.body = json.dumps(jsonable_encoder(list(self.plants)), separators=(",", ":")).encode('utf-8')
+        self.etag = f'"{hashlib.sha256(self.body).hexdigest()[:32]}"'
+        self.msgpack_body = packb(self.plants)
+        self.msgpack_etag = f'"{hashlib.sha256(self.msgpack_body).hexdigest()[:32]}"'
+        self.loaded_at = datetime.utcnow()
+
+# Planting calendar
+CALENDAR_ACTIVITIES = ("sow_indoors", "sow_outdoors", "plant_out", "harvest")
+MONTH_NUMBERS = {name.lower(): number for number, name in enumerate(calendar.month_name) if name}
+MONTH_NUMBERS.update({name.lower(): number for number, name in enumerate(calendar.month_abbr) if name})
+MONTH_NUMBERS["sept"] = 9
+MONTH_PATTERN = "|".join(sorted(MONTH_NUMBERS, key=len, reverse=True))
+MONTH_RANGE_RE = re.compile(rf"\b({MONTH_PATTERN})\b(?:\s*(?:-|–|to|until)\s*\b({MONTH_PATTERN})\b)?", re.IGNORECASE)
+ACTIVITY_KEYWORDS = [
+    ("plant_out", ("plant out", "planting out", "transplant")),
+    ("sow_indoors", ("indoor", "under cover", "under glass", "greenhouse", "heated", "propagator")),
+    ("sow_outdoors", ("outdoor", "outside", "direct")),
+    ("harvest", ("harvest", "pick", "lift")),
+]
+
+def activity_for_key(key: str, section: str) -> Optional[str]:
+    key = key.lower()
+    if section == "harvest_info" or "harvest" in key:
+        return "harvest"
+    if "plant_out" in key or "transplant" in key:
+        return "plant_out"
+    if "sow" in key:
+        return "sow_outdoors"
+    return None
+
+def parse_month_windows(text: str, default_activity: Optional[str]) -> Dict[str, set]:
+    """'March-May indoors, May-June outdoors' -> {"sow_indoors": {3, 4, 5}, "sow_outdoors": {5, 6}}"""
+    windows: Dict[str, set] = {}
+    # Case is kept for matching months so the verb "may" isn't read as May
+    for segment in re.split(r"[,;/]|\band\b", text, flags=re.IGNORECASE):
+        activity = next((name for name, words in ACTIVITY_KEYWORDS if any(word in segment.lower() for word in words)), default_activity)
+        if activity == "harvest" and default_activity and default_activity != "harvest":
+            activity = default_activity  # "sow for an autumn harvest" is still a sowing window
+        if not activity:
+            continue
+        for start_name, end_name in MONTH_RANGE_RE.findall(segment):
+            if start_name == "may" and not end_name and segment.strip() != "may":
+                continue  # a lower-case "may" in a sentence is the verb; "May", "may-June" or a list item is the month
+            start = MONTH_NUMBERS[start_name.lower()]
+            end = MONTH_NUMBERS[end_name.lower()] if end_name else start
+            span = (end - start) % 12  # ranges may wrap the year, e.g. November-February
+            windows.setdefault(activity, set()).update((start - 1 + offset) % 12 + 1 for offset in range(span + 1))
+    return windows
+
+def parse_plant_calendar(plant: Dict[str, Any]) -> Dict[str, List[int]]:
+    windows: Dict[str, set] = {}
+    for section in ("planting_guide", "harvest_info"):
+        for key, value in (plant.get(section) or {}).items():
+            if not isinstance(value, str):
+                continue
+            for activity, months in parse_month_windows(value, activity_for_key(key, section)).items():
+                windows.setdefault(activity, set()).update(months)
+    return {activity: sorted(months) for activity, months in windows.items()}
+
+class PlantCalendarIndex:
+    """Month -> activity -> plants, parsed once per library load"""
+    def __init__(self, plants: List[Dict[str, Any]]):
+        self.by_plant: Dict[str, Dict[str, List[int]]] = {}
+        self.months: Dict[int, Dict[str, List[Dict[str, Any]]]] = {
+            month: {activity: [] for activity in CALENDAR_ACTIVITIES} for month in range(1, 13)
+        }
+        for plant in plants:
+            windows = parse_plant_calendar(plant)
+            self.by_plant[plant["id"]] = windows
+            summary = {"id": plant["id"], "name": plant["name"], "category": plant.get("category")}
+            for activity, months in windows.items():
+                for month in months:
+                    self.months[month][activity].append(summary)
+    
+    def for_months(self, months: List[int]) -> Dict[str, List[Dict[str, Any]]]:
+        result: Dict[str, List[Dict[str, Any]]] = {}
+        for activity in CALENDAR_ACTIVITIES:
+            seen: Dict[str, Dict[str, Any]] = {}
+            for month in months:
+                for summary in self.months[month][activity]:
+                    seen.setdefault(summary["id"], summary)
+            result[activity] = list(seen.values())
+        return result
+
+plant_library = PlantLibrarySnapshot([])
+plant_suggest_index = PlantSuggestIndex([])
+plant_calendar = PlantCalendarIndex([])
+
+async def reload_plant_library() -> PlantLibrarySnapshot:
+    """Swap in a fresh snapshot and the lookups derived from it; call after any plant change"""
+    global plant_library, plant_suggest_index, plant_calendar
+    plants = await db.plants.find({}, {"_id": 0}).sort("name", 1).to_list(None)
+    snapshot = PlantLibrarySnapshot(plants)
+    plants = list(snapshot.plants)
+    plant_library, plant_suggest_index, plant_calendar = snapshot, PlantSuggestIndex(plants), PlantCalendarIndex(plants)
+    return snapshot
+
+async def invalidate_plant_library() -> PlantLibrarySnapshot:
+    """Reload here and tell the other workers to do the same"""
+    snapshot = await reload_plant_library()
+    await broker.publish(SYSTEM_TOPIC, "plants.reload", {"origin": WORKER_ID})
+    return snapshot
+
+# AI image preprocessing
+AI_IMAGE_SHORT_SIDE = int(os.environ.get('AI_IMAGE_SHORT_SIDE', 768))  # the vision model tiles at 768px on the short side
+AI_IMAGE_LONG_SIDE = int(os.environ.get('AI_IMAGE_LONG_SIDE', 2048))
+AI_IMAGE_QUALITY = 85
+AI_IMAGE_WORKERS = int(os.environ.get('AI_IMAGE_WORKERS', 2))
+image_pool: Optional[ProcessPoolExecutor] = None
+
+def preprocess_photo(photo_base64: str) -> str:
+    """Decode once, apply and drop EXIF, downscale to what the model can use, re-encode as JPEG.
+
+    Runs in a worker process: decoding a 4000px phone photo is tens of
+    milliseconds of CPU that shouldn't sit on the event loop.
+    """
+    data = photo_base64.split(",", 1)[1] if photo_base64.startswith("data:") else photo_base64
+    try:
+        image = Image.open(BytesIO(base64.b64decode("".join(data.split()))))
+        target = max(1.0, min(image.size) / AI_IMAGE_SHORT_SIDE, max(image.size) / AI_IMAGE_LONG_SIDE)
+        if image.format == "JPEG":
+            # Let libjpeg decode at a reduced scale instead of decoding every pixel
+            image.draft("RGB", (int(image.size[0] / target), int(image.size[1] / target)))
+        image = ImageOps.exif_transpose(image)
+    except Exception as e:
+        raise ValueError(f"Invalid photo: {e}")
+    
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    scale = min(1.0, AI_IMAGE_SHORT_SIDE / min(image.size), AI_IMAGE_LONG_SIDE / max(image.size))
+    if scale < 1.0:
+        image = image.resize((max(1, round(image.size[0] * scale)), max(1, round(image.size[1] * scale))), Image.LANCZOS)
+    output = BytesIO()
+    image.save(output, format="JPEG", quality=AI_IMAGE_QUALITY, optimize=True)  # no exif= so metadata is dropped
+    return base64.b64encode(output.getvalue()).decode('ascii')
+
+async def prepare_ai_query(query: AIQueryRequest) -> AIQueryRequest:
+    """Swap the member's photo for the preprocessed one"""
+    global image_pool
+    if not query.photo_base64:
+        return query
+    if image_pool is None:
+        image_pool = ProcessPoolExecutor(max_workers=AI_IMAGE_WORKERS)
+    try:
+        photo = await asyncio.get_running_loop().run_in_executor(image_pool, preprocess_photo, query.photo_base64)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid photo")
+    return query.copy(update={"photo_base64": photo})
+
+# AI advice cache
+AI_CACHE_TTL_SECONDS = int(os.environ.get('AI_CACHE_TTL_SECONDS', 30 * 24 * 3600))
+AI_NEAR_DUPLICATE_THRESHOLD = 0.85
+AI_QUESTION_STOPWORDS = {
+    "why", "what", "how", "when", "which", "who", "should", "do", "does", "did", "can", "could", "would",
+    "will", "am", "been", "being", "there", "these", "those", "they", "them", "their", "some", "any",
+    "please", "help", "me", "our", "so", "but", "if", "about", "into", "all", "just", "get", "getting",
+    # filler verbs, already stemmed: "going yellow" and "turning yellow" mean the same thing
+    "turn", "going", "go", "look", "seem", "start", "keep", "becom", "got"
+}
+AI_FALLBACK_RESPONSE = {
+    "advice": "I'm having trouble connecting to the AI service right now. Here's some general advice: Check your plant's leaves for signs of disease, ensure proper watering (soil should be moist but not waterlogged), and make sure it's getting adequate sunlight for its species. Please try the AI assistant again later.",
+    "can_save_as_task": False,
+    "suggested_actions": ["Check soil moisture", "Inspect leaves for pests", "Verify sunlight requirements"]
+}
+
+def normalise_question(text: Optional[str]) -> str:
+    return normalise_label(text or "")
+
+def question_terms(text: str) -> List[str]:
+    return [term for term in tokenize(text) if term not in AI_QUESTION_STOPWORDS]
+
+def hash_photo(photo_base64: str) -> str:
+    """Key photo queries by image content, ignoring data-URL prefixes and line breaks"""
+    data = photo_base64.split(",", 1)[1] if photo_base64.startswith("data:") else photo_base64
+    try:
+        raw = base64.b64decode("".join(data.split()), validate=False)
+    except (ValueError, TypeError):
+        raw = data.encode('utf-8')
+    return hashlib.sha256(raw).hexdigest()
+
+class AIAdviceCache:
+    """Exact-match LRU in front of a TTL'd MongoDB store, plus TF-IDF near-duplicate matching.
+
+    Memory entries carry the stored answer's expiry, so an answer MongoDB has
+    dropped isn't kept alive by a long-running worker.
+
+    Text questions are also held as term-frequency vectors grouped by plant so a
+    paraphrase ("tomato leaves going yellow?") can reuse an earlier answer.
+    Photo queries only ever match exactly, on the image hash.
+    """
+    def __init__(self, maxsize: int = 2000):
+        self.memory: LRUCache = LRUCache(maxsize=maxsize)
+        self.vectors: Dict[str, tuple] = {}  # key -> (plant, term frequencies)
+        self.postings: Dict[tuple, set] = {}  # (plant, term) -> keys
+        self.document_frequency: Dict[str, int] = {}
+        self.metrics = {"lookups": 0, "memory_hits": 0, "store_hits": 0, "near_duplicate_hits": 0, "misses": 0, "saved_latency_ms": 0.0}
+    
+    @staticmethod
+    def make_key(plant: str, question: str, photo_hash: Optional[str]) -> str:
+        return hashlib.sha256(f"{plant}|{question}|{photo_hash or ''}".encode('utf-8')).hexdigest()
+    
+    def remember_question(self, key: str, plant: str, question: str) -> None:
+        if key in self.vectors:
+            return
+        frequencies: Dict[str, int] = {}
+        for term in question_terms(question):
+            frequencies[term] = frequencies.get(term, 0) + 1
+        if not frequencies:
+            return
+        self.vectors[key] = (plant, frequencies)
+        for term in frequencies:
+            self.postings.setdefault((plant, term), set()).add(key)
+            self.document_frequency[term] = self.document_frequency.get(term, 0) + 1
+    
+    def forget_question(self, key: str) -> None:
+        plant, frequencies = self.vectors.pop(key, (None, {}))
+        for term in frequencies:
+            self.postings.get((plant, term), set()).discard(key)
+            self.document_frequency[term] = max(0, self.document_frequency.get(term, 1) - 1)
+    
+    def tfidf(self, frequencies: Dict[str, int]) -> Dict[str, float]:
+        total = len(self.vectors) + 1
+        weights = {term: count * (1 + np.log(total / (1 + self.document_frequency.get(term, 0)))) for term, count in frequencies.items()}
+        norm = float(np.sqrt(sum(weight * weight for weight in weights.values()))) or 1.0
+        return {term: weight / norm for term, weight in weights.items()}
+    
+    def nearest(self, plant: str, question: str) -> Optional[tuple]:
+        frequencies: Dict[str, int] = {}
+        for term in question_terms(question):
+            frequencies[term] = frequencies.get(term, 0) + 1
+        if not frequencies:
+            return None
+        candidates = set().union(*(self.postings.get((plant, term), set()) for term in frequencies))
+        query_vector = self.tfidf(frequencies)
+        best = None
+        for key in candidates:
+            vector = self.tfidf(self.vectors[key][1])
+            similarity = sum(weight * vector.get(term, 0.0) for term, weight in query_vector.items())
+            if similarity >= AI_NEAR_DUPLICATE_THRESHOLD and (best is None or similarity > best[1]):
+                best = (key, similarity)
+        return best
+    
+    async def fetch(self, key: str) -> Optional[Dict[str, Any]]:
+        now = datetime.utcnow()
+        entry = self.memory.get(key)
+        if entry and entry["expires_at"] > now:
+            self.metrics["memory_hits"] += 1
+            return entry
+        self.memory.pop(key, None)
+        document = await db.ai_advice_cache.find_one({"key": key}, {"_id": 0, "response": 1, "latency_ms": 1, "created_at": 1})
+        # MongoDB's TTL monitor runs about once a minute, so check the age here too
+        expires_at = document.get("created_at", now) + timedelta(seconds=AI_CACHE_TTL_SECONDS) if document else now
+        if expires_at <= now:
+            self.forget_question(key)  # expired out of MongoDB
+            return None
+        self.metrics["store_hits"] += 1
+        entry = {"response": document["response"], "latency_ms": document.get("latency_ms", 0), "expires_at": expires_at}
+        self.memory[key] = entry
+        return entry
+    
+    async def lookup(self, plant_name: Optional[str], question: str, photo_hash: Optional[str]) -> Optional[Dict[str, Any]]:
+        self.metrics["lookups"] += 1
+        plant, question = normalise_question(plant_name), normalise_question(question)
+        entry = await self.fetch(self.make_key(plant, question, photo_hash))
+        if not entry and not photo_hash:
+            match = self.nearest(plant, question)
+            if match:
+                entry = await self.fetch(match[0])
+                if entry:
+                    self.metrics["near_duplicate_hits"] += 1
+        if not entry:
+            self.metrics["misses"] += 1
+            return None
+        self.metrics["saved_latency_ms"] += entry["latency_ms"]
+        return {**entry["response"], "cached": True}
+    
+    async def store(self, plant_name: Optional[str], question: str, photo_hash: Optional[str], response: Dict[str, Any], latency_ms: float) -> None:
+        plant, question = normalise_question(plant_name), normalise_question(question)
+        key = self.make_key(plant, question, photo_hash)
+        now = datetime.utcnow()
+        self.memory[key] = {"response": response, "latency_ms": latency_ms, "expires_at": now + timedelta(seconds=AI_CACHE_TTL_SECONDS)}
+        if not photo_hash:
+            self.remember_question(key, plant, question)
+        await db.ai_advice_cache.update_one({"key": key}, {"$set": {
+            "key": key,
+            "plant": plant,
+            "question": question,
+            "photo_hash": photo_hash,
+            "response": response,
+            "latency_ms": latency_ms,
+            "created_at": now
+        }}, upsert=True)
+    
+    async def warm(self, limit: int = 5000) -> None:
+        cursor = db.ai_advice_cache.find(
+            {"photo_hash": None}, {"_id": 0, "key": 1, "plant": 1, "question": 1}
+        ).sort("created_at", -1).limit(limit)
+        async for document in cursor:
+            self.remember_question(document["key"], document["plant"], document["question"])
+    
+    def stats(self) -> Dict[str, Any]:
+        hits = self.metrics["memory_hits"] + self.metrics["store_hits"]
+        return {
+            **self.metrics,
+            "hit_rate": round(hits / self.metrics["lookups"], 4) if self.metrics["lookups"] else 0.0,
+            "memory_entries": len(self.memory),
+            "indexed_questions": len(self.vectors)
+        }
+
+ai_advice_cache = AIAdviceCache()
+
+# LLM call coordination
+AI_MAX_CONCURRENCY = int(os.environ.get('AI_MAX_CONCURRENCY', 8))
+AI_CALL_TIMEOUT_SECONDS = float(os.environ.get('AI_CALL_TIMEOUT_SECONDS', 45))
+DISCONNECT_POLL_SECONDS = 0.5
+
+class ClientDisconnected(Exception):
+    pass
+
+class SingleFlight:
+    """Identical in-flight calls share one task; it is cancelled only when every waiter has gone"""
+    def __init__(self):
+        self.calls: Dict[str, Dict[str, Any]] = {}
+        self.metrics = {"calls": 0, "shared": 0}
+    
+    async def do(self, key: str, factory):
+        call = self.calls.get(key)
+        if call is None:
+            self.metrics["calls"] += 1
+            call = {"task": asyncio.create_task(factory()), "waiters": 0}
+            self.calls[key] = call
+            call["task"].add_done_callback(lambda _: self.calls.pop(key, None) if self.calls.get(key) is call else None)
+        else:
+            self.metrics["shared"] += 1
+        call["waiters"] += 1
+        try:
+            return await asyncio.shield(call["task"])
+        finally:
+            call["waiters"] -= 1
+            if call["waiters"] == 0 and not call["task"].done():
+                call["task"].cancel()
+    
+    def stats(self) -> Dict[str, Any]:
+        return {**self.metrics, "in_flight": len(self.calls)}
+
+class LLMCallPool:
+    """Caps concurrent upstream calls, timing how long each waited for a slot"""
+    def __init__(self, max_concurrency: int, timeout: float):
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.waiting = 0
+        self.running = 0
+        self.metrics = {"calls": 0, "timeouts": 0, "errors": 0, "queue_wait_ms_total": 0.0, "queue_wait_ms_max": 0.0}
+    
+    @asynccontextmanager
+    async def slot(self):
+        """Hold one upstream slot, e.g. for the lifetime of a stream"""
+        queued = time.monotonic()
+        self.waiting += 1
+        try:
+            await self.semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        wait_ms = (time.monotonic() - queued) * 1000
+        self.metrics["calls"] += 1
+        self.metrics["queue_wait_ms_total"] += wait_ms
+        self.metrics["queue_wait_ms_max"] = max(self.metrics["queue_wait_ms_max"], wait_ms)
+        self.running += 1
+        try:
+            yield
+        except asyncio.TimeoutError:
+            self.metrics["timeouts"] += 1
+            raise
+        except Exception:
+            self.metrics["errors"] += 1
+            raise
+        finally:
+            self.running -= 1
+            self.semaphore.release()
+    
+    async def run(self, factory):
+        async with self.slot():
+            return await asyncio.wait_for(factory(), self.timeout)
+    
+    def stats(self) -> Dict[str, Any]:
+        calls = self.metrics["calls"]
+        return {
+            **self.metrics,
+            "queue_wait_ms_avg": round(self.metrics["queue_wait_ms_total"] / calls, 2) if calls else 0.0,
+            "max_concurrency": self.max_concurrency,
+            "running": self.running,
+            "waiting": self.waiting
+        }
+
+# LLM backends
+class LLMBackend:
+    """Completion provider; backends that can't stream yield the whole answer as one chunk"""
+    async def complete(self, prompt: str, image_base64: Optional[str] = None) -> str:
+        raise NotImplementedError
+    
+    async def stream(self, prompt: str, image_base64: Optional[str] = None) -> AsyncIterator[str]:
+        yield await self.complete(prompt, image_base64)
+
+class EmergentLLMBackend(LLMBackend):
+    async def complete(self, prompt: str, image_base64: Optional[str] = None) -> str:
+        # Initialize LLM Chat with Emergent LLM key
+        chat = LlmChat(
+            api_key=EMERGENT_LLM_KEY,
+            session_id=f"plant_advice_{uuid.uuid4()}",
+            system_message=PLANT_EXPERT_SYSTEM_MESSAGE
+        ).with_model("openai", AI_MODEL)
+        
+        # Add image content for vision models
+        file_contents = [ImageContent(image_base64=image_base64)] if image_base64 else None
+        return await chat.send_message(UserMessage(text=prompt, file_contents=file_contents))
+
+class LiteLLMBackend(LLMBackend):
+    """Token streaming through litellm's OpenAI-compatible client"""
+    def messages(self, prompt: str, image_base64: Optional[str]) -> List[Dict[str, Any]]:
+        content: Any = prompt
+        if image_base64:
+            content = [
+                {"type": "text", "text": prompt},
+                {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{image_base64}"}}
+            ]
+        return [{"role": "system", "content": PLANT_EXPERT_SYSTEM_MESSAGE}, {"role": "user", "content": content}]
+    
+    def options(self) -> Dict[str, Any]:
+        options = {"model": AI_MODEL, "api_key": os.environ.get('AI_API_KEY', EMERGENT_LLM_KEY)}
+        if os.environ.get('AI_API_BASE'):
+            options["api_base"] = os.environ['AI_API_BASE']
+        return options
+    
+    async def complete(self, prompt: str, image_base64: Optional[str] = None) -> str:
+        import litellm
+        response = await litellm.acompletion(messages=self.messages(prompt, image_base64), **self.options())
+        return response.choices[0].message.content or ""
+    
+    async def stream(self, prompt: str, image_base64: Optional[str] = None) -> AsyncIterator[str]:
+        import litellm
+        response = await litellm.acompletion(messages=self.messages(prompt, image_base64), stream=True, **self.options())
+        async for chunk in response:
+            token = chunk.choices[0].delta.content if chunk.choices else None
+            if token:
+                yield token
+
+class FakeLLMBackend(LLMBackend):
+    """Offline backend for tests and local development: a canned answer, streamed word by word"""
+    def __init__(self, delay: float = 0.02):
+        self.delay = delay
+    
+    def answer(self, prompt: str, image_base64: Optional[str]) -> str:
+        question = prompt.splitlines()[0].replace("Question: ", "")
+        photo_note = " Judging from your photo, the plant looks otherwise healthy." if image_base64 else ""
+        return (f"Thanks for asking about \"{question}\". Check the soil moisture first, remove any damaged "
+                f"leaves, and keep an eye out for pests over the next week.{photo_note}")
+    
+    async def complete(self, prompt: str, image_base64: Optional[str] = None) -> str:
+        await asyncio.sleep(self.delay)
+        return self.answer(prompt, image_base64)
+    
+    async def stream(self, prompt: str, image_base64: Optional[str] = None) -> AsyncIterator[str]:
+        for position, word in enumerate(self.answer(prompt, image_base64).split(" ")):
+            await asyncio.sleep(self.delay)
+            yield word if position == 0 else " " + word
+
+LLM_BACKENDS = {"emergent": EmergentLLMBackend, "litellm": LiteLLMBackend, "fake": FakeLLMBackend}
+llm_backend: LLMBackend = LLM_BACKENDS.get(AI_BACKEND, EmergentLLMBackend)()
+
+class CircuitOpen(Exception):
+    pass
+
+class CircuitBreaker:
+    """Fails fast while the provider is down.
+
+    Closed: calls flow and outcomes land in a rolling window; once enough calls
+    in the window fail, the breaker opens. Open: calls are refused at once.
+    After the cool-down one background probe runs (half-open); success closes
+    the breaker, failure re-opens it. Member requests never act as the probe.
+    """
+    def __init__(self, probe, window_seconds: float = 60, min_calls: int = 5, failure_threshold: float = 0.5, open_seconds: float = 30):
+        self.probe = probe
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.state = "closed"
+        self.opened_at = 0.0
+        self.outcomes: deque = deque()  # (timestamp, succeeded)
+        self.probe_task: Optional[asyncio.Task] = None
+        self.metrics = {"opened": 0, "short_circuited": 0, "probes": 0}
+    
+    def trim(self, now: float) -> None:
+        while self.outcomes and self.outcomes[0][0] < now - self.window_seconds:
+            self.outcomes.popleft()
+    
+    def failure_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return sum(1 for _, succeeded in self.outcomes if not succeeded) / len(self.outcomes)
+    
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open" and time.monotonic() >= self.opened_at + self.open_seconds:
+            self.state = "half_open"
+            self.probe_task = asyncio.create_task(self.run_probe())
+        self.metrics["short_circuited"] += 1
+        return False
+    
+    def check(self) -> None:
+        if not self.allow():
+            raise CircuitOpen("AI circuit breaker is open")
+    
+    def record(self, succeeded: bool) -> None:
+        if self.state != "closed":
+            return
+        now = time.monotonic()
+        self.outcomes.append((now, succeeded))
+        self.trim(now)
+        if len(self.outcomes) >= self.min_calls and self.failure_rate() >= self.failure_threshold:
+            self.open()
+    
+    def open(self) -> None:
+        self.state = "open"
+        self.opened_at = time.monotonic()
+        self.metrics["opened"] += 1
+        logger.warning("AI circuit breaker opened")
+    
+    async def run_probe(self) -> None:
+        self.metrics["probes"] += 1
+        try:
+            await self.probe()
+        except Exception as e:
+            logger.warning(f"AI circuit breaker probe failed: {e}")
+            self.open()
+            return
+        self.state = "closed"
+        self.outcomes.clear()
+        logger.info("AI circuit breaker closed")
+    
+    def stats(self) -> Dict[str, Any]:
+        self.trim(time.monotonic())
+        return {
+            **self.metrics,
+            "state": self.state,
+            "failure_rate": round(self.failure_rate(), 4),
+            "window_calls": len(self.outcomes)
+        }
+
+async def probe_llm_backend() -> None:
+    await asyncio.wait_for(llm_backend.complete("Reply with the single word OK."), AI_CALL_TIMEOUT_SECONDS)
+
+ai_breaker = CircuitBreaker(probe_llm_backend)
+
+ai_single_flight = SingleFlight()
+llm_pool = LLMCallPool(AI_MAX_CONCURRENCY, AI_CALL_TIMEOUT_SECONDS)
+
+async def run_until_disconnected(request: Request, awaitable):
+    """Await the work, cancelling it if the HTTP client goes away first"""
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                task.cancel()
+                raise ClientDisconnected()
+    finally:
+        if not task.done():
+            task.cancel()
+
 # Auth utilities
 def hash_password(password: str) -> str:
     return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
@@ -303,6 +1833,22 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         raise HTTPException(status_code=404, detail="User not found")
     return User(**user)
 
+async def get_user_from_token(token: str) -> User:
+    payload = verify_jwt_token(token)
+    user = await db.users.find_one({"id": payload['user_id']})
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return User(**user)
+
+async def get_stream_user(request: Request, token: Optional[str] = None):
+    """Streaming clients (EventSource, WebSocket) can't always set headers, so accept ?token= too"""
+    authorization = request.headers.get("authorization", "")
+    if authorization.lower().startswith("bearer "):
+        token = authorization[7:]
+    if not token:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    return await get_user_from_token(token)
+
 async def get_admin_user(current_user: User = Depends(get_current_user)):
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Admin access required")
@@ -367,44 +1913,760 @@ async def get_me(current_user: User = Depends(get_current_user)):
     }
 
 # Weather API
-@api_router.get("/weather")
-async def get_weather():
-    # Mock weather data - in production, integrate with real weather API
-    return {
-        "location": "Stafford Road Allotment",
-        "current": {
-            "temperature": 22,
-            "condition": "Partly Cloudy",
-            "humidity": 65,
-            "wind": "5 mph NE"
-        },
-        "forecast": [
-            {"day": "Today", "high": 24, "low": 15, "condition": "Sunny"},
-            {"day": "Tomorrow", "high": 21, "low": 13, "condition": "Cloudy"},
-            {"day": "Thursday", "high": 19, "low": 11, "condition": "Light Rain"}
+WEATHER_LOCATION = os.environ.get('WEATHER_LOCATION', 'Stafford Road Allotment')
+WEATHER_LATITUDE = float(os.environ.get('WEATHER_LATITUDE', 52.676))
+WEATHER_LONGITUDE = float(os.environ.get('WEATHER_LONGITUDE', -2.105))
+WEATHER_PROVIDER = os.environ.get('WEATHER_PROVIDER', 'open-meteo')  # open-meteo, stub
+WEATHER_TTL_SECONDS = int(os.environ.get('WEATHER_TTL_SECONDS', 900))
+WEATHER_MAX_STALE_SECONDS = 6 * 3600  # how long a stale snapshot may cover an upstream outage
+WEATHER_FORECAST_DAYS = 3
+
+# WMO weather interpretation codes used by open-meteo
+WMO_CONDITIONS = {
+    0: "Clear", 1: "Mainly Clear", 2: "Partly Cloudy", 3: "Cloudy", 45: "Fog", 48: "Freezing Fog",
+    51: "Light Drizzle", 53: "Drizzle", 55: "Heavy Drizzle", 56: "Freezing Drizzle", 57: "Freezing Drizzle",
+    61: "Light Rain", 63: "Rain", 65: "Heavy Rain", 66: "Freezing Rain", 67: "Freezing Rain",
+    71: "Light Snow", 73: "Snow", 75: "Heavy Snow", 77: "Snow Grains",
+    80: "Light Showers", 81: "Showers", 82: "Heavy Showers", 85: "Snow Showers", 86: "Snow Showers",
+    95: "Thunderstorm", 96: "Thunderstorm with Hail", 99: "Thunderstorm with Hail"
+}
+COMPASS_POINTS = ["N", "NE", "E", "SE", "S", "SW", "W", "NW"]
+
+weather_http: Optional[httpx.AsyncClient] = None
+
+def get_weather_http() -> httpx.AsyncClient:
+    """One pooled client for all outbound weather calls"""
+    global weather_http
+    if weather_http is None:
+        weather_http = httpx.AsyncClient(
+            timeout=httpx.Timeout(10.0, connect=5.0),
+            limits=httpx.Limits(max_connections=10, max_keepalive_connections=5)
+        )
+    return weather_http
+
+def forecast_day_label(day: datetime, today: datetime) -> str:
+    if day == today:
+        return "Today"
+    if day == today + timedelta(days=1):
+        return "Tomorrow"
+    return day.strftime("%A")
+
+class WeatherProvider:
+    """Returns current conditions and a short daily forecast for a location"""
+    async def fetch(self, latitude: float, longitude: float) -> Dict[str, Any]:
+        raise NotImplementedError
+    
+    async def hourly_history(self, latitude: float, longitude: float, past_days: int) -> List[Dict[str, Any]]:
+        """Hourly observations ({time (naive UTC), temperature, precipitation}) for the last past_days days"""
+        raise NotImplementedError
+
+class OpenMeteoWeatherProvider(WeatherProvider):
+    url = "https://api.open-meteo.com/v1/forecast"
+    
+    async def fetch(self, latitude: float, longitude: float) -> Dict[str, Any]:
+        response = await get_weather_http().get(self.url, params={
+            "latitude": latitude,
+            "longitude": longitude,
+            "current": "temperature_2m,relative_humidity_2m,weather_code,wind_speed_10m,wind_direction_10m",
+            "daily": "weather_code,temperature_2m_max,temperature_2m_min,precipitation_sum",
+            "wind_speed_unit": "mph",
+            "forecast_days": WEATHER_FORECAST_DAYS,
+            "timezone": "auto"
+        })
+        response.raise_for_status()
+        data = response.json()
+        current, daily = data["current"], data["daily"]
+        today = datetime.fromisoformat(daily["time"][0])
+        return {
+            "current": {
+                "temperature": round(current["temperature_2m"]),
+                "condition": WMO_CONDITIONS.get(current["weather_code"], "Unknown"),
+                "humidity": round(current["relative_humidity_2m"]),
+                "wind": f"{round(current['wind_speed_10m'])} mph {COMPASS_POINTS[round(current['wind_direction_10m'] / 45) % 8]}"
+            },
+            "forecast": [
+                {
+                    "day": forecast_day_label(datetime.fromisoformat(day), today),
+                    "high": round(high),
+                    "low": round(low),
+                    "condition": WMO_CONDITIONS.get(code, "Unknown"),
+                    "precipitation_mm": precipitation
+                }
+                for day, high, low, code, precipitation in zip(
+                    daily["time"], daily["temperature_2m_max"], daily["temperature_2m_min"],
+                    daily["weather_code"], daily["precipitation_sum"]
+                )
+            ]
+        }
+    
+    async def hourly_history(self, latitude: float, longitude: float, past_days: int) -> List[Dict[str, Any]]:
+        response = await get_weather_http().get(self.url, params={
+            "latitude": latitude,
+            "longitude": longitude,
+            "hourly": "temperature_2m,precipitation",
+            "past_days": past_days,
+            "forecast_days": 1,
+            "timezone": "GMT"
+        })
+        response.raise_for_status()
+        hourly = response.json()["hourly"]
+        now = datetime.utcnow()
+        return [
+            {"time": datetime.fromisoformat(moment), "temperature": temperature, "precipitation": precipitation or 0.0}
+            for moment, temperature, precipitation in zip(hourly["time"], hourly["temperature_2m"], hourly["precipitation"])
+            if temperature is not None and datetime.fromisoformat(moment) <= now
         ]
-    }
+
+class StubWeatherProvider(WeatherProvider):
+    """Offline provider for tests and local development"""
+    def __init__(self):
+        self.calls = 0
+    
+    async def fetch(self, latitude: float, longitude: float) -> Dict[str, Any]:
+        self.calls += 1
+        return {
+            "current": {"temperature": 22, "condition": "Partly Cloudy", "humidity": 65, "wind": "5 mph NE"},
+            "forecast": [
+                {"day": "Today", "high": 24, "low": 15, "condition": "Sunny", "precipitation_mm": 0.0},
+                {"day": "Tomorrow", "high": 21, "low": 13, "condition": "Cloudy", "precipitation_mm": 0.2},
+                {"day": "Thursday", "high": 19, "low": 11, "condition": "Light Rain", "precipitation_mm": 4.1}
+            ]
+        }
+    
+    async def hourly_history(self, latitude: float, longitude: float, past_days: int) -> List[Dict[str, Any]]:
+        # A plausible UK year: seasonal and daily temperature swings, rain every few days
+        end = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+        hours = np.arange(-past_days * 24, 1)
+        epoch_hours = calendar.timegm(end.timetuple()) // 3600 + hours
+        season = np.cos(2 * np.pi * ((epoch_hours / 24.0) % 365.25 - 200) / 365.25)
+        temperature = 10 + 8 * season + 5 * np.sin(2 * np.pi * ((epoch_hours % 24) - 9) / 24)
+        precipitation = np.where(epoch_hours % 67 < 5, 0.8, 0.0)
+        return [
+            {"time": end + timedelta(hours=int(offset)), "temperature": round(float(t), 1), "precipitation": float(p)}
+            for offset, t, p in zip(hours, temperature, precipitation)
+        ]
+
+WEATHER_PROVIDERS = {"open-meteo": OpenMeteoWeatherProvider, "stub": StubWeatherProvider}
+
+class WeatherCache:
+    """One upstream call per TTL for the whole site, shared across workers through MongoDB.
+
+    Fresh snapshots are served as-is. Once expired, the first caller refreshes
+    while everyone else keeps getting the previous snapshot; if the upstream
+    fails, that stale snapshot keeps being served until it is too old to trust.
+    """
+    def __init__(self, provider: WeatherProvider, latitude: float, longitude: float):
+        self.provider = provider
+        self.key = f"{latitude:.3f},{longitude:.3f}"
+        self.latitude = latitude
+        self.longitude = longitude
+        self.snapshot: Optional[Dict[str, Any]] = None
+        self.refreshing: Optional[asyncio.Task] = None
+        self.metrics = {"requests": 0, "upstream_calls": 0, "upstream_errors": 0, "stale_served": 0}
+    
+    def age(self) -> float:
+        return (datetime.utcnow() - self.snapshot["updated_at"]).total_seconds() if self.snapshot else float("inf")
+    
+    async def refresh(self) -> None:
+        # Another worker may already have refreshed the shared copy
+        stored = await db.weather_snapshots.find_one({"key": self.key}, {"_id": 0})
+        if stored and (datetime.utcnow() - stored["updated_at"]).total_seconds() < WEATHER_TTL_SECONDS:
+            self.snapshot = stored
+            return
+        self.metrics["upstream_calls"] += 1
+        try:
+            data = await self.provider.fetch(self.latitude, self.longitude)
+        except Exception as e:
+            self.metrics["upstream_errors"] += 1
+            logger.warning(f"Weather upstream error: {e}")
+            if stored and (not self.snapshot or stored["updated_at"] > self.snapshot["updated_at"]):
+                self.snapshot = stored
+            return
+        self.snapshot = {"key": self.key, "location": WEATHER_LOCATION, **data, "updated_at": datetime.utcnow()}
+        await db.weather_snapshots.replace_one({"key": self.key}, self.snapshot, upsert=True)
+    
+    def start_refresh(self) -> asyncio.Task:
+        if self.refreshing is None or self.refreshing.done():
+            self.refreshing = asyncio.create_task(self.refresh())
+        return self.refreshing
+    
+    async def get(self) -> Optional[Dict[str, Any]]:
+        self.metrics["requests"] += 1
+        if self.age() >= WEATHER_TTL_SECONDS:
+            refresh = self.start_refresh()
+            if self.age() >= WEATHER_MAX_STALE_SECONDS:
+                # Nothing usable to serve meanwhile, so wait for the refresh
+                await asyncio.shield(refresh)
+        if self.age() >= WEATHER_MAX_STALE_SECONDS:
+            return None
+        stale = self.age() >= WEATHER_TTL_SECONDS
+        if stale:
+            self.metrics["stale_served"] += 1
+        return {**self.snapshot, "stale": stale}
+    
+    def stats(self) -> Dict[str, Any]:
+        return {**self.metrics, "age_seconds": round(self.age(), 1) if self.snapshot else None}
+
+weather_cache = WeatherCache(
+    WEATHER_PROVIDERS.get(WEATHER_PROVIDER, OpenMeteoWeatherProvider)(), WEATHER_LATITUDE, WEATHER_LONGITUDE
+)
+
+# Weather history
+WEATHER_HISTORY_BACKFILL_DAYS = 92  # the furthest back open-meteo's forecast API reaches
+WEATHER_HISTORY_INTERVAL_SECONDS = 3600
+WEATHER_GDD_BASE = 10.0  # °C; most UK vegetables do little growing below this
+WEATHER_HISTORY_LOAD_BATCH = 5000
+
+def epoch_seconds(moment: datetime) -> int:
+    return calendar.timegm(moment.timetuple())
+
+def from_epoch_seconds(seconds: int) -> datetime:
+    return datetime.fromtimestamp(seconds, timezone.utc).replace(tzinfo=None)
+
+async def acquire_lease(name: str, seconds: float) -> bool:
+    """Cross-worker mutual exclusion for periodic jobs; the lease lapses if its holder dies"""
+    now = datetime.utcnow()
+    try:
+        await db.leases.find_one_and_update(
+            {"_id": name, "until": {"$lt": now}},
+            {"$set": {"until": now + timedelta(seconds=seconds), "holder": WORKER_ID}},
+            upsert=True
+        )
+        return True
+    except DuplicateKeyError:
+        return False
+
+class WeatherHistory:
+    """Hourly observations held as numpy columns.
+
+    Daily aggregates are derived once per season and cached; a past season
+    never changes, so only the current one is recomputed as hours arrive.
+    """
+    def __init__(self):
+        self.times = np.empty(0, dtype=np.int64)  # epoch seconds, ascending
+        self.temperature = np.empty(0, dtype=np.float32)
+        self.precipitation = np.empty(0, dtype=np.float32)
+        self.daily_cache: Dict[int, Dict[str, np.ndarray]] = {}
+    
+    def latest(self) -> Optional[datetime]:
+        return from_epoch_seconds(int(self.times[-1])) if len(self.times) else None
+    
+    def extend(self, observations: List[Dict[str, Any]]) -> int:
+        if not observations:
+            return 0
+        times = np.array([epoch_seconds(o["time"]) for o in observations], dtype=np.int64)
+        order = np.argsort(times, kind="stable")
+        times = times[order]
+        keep = times > (self.times[-1] if len(self.times) else -1)
+        if not keep.any():
+            return 0
+        self.times = np.concatenate([self.times, times[keep]])
+        self.temperature = np.concatenate([self.temperature, np.array([o["temperature"] for o in observations], dtype=np.float32)[order][keep]])
+        self.precipitation = np.concatenate([self.precipitation, np.array([o["precipitation"] for o in observations], dtype=np.float32)[order][keep]])
+        added = times[keep]
+        for year in range(from_epoch_seconds(int(added[0])).year, from_epoch_seconds(int(added[-1])).year + 1):
+            self.daily_cache.pop(year, None)
+        return int(keep.sum())
+    
+    def daily(self, year: int) -> Dict[str, np.ndarray]:
+        """Per-day min/max temperature and rainfall for a season, keyed by day of year (0-based)"""
+        if year in self.daily_cache:
+            return self.daily_cache[year]
+        start = epoch_seconds(datetime(year, 1, 1))
+        lo, hi = np.searchsorted(self.times, [start, epoch_seconds(datetime(year + 1, 1, 1))])
+        days = (self.times[lo:hi] - start) // 86400
+        day, first = np.unique(days, return_index=True)
+        if len(day):
+            daily = {
+                "day": day,
+                "tmin": np.minimum.reduceat(self.temperature[lo:hi], first),
+                "tmax": np.maximum.reduceat(self.temperature[lo:hi], first),
+                "rain": np.add.reduceat(self.precipitation[lo:hi], first)
+            }
+        else:
+            daily = {"day": day, "tmin": np.empty(0, np.float32), "tmax": np.empty(0, np.float32), "rain": np.empty(0, np.float32)}
+        self.daily_cache[year] = daily
+        return daily
+    
+    @staticmethod
+    def growing_degree_days(daily: Dict[str, np.ndarray], base: float) -> np.ndarray:
+        return np.clip((daily["tmin"] + daily["tmax"]) / 2 - base, 0, None)
+    
+    def summary(self, year: int, base: float) -> Dict[str, Any]:
+        daily = self.daily(year)
+        day = daily["day"]
+        frost = daily["tmin"] <= 0
+        midsummer = (datetime(year, 7, 1) - datetime(year, 1, 1)).days
+        spring_frosts = day[frost & (day < midsummer)]
+        autumn_frosts = day[frost & (day >= midsummer)]
+        month_starts = np.array([(datetime(year, month, 1) - datetime(year, 1, 1)).days for month in range(1, 13)])
+        month = np.searchsorted(month_starts, day, side="right") - 1
+        as_date = lambda offset: (datetime(year, 1, 1) + timedelta(days=int(offset))).date().isoformat()
+        return {
+            "season": year,
+            "days_recorded": int(len(day)),
+            "first_day": as_date(day[0]) if len(day) else None,
+            "last_day": as_date(day[-1]) if len(day) else None,
+            "gdd_base": base,
+            "growing_degree_days": round(float(self.growing_degree_days(daily, base).sum()), 1),
+            "frost_days": int(frost.sum()),
+            "last_spring_frost": as_date(spring_frosts[-1]) if len(spring_frosts) else None,
+            "first_autumn_frost": as_date(autumn_frosts[0]) if len(autumn_frosts) else None,
+            "rainfall_mm": round(float(daily["rain"].sum()), 1),
+            "monthly_rainfall_mm": [round(float(total), 1) for total in np.bincount(month, weights=daily["rain"], minlength=12)],
+            "min_temperature": round(float(daily["tmin"].min()), 1) if len(day) else None,
+            "max_temperature": round(float(daily["tmax"].max()), 1) if len(day) else None
+        }
+    
+    def annotate(self, dates: List[datetime], base: float = WEATHER_GDD_BASE) -> List[Optional[Dict[str, Any]]]:
+        """Recorded conditions for each date, with the season's growing degree days up to it"""
+        contexts: List[Optional[Dict[str, Any]]] = [None] * len(dates)
+        by_year: Dict[int, List[int]] = {}
+        for position, moment in enumerate(dates):
+            by_year.setdefault(moment.year, []).append(position)
+        for year, positions in by_year.items():
+            daily = self.daily(year)
+            if not len(daily["day"]):
+                continue
+            gdd_to_date = np.cumsum(self.growing_degree_days(daily, base))
+            wanted = np.array([(dates[p] - datetime(year, 1, 1)).days for p in positions])
+            found = np.minimum(np.searchsorted(daily["day"], wanted), len(daily["day"]) - 1)
+            for position, index, day in zip(positions, found, wanted):
+                if daily["day"][index] == day:
+                    contexts[position] = {
+                        "min_temperature": round(float(daily["tmin"][index]), 1),
+                        "max_temperature": round(float(daily["tmax"][index]), 1),
+                        "rainfall_mm": round(float(daily["rain"][index]), 1),
+                        "frost": bool(daily["tmin"][index] <= 0),
+                        "gdd_to_date": round(float(gdd_to_date[index]), 1)
+                    }
+        return contexts
+
+weather_history = WeatherHistory()
+
+async def sync_weather_history() -> int:
+    """Pull observations recorded since the last sync, by this or any other worker"""
+    latest = weather_history.latest()
+    query = {"site": weather_cache.key}
+    if latest:
+        query["time"] = {"$gt": latest}
+    cursor = db.weather_observations.find(
+        query, {"_id": 0, "time": 1, "temperature": 1, "precipitation": 1}
+    ).sort("time", 1).batch_size(WEATHER_HISTORY_LOAD_BATCH)
+    # Appended a batch at a time, so the first load of years of hours never sits in memory as documents
+    added = 0
+    while True:
+        observations = await cursor.to_list(WEATHER_HISTORY_LOAD_BATCH)
+        if not observations:
+            return added
+        added += weather_history.extend(observations)
+
+async def record_weather_history() -> int:
+    """Fetch hourly observations from the provider and store the ones not yet recorded"""
+    latest_doc = await db.weather_observations.find_one({"site": weather_cache.key}, sort=[("time", -1)])
+    latest = latest_doc["time"] if latest_doc else None
+    past_days = WEATHER_HISTORY_BACKFILL_DAYS if latest is None else min(
+        WEATHER_HISTORY_BACKFILL_DAYS, (datetime.utcnow() - latest).days + 1
+    )
+    observations = await weather_cache.provider.hourly_history(weather_cache.latitude, weather_cache.longitude, past_days)
+    new = [{"site": weather_cache.key, **o} for o in observations if latest is None or o["time"] > latest]
+    if new:
+        await db.weather_observations.insert_many(new)
+    return len(new)
+
+async def run_weather_history_recorder() -> None:
+    while True:
+        try:
+            if await acquire_lease("weather_history", WEATHER_HISTORY_INTERVAL_SECONDS - 60):
+                recorded = await record_weather_history()
+                logger.info(f"Recorded {recorded} hourly weather observations")
+            await sync_weather_history()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Weather history error: {e}")
+        await asyncio.sleep(WEATHER_HISTORY_INTERVAL_SECONDS)
+
+def describe_weather(snapshot: Optional[Dict[str, Any]]) -> Optional[str]:
+    if not snapshot:
+        return None
+    return f"{snapshot['current']['condition']}, {snapshot['current']['temperature']}°C"
+
+@api_router.get("/weather")
+async def get_weather(response: Response):
+    snapshot = await weather_cache.get()
+    if snapshot is None:
+        raise HTTPException(status_code=503, detail="Weather is temporarily unavailable")
+    max_age = max(0, int(WEATHER_TTL_SECONDS - weather_cache.age()))
+    response.headers["Cache-Control"] = f"public, max-age={max_age}"
+    snapshot.pop("key", None)
+    return snapshot
+
+@api_router.get("/admin/weather/metrics")
+async def get_weather_metrics(current_user: User = Depends(get_admin_user)):
+    return {**weather_cache.stats(), "observations": int(len(weather_history.times))}
+
+@api_router.get("/weather/history")
+async def get_weather_history(
+    season: Optional[int] = Query(None, ge=1970, le=2100),
+    base: float = Query(WEATHER_GDD_BASE, ge=0, le=20)
+):
+    """Season summary: growing degree days, frost dates and rainfall"""
+    return weather_history.summary(season or datetime.utcnow().year, base)
+
+# Diary tag facets: per-user and site-wide tag counts kept current on every diary write
+SITE_FACET_SCOPE = "site"
+
+def normalize_tags(tags: List[str]) -> List[str]:
+    """Tags as stored and counted: trimmed, lower-cased, each once, in the order given"""
+    return list(dict.fromkeys(tag.strip().lower() for tag in tags if tag.strip()))
+
+async def adjust_tag_facets(user_id: str, removed: List[str], added: List[str]) -> None:
+    removed, added = set(removed) - set(added), set(added) - set(removed)
+    if not removed and not added:
+        return
+    operations = [
+        UpdateOne({"scope": scope, "tag": tag}, {"$inc": {"count": step}}, upsert=True)
+        for tags, step in ((added, 1), (removed, -1)) for tag in tags for scope in (SITE_FACET_SCOPE, user_id)
+    ]
+    await db.tag_facets.bulk_write(operations, ordered=False)
+    if removed:
+        await db.tag_facets.delete_many({"scope": {"$in": [SITE_FACET_SCOPE, user_id]}, "tag": {"$in": list(removed)}, "count": {"$lte": 0}})
+
+async def rebuild_tag_facets() -> None:
+    """Count every diary entry's tags from scratch; one projected pass, then one bulk write"""
+    counts: Dict[tuple, int] = {}
+    async for entry in db.diary_entries.find({"tags.0": {"$exists": True}}, {"_id": 0, "user_id": 1, "tags": 1}):
+        for tag in normalize_tags(entry["tags"]):
+            for scope in (SITE_FACET_SCOPE, entry["user_id"]):
+                counts[scope, tag] = counts.get((scope, tag), 0) + 1
+    await db.tag_facets.delete_many({})
+    if counts:
+        await db.tag_facets.bulk_write([
+            UpdateOne({"scope": scope, "tag": tag}, {"$set": {"count": count}}, upsert=True) for (scope, tag), count in counts.items()
+        ], ordered=False)
 
 # Diary Entries
-@api_router.post("/diary", response_model=DiaryEntry)
-async def create_diary_entry(entry_data: DiaryEntryCreate, current_user: User = Depends(get_current_user)):
-    entry = DiaryEntry(
+async def build_diary_entry(entry_data: DiaryEntryCreate, current_user: User) -> DiaryEntry:
+    return DiaryEntry(
         user_id=current_user.id,
-        **entry_data.dict()
+        weather=describe_weather(await weather_cache.get()),
+        **{**entry_data.dict(), "tags": normalize_tags(entry_data.tags)}
     )
-    await db.diary_entries.insert_one(entry.dict())
+
+@api_router.post("/diary", response_model=DiaryEntry)
+async def create_diary_entry(entry_data: DiaryEntryCreate, current_user: User = Depends(get_current_user)):
+    entry = await build_diary_entry(entry_data, current_user)
+    async with change_seqs() as seq:
+        await db.diary_entries.insert_one({**entry.dict(), "change_seq": seq})
+    await adjust_tag_facets(entry.user_id, [], entry.tags)
+    await update_search_index("diary", entry.id, entry.dict())
     return entry
 
-@api_router.get("/diary", response_model=List[DiaryEntry])
-async def get_diary_entries(plot_number: Optional[str] = None, current_user: User = Depends(get_current_user)):
+@api_router.get("/diary/tags", response_model=List[TagCount])
+async def get_diary_tags(
+    request: Request,
+    scope: str = Query("mine", pattern="^(mine|site)$"),
+    limit: int = Query(100, ge=1, le=500),
+    current_user: User = Depends(get_current_user)
+):
+    """Most used diary tags with their entry counts, for the user's own diary or the whole site"""
+    facets = await db.tag_facets.find(
+        {"scope": current_user.id if scope == "mine" else SITE_FACET_SCOPE, "count": {"$gt": 0}},
+        {"_id": 0, "tag": 1, "count": 1}
+    ).sort([("count", -1), ("tag", 1)]).to_list(limit)
+    return NegotiatedResponse(request, [TagCount(**facet) for facet in facets])
+
+@api_router.patch("/diary/{entry_id}", response_model=DiaryEntry)
+async def update_diary_entry(entry_id: str, entry_data: DiaryEntryUpdate, current_user: User = Depends(get_current_user)):
+    update_data = entry_data.dict(exclude_none=True)
+    if not update_data:
+        raise HTTPException(status_code=400, detail="Nothing to update")
+    if "tags" in update_data:
+        update_data["tags"] = normalize_tags(update_data["tags"])
+    
+    entry = await db.diary_entries.find_one({"id": entry_id}, {"_id": 0, "user_id": 1})
+    if not entry:
+        raise HTTPException(status_code=404, detail="Diary entry not found")
+    if entry["user_id"] != current_user.id and current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Permission denied")
+    
+    async with change_seqs() as seq:
+        # The document as it was before this write gives the exact tags to uncount, even against a concurrent edit
+        previous = await db.diary_entries.find_one_and_update(
+            {"id": entry_id}, {"$set": {**update_data, "change_seq": seq}}, return_document=ReturnDocument.BEFORE
+        )
+    if not previous:
+        raise HTTPException(status_code=404, detail="Diary entry not found")
+    previous.pop("_id", None)
+    updated = DiaryEntry(**{**previous, **update_data})
+    if "tags" in update_data:
+        await adjust_tag_facets(updated.user_id, normalize_tags(previous.get("tags", [])), updated.tags)
+    await update_search_index("diary", updated.id, updated.dict())
+    return updated
+
+@api_router.delete("/diary/{entry_id}")
+async def delete_diary_entry(entry_id: str, current_user: User = Depends(get_current_user)):
+    entry = await db.diary_entries.find_one({"id": entry_id}, {"_id": 0, "user_id": 1})
+    if not entry:
+        raise HTTPException(status_code=404, detail="Diary entry not found")
+    if entry["user_id"] != current_user.id and current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Permission denied")
+    
+    async with change_seqs() as seq:
+        deleted = await db.diary_entries.find_one_and_delete({"id": entry_id}, projection={"_id": 0, "user_id": 1, "tags": 1})
+        if deleted:
+            await record_tombstone("diary", entry_id, seq, deleted["user_id"])
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Diary entry not found")
+    await adjust_tag_facets(deleted["user_id"], normalize_tags(deleted.get("tags", [])), [])
+    await update_search_index("diary", entry_id)
+    return {"message": "Diary entry deleted"}
+
+@api_router.get("/diary", response_model=List[DiaryEntryView])
+async def get_diary_entries(
+    request: Request,
+    plot_number: Optional[str] = None,
+    tag: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
     query = {}
     if plot_number:
         query["plot_number"] = plot_number
     elif current_user.role != "admin":
         query["user_id"] = current_user.id
+    if tag:
+        query["tags"] = tag.strip().lower()
     
     entries = await db.diary_entries.find(query).sort("date", -1).to_list(100)
-    return [DiaryEntry(**entry) for entry in entries]
+    contexts = weather_history.annotate([entry["date"] for entry in entries])
+    return NegotiatedResponse(request, [DiaryEntryView(**entry, weather_context=context) for entry, context in zip(entries, contexts)])
+
+# Harvest analytics
+HARVEST_QUANTITY_RE = re.compile(r"(\d+(?:\.\d+)?)\s*(kg|kilos?|g|grams?|lbs?|pounds?|oz)\b")
+HARVEST_UNIT_KG = {"kg": 1.0, "kilo": 1.0, "kilos": 1.0, "g": 0.001, "gram": 0.001, "grams": 0.001,
+                   "lb": 0.4536, "lbs": 0.4536, "pound": 0.4536, "pounds": 0.4536, "oz": 0.02835}
+HARVEST_MAX_GROWING_DAYS = 366  # a harvest further than this from a sowing isn't from that sowing
+HARVEST_PERCENTILES = (25, 50, 75)
+ENTRY_TYPE_CODES = {"sowing": 0, "harvest": 1}
+
+def harvest_quantity_kg(text: str) -> float:
+    """Weight mentioned in a harvest note ("Lifted 3.5kg of earlies"), or NaN"""
+    match = HARVEST_QUANTITY_RE.search(text.lower())
+    return float(match.group(1)) * HARVEST_UNIT_KG[match.group(2)] if match else float("nan")
+
+def grouped_percentiles(groups: np.ndarray, values: np.ndarray, group_count: int, percentiles=HARVEST_PERCENTILES) -> np.ndarray:
+    """Percentiles of values within each group (NaN for empty groups), all groups in one pass; shape (groups, percentiles)"""
+    keep = ~np.isnan(values)
+    groups, values = groups[keep], values[keep]
+    order = np.lexsort((values, groups))
+    ordered = values[order]
+    counts = np.bincount(groups, minlength=group_count)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    result = np.full((group_count, len(percentiles)), np.nan)
+    has_values = counts > 0
+    for column, percentile in enumerate(percentiles):
+        # Linear interpolation between closest ranks, as np.percentile does
+        position = starts + (counts - 1) * (percentile / 100.0)
+        low = np.floor(position).astype(np.int64)
+        high = np.ceil(position).astype(np.int64)
+        fraction = position - low
+        low, high = low[has_values], high[has_values]
+        result[has_values, column] = ordered[low] + (ordered[high] - ordered[low]) * fraction[has_values]
+    return result
+
+class HarvestColumns:
+    """One season of sowing and harvest diary entries as columns, one row per entry.
+
+    Crops are plant-library names and aliases found in an entry's tags or title;
+    the (entry, crop) pairs are kept as a separate mapping so an entry naming two
+    crops counts once in site and plot totals and once for each crop.
+    """
+    def __init__(self, plants: List[Dict[str, Any]]):
+        self.plant_keys: Dict[str, str] = {}  # stemmed name or alias -> plant name
+        for plant in plants:
+            for label in [plant["name"], *plant.get("aliases", [])]:
+                self.plant_keys.setdefault(" ".join(tokenize(label)), plant["name"])
+        self.plant_keys.pop("", None)
+        self.longest_name = max((key.count(" ") + 1 for key in self.plant_keys), default=1)
+        self.tag_keys: Dict[str, str] = {}
+        self.crops: Dict[str, int] = {}  # plant name -> crop number
+        self.plots: Dict[str, int] = {}
+        self.plot, self.kind, self.day, self.kg = array('i'), array('b'), array('i'), array('d')
+        self.row_entry, self.row_crop = array('i'), array('i')
+    
+    def tag_key(self, tag: str) -> str:
+        # Tags repeat across thousands of entries, so stem each distinct one once
+        if tag not in self.tag_keys:
+            self.tag_keys[tag] = " ".join(tokenize(tag))
+        return self.tag_keys[tag]
+    
+    def crop_names(self, entry: Dict[str, Any]) -> set:
+        """Plants named by the entry's tags or mentioned in its title"""
+        names = {self.plant_keys[key] for key in map(self.tag_key, entry.get("tags") or []) if key in self.plant_keys}
+        tokens = tokenize(entry.get("title", ""))
+        for size in range(1, self.longest_name + 1):
+            for start in range(len(tokens) - size + 1):
+                phrase = " ".join(tokens[start:start + size])
+                if phrase in self.plant_keys:
+                    names.add(self.plant_keys[phrase])
+        return names
+    
+    def add(self, entry: Dict[str, Any]) -> None:
+        kind = ENTRY_TYPE_CODES[entry["entry_type"]]
+        number = len(self.kind)
+        self.plot.append(self.plots.setdefault(entry.get("plot_number") or "", len(self.plots)))
+        self.kind.append(kind)
+        self.day.append((entry["date"] - datetime(1970, 1, 1)).days)
+        self.kg.append(harvest_quantity_kg(entry.get("title", "")) if kind else float("nan"))
+        for name in self.crop_names(entry):
+            self.row_entry.append(number)
+            self.row_crop.append(self.crops.setdefault(name, len(self.crops)))
+    
+    def arrays(self) -> tuple:
+        """Entry columns (plot, kind, day, kg) and the (entry, crop) mapping"""
+        as_int = lambda values: np.frombuffer(values, dtype=np.int32).astype(np.int64)
+        return (as_int(self.plot), np.frombuffer(self.kind, dtype=np.int8), as_int(self.day), np.frombuffer(self.kg, dtype=np.float64),
+                as_int(self.row_entry), as_int(self.row_crop))
+
+def days_to_harvest(crop: np.ndarray, plot: np.ndarray, kind: np.ndarray, day: np.ndarray, crop_count: int) -> tuple:
+    """Pair each sowing with the first harvest of the same crop on the same plot after it; returns (crops, days, harvest days)"""
+    group = plot * crop_count + crop
+    sown, harvested = kind == 0, kind == 1
+    # Composite (group, day) keys keep groups apart while searchsorted walks every harvest at once
+    span = int(day.max() - day.min()) + 1 if len(day) else 1
+    offset = day - (day.min() if len(day) else 0)
+    sow_keys = np.sort(group[sown] * span + offset[sown])
+    harvest_keys = np.sort(group[harvested] * span + offset[harvested])
+    if not len(sow_keys) or not len(harvest_keys):
+        return np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0, np.int64)
+    latest_sowing = np.searchsorted(sow_keys, harvest_keys, side="right") - 1
+    valid = latest_sowing >= 0
+    harvest_keys, latest_sowing = harvest_keys[valid], latest_sowing[valid]
+    matched = sow_keys[latest_sowing]
+    same_group = matched // span == harvest_keys // span
+    harvest_keys, latest_sowing, matched = harvest_keys[same_group], latest_sowing[same_group], matched[same_group]
+    # Harvest keys are sorted, so the first occurrence of each sowing is its first harvest
+    _, first = np.unique(latest_sowing, return_index=True)
+    days = harvest_keys[first] - matched[first]
+    in_range = days <= HARVEST_MAX_GROWING_DAYS
+    harvest_days = harvest_keys[first] % span + (day.min() if len(day) else 0)
+    return (matched[first] // span % crop_count)[in_range], days[in_range], harvest_days[in_range]
+
+def compute_harvest_analytics(columns: HarvestColumns, season: int) -> Dict[str, Any]:
+    entry_plot, entry_kind, entry_day, entry_kg, row_entry, crop = columns.arrays()
+    crop_count, plot_count = len(columns.crops), len(columns.plots)
+    season_start = (datetime(season, 1, 1) - datetime(1970, 1, 1)).days
+    entry_harvest = (entry_kind == 1) & (entry_day >= season_start)
+    entry_weighed = entry_harvest & ~np.isnan(entry_kg)
+    
+    # Per-crop rows; a weight is only credited to a crop when the entry names that crop alone
+    plot, kind, day = entry_plot[row_entry], entry_kind[row_entry], entry_day[row_entry]
+    single_crop = np.bincount(row_entry, minlength=len(entry_kind))[row_entry] == 1
+    kg = np.where(single_crop, entry_kg[row_entry], np.nan)
+    in_season = day >= season_start
+    season_harvest = (kind == 1) & in_season
+    
+    sowings = np.bincount(crop[(kind == 0) & in_season], minlength=crop_count)
+    harvests = np.bincount(crop[season_harvest], minlength=crop_count)
+    has_kg = season_harvest & ~np.isnan(kg)
+    yield_kg = np.bincount(crop[has_kg], weights=kg[has_kg], minlength=crop_count)
+    weighed = np.bincount(crop[has_kg], minlength=crop_count)
+    yield_percentiles = grouped_percentiles(crop[season_harvest], kg[season_harvest], crop_count)
+    # Plots that harvested each crop: distinct (crop, plot) pairs
+    crop_plots = np.unique(crop[season_harvest] * max(plot_count, 1) + plot[season_harvest])
+    plots_harvesting = np.bincount(crop_plots // max(plot_count, 1), minlength=crop_count)
+    interval_crops, interval_days, interval_ends = days_to_harvest(crop, plot, kind, day, crop_count)
+    # Only count sowing-to-harvest intervals that finished this season
+    interval_crops, interval_days = interval_crops[interval_ends >= season_start], interval_days[interval_ends >= season_start]
+    interval_percentiles = grouped_percentiles(interval_crops, interval_days.astype(np.float64), crop_count)
+    first_harvest = np.full(crop_count, np.iinfo(np.int64).max)
+    np.minimum.at(first_harvest, crop[season_harvest], day[season_harvest])
+    last_harvest = np.full(crop_count, np.iinfo(np.int64).min)
+    np.maximum.at(last_harvest, crop[season_harvest], day[season_harvest])
+    harvest_months = day[season_harvest].astype("datetime64[D]").astype("datetime64[M]").astype(np.int64) % 12
+    monthly = np.zeros((crop_count, 12), dtype=np.int64)
+    np.add.at(monthly, (crop[season_harvest], harvest_months), 1)
+    
+    # Site and plot totals count each diary entry once, whatever it names
+    plot_harvests = np.bincount(entry_plot[entry_harvest], minlength=plot_count)
+    plot_yield = np.bincount(entry_plot[entry_weighed], weights=entry_kg[entry_weighed], minlength=plot_count)
+    plot_crops = np.bincount(crop_plots % max(plot_count, 1), minlength=plot_count) if len(crop_plots) else np.zeros(plot_count, np.int64)
+    
+    as_date = lambda offset: (datetime(1970, 1, 1) + timedelta(days=int(offset))).date().isoformat()
+    as_float = lambda value: None if np.isnan(value) else round(float(value), 2)
+    crops = []
+    for name, index in sorted(columns.crops.items(), key=lambda item: -harvests[item[1]]):
+        if not sowings[index] and not harvests[index]:
+            continue
+        crops.append({
+            "crop": name,
+            "sowings": int(sowings[index]),
+            "harvests": int(harvests[index]),
+            "plots": int(plots_harvesting[index]),
+            "yield_kg": round(float(yield_kg[index]), 2),
+            "weighed_harvests": int(weighed[index]),
+            "harvest_kg_percentiles": {f"p{p}": as_float(v) for p, v in zip(HARVEST_PERCENTILES, yield_percentiles[index])},
+            "days_to_harvest": {f"p{p}": as_float(v) for p, v in zip(HARVEST_PERCENTILES, interval_percentiles[index])},
+            "first_harvest": as_date(first_harvest[index]) if harvests[index] else None,
+            "last_harvest": as_date(last_harvest[index]) if harvests[index] else None,
+            "harvests_by_month": monthly[index].tolist()
+        })
+    plots = [
+        {"plot_number": number, "harvests": int(plot_harvests[index]), "yield_kg": round(float(plot_yield[index]), 2), "crops": int(plot_crops[index])}
+        for number, index in sorted(columns.plots.items(), key=lambda item: -plot_yield[item[1]])
+        if plot_harvests[index]
+    ]
+    return {
+        "season": season,
+        "harvests": int(entry_harvest.sum()),
+        "sowings": int(((entry_kind == 0) & (entry_day >= season_start)).sum()),
+        "yield_kg": round(float(entry_kg[entry_weighed].sum()), 2),
+        "crops": crops,
+        "plots": plots,
+        "computed_at": datetime.utcnow()
+    }
+
+harvest_analytics_cache: Dict[int, tuple] = {}  # season -> (data version, result)
+
+async def load_harvest_columns(season: int) -> HarvestColumns:
+    """One projected pass over the season's sowings and harvests; sowings from late last year can lead to this year's harvests"""
+    columns = HarvestColumns(plant_library.plants)
+    cursor = db.diary_entries.find(
+        {"entry_type": {"$in": list(ENTRY_TYPE_CODES)},
+         "date": {"$gte": datetime(season, 1, 1) - timedelta(days=HARVEST_MAX_GROWING_DAYS), "$lt": datetime(season + 1, 1, 1)}},
+        {"_id": 0, "entry_type": 1, "date": 1, "plot_number": 1, "tags": 1, "title": 1}
+    ).batch_size(5000)
+    async for entry in cursor:
+        columns.add(entry)
+    return columns
+
+@api_router.get("/analytics/harvest")
+async def get_harvest_analytics(
+    request: Request,
+    season: Optional[int] = Query(None, ge=2000, le=2100),
+    crop: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """Site-wide sowing and harvest statistics per crop for a season; admins also get the per-plot breakdown"""
+    season = season or datetime.utcnow().year
+    # Any diary write or delete, or a change to the crop names, moves the version
+    latest = await db.diary_entries.find_one({}, {"_id": 0, "change_seq": 1}, sort=[("change_seq", -1)])
+    version = ((latest or {}).get("change_seq", 0), await latest_tombstone_seq("diary"), plant_library.etag)
+    cached = harvest_analytics_cache.get(season)
+    if cached and cached[0] == version:
+        result = cached[1]
+    else:
+        columns = await load_harvest_columns(season)
+        result = await asyncio.to_thread(compute_harvest_analytics, columns, season)
+        harvest_analytics_cache[season] = (version, result)
+    if crop:
+        crop_key = " ".join(tokenize(crop))
+        result = {**result, "crops": [row for row in result["crops"] if " ".join(tokenize(row["crop"])) == crop_key]}
+    if current_user.role != "admin":
+        # Plot yields come from members' private diaries
+        result = {key: value for key, value in result.items() if key != "plots"}
+    return NegotiatedResponse(request, result)
 
 # Events
 @api_router.post("/events", response_model=Event)
@@ -413,34 +2675,195 @@ async def create_event(event_data: EventCreate, current_user: User = Depends(get
         created_by=current_user.id,
         **event_data.dict()
     )
-    await db.events.insert_one(event.dict())
+    event.date = to_utc_naive(event.date)
+    if event.recurrence:
+        count = event.recurrence.count
+        if (event.recurrence.freq not in RECURRENCE_FREQUENCIES or event.recurrence.interval < 1
+                or (count is not None and not 1 <= count <= RECURRENCE_MAX_COUNT)):
+            raise HTTPException(status_code=400, detail="Invalid recurrence rule")
+        event.recurrence_end = calculate_recurrence_end(event.date, event.recurrence)
+    async with change_seqs() as seq:
+        await db.events.insert_one({**event.dict(), "change_seq": seq})
+    await update_search_index("event", event.id, event.dict())
+    await broker.publish(COMMUNITY_TOPIC, "event.created", event.dict())
     return event
 
-@api_router.get("/events", response_model=List[Event])
-async def get_events(current_user: User = Depends(get_current_user)):
-    events = await db.events.find().sort("date", 1).to_list(100)
-    return [Event(**event) for event in events]
+async def find_events_in_window(window_start: datetime, window_end: Optional[datetime], limit: int) -> List[Dict[str, Any]]:
+    """One-off events plus lazily expanded recurring occurrences, ascending by date"""
+    one_off_query: Dict[str, Any] = {"recurrence": None, "date": {"$gte": window_start}}
+    if window_end:
+        one_off_query["date"]["$lt"] = window_end
+    events = await db.events.find(one_off_query).sort("date", 1).to_list(limit)
+    
+    # Recurring events are stored once, so the open-ended expansion needs a horizon
+    expansion_end = window_end or window_start + timedelta(days=DEFAULT_EVENT_WINDOW_DAYS)
+    if events and not window_end and len(events) == limit:
+        expansion_end = min(expansion_end, events[-1]["date"] + timedelta(seconds=1))
+    series_list = await db.events.find({
+        "recurrence.freq": {"$in": list(RECURRENCE_FREQUENCIES)},
+        "date": {"$lt": expansion_end},
+        "$or": [{"recurrence_end": None}, {"recurrence_end": {"$gte": window_start}}]
+    }).to_list(None)
+    
+    occurrences = []
+    for series in series_list:
+        occurrences.extend(expand_event(series, window_start, expansion_end))
+    if occurrences:
+        rsvps: Dict[tuple, List[str]] = {}
+        cursor = db.event_rsvps.find({
+            "event_id": {"$in": [series["id"] for series in series_list]},
+            "occurrence": {"$gte": min(o["occurrence_start"] for o in occurrences),
+                           "$lte": max(o["occurrence_start"] for o in occurrences)}
+        })
+        async for rsvp in cursor:
+            rsvps.setdefault((rsvp["event_id"], rsvp["occurrence"]), []).append(rsvp["user_id"])
+        for occurrence in occurrences:
+            occurrence["rsvp_list"] = rsvps.get((occurrence["id"], occurrence["occurrence_start"]), [])
+    
+    events.extend(occurrences)
+    events.sort(key=lambda event: event["date"])
+    return events[:limit]
+
+@api_router.get("/events", response_model=List[Event])
+async def get_events(
+    request: Request,
+    from_date: Optional[datetime] = Query(None, alias="from"),
+    to_date: Optional[datetime] = Query(None, alias="to"),
+    limit: int = Query(100, ge=1, le=500),
+    current_user: User = Depends(get_current_user)
+):
+    # Default to upcoming events so history never crowds them out
+    window_start = to_utc_naive(from_date) or datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    window_end = to_utc_naive(to_date)
+    if window_end and window_end <= window_start:
+        raise HTTPException(status_code=400, detail="'to' must be after 'from'")
+    
+    events = await find_events_in_window(window_start, window_end, limit)
+    return NegotiatedResponse(request, [Event(**event) for event in events])
+
+@api_router.post("/events/{event_id}/exceptions", response_model=Event)
+async def set_event_exception(event_id: str, exception: EventException, current_user: User = Depends(get_admin_user)):
+    event = await db.events.find_one({"id": event_id})
+    if not event:
+        raise HTTPException(status_code=404, detail="Event not found")
+    if not event.get("recurrence"):
+        raise HTTPException(status_code=400, detail="Event is not recurring")
+    
+    exception.occurrence = to_utc_naive(exception.occurrence)
+    exception.date = to_utc_naive(exception.date)
+    if not is_event_occurrence(event, exception.occurrence):
+        raise HTTPException(status_code=400, detail="No occurrence at that time")
+    
+    exceptions = [exc for exc in event.get("exceptions", []) if exc["occurrence"] != exception.occurrence]
+    exceptions.append(exception.dict())
+    async with change_seqs() as seq:
+        await db.events.update_one({"id": event_id}, {"$set": {"exceptions": exceptions, "change_seq": seq}})
+    event["exceptions"] = exceptions
+    return Event(**event)
+
+def rsvp_id(event_id: str, occurrence: datetime, user_id: str) -> str:
+    """Occurrence RSVPs get a stable id so delta sync can name them, including in tombstones"""
+    return f"{event_id}:{occurrence.isoformat()}:{user_id}"
+
+def check_rsvp_occurrence(event: Dict[str, Any], occurrence: Optional[datetime]) -> datetime:
+    occurrence = to_utc_naive(occurrence)
+    if not occurrence or not is_event_occurrence(event, occurrence):
+        raise HTTPException(status_code=400, detail="A valid occurrence is required for recurring events")
+    if any(exc["occurrence"] == occurrence and exc.get("cancelled") for exc in event.get("exceptions", [])):
+        raise HTTPException(status_code=400, detail="This occurrence has been cancelled")
+    return occurrence
 
 @api_router.post("/events/{event_id}/rsvp")
-async def rsvp_event(event_id: str, current_user: User = Depends(get_current_user)):
+async def rsvp_event(event_id: str, occurrence: Optional[datetime] = None, current_user: User = Depends(get_current_user)):
     event = await db.events.find_one({"id": event_id})
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
     
-    if current_user.id in event['rsvp_list']:
+    if event.get("recurrence"):
+        # Occurrence RSVPs live in their own collection instead of one list per occurrence
+        occurrence = check_rsvp_occurrence(event, occurrence)
+        rsvp_key = {"event_id": event_id, "occurrence": occurrence, "user_id": current_user.id}
+        async with change_seqs() as seq:
+            try:
+                await db.event_rsvps.insert_one({
+                    **rsvp_key, "id": rsvp_id(event_id, occurrence, current_user.id), "created_at": datetime.utcnow(), "change_seq": seq
+                })
+                rsvp = True
+            except DuplicateKeyError:
+                deleted = await db.event_rsvps.find_one_and_delete(rsvp_key, projection={"_id": 0, "id": 1})
+                if deleted:
+                    await record_tombstone("rsvps", deleted["id"], seq)
+                rsvp = False
+    elif current_user.id in event['rsvp_list']:
         # Remove RSVP
-        await db.events.update_one(
-            {"id": event_id},
-            {"$pull": {"rsvp_list": current_user.id}}
-        )
-        return {"message": "RSVP removed", "rsvp": False}
+        async with change_seqs() as seq:
+            await db.events.update_one(
+                {"id": event_id},
+                {"$pull": {"rsvp_list": current_user.id}, "$set": {"change_seq": seq}}
+            )
+        rsvp = False
     else:
         # Add RSVP
-        await db.events.update_one(
-            {"id": event_id},
-            {"$addToSet": {"rsvp_list": current_user.id}}
-        )
-        return {"message": "RSVP confirmed", "rsvp": True}
+        async with change_seqs() as seq:
+            await db.events.update_one(
+                {"id": event_id},
+                {"$addToSet": {"rsvp_list": current_user.id}, "$set": {"change_seq": seq}}
+            )
+        rsvp = True
+    
+    await broker.publish(COMMUNITY_TOPIC, "event.rsvp", {
+        "event_id": event_id, "occurrence": occurrence, "user_id": current_user.id, "rsvp": rsvp
+    })
+    return {"message": "RSVP confirmed" if rsvp else "RSVP removed", "rsvp": rsvp}
+
+# Calendar Feeds
+@api_router.get("/calendar/token")
+async def get_calendar_feed_urls(current_user: User = Depends(get_current_user)):
+    return {
+        "member_url": f"/api/calendar/{sign_calendar_subject(current_user.id)}.ics",
+        "site_url": f"/api/calendar/{sign_calendar_subject('site')}.ics"
+    }
+
+async def calendar_feed_version() -> tuple:
+    """Newest write or delete among events (RSVPs included) and tasks, as every worker sees it"""
+    latest = []
+    for collection in ("events", "tasks"):
+        document = await db[collection].find_one({}, {"_id": 0, "change_seq": 1}, sort=[("change_seq", -1)])
+        latest.append((document or {}).get("change_seq", 0))
+    tombstone = await db.tombstones.find_one(
+        {"collection": {"$in": ["events", "tasks"]}}, {"_id": 0, "change_seq": 1}, sort=[("change_seq", -1)]
+    )
+    return (*latest, (tombstone or {}).get("change_seq", 0))
+
+@api_router.get("/calendar/{token}.ics")
+async def get_calendar_feed(token: str, request: Request):
+    subject = verify_calendar_token(token)
+    if not subject:
+        raise HTTPException(status_code=404, detail="Calendar not found")
+    
+    versions = await calendar_feed_version()
+    cached = ics_cache.get(token)
+    if not cached or cached[0] != versions:
+        since = datetime.utcnow() - timedelta(days=90)
+        events = await db.events.find({"$or": [
+            {"recurrence": None, "date": {"$gte": since}},
+            {"recurrence": {"$ne": None}, "$or": [{"recurrence_end": None}, {"recurrence_end": {"$gte": since}}]}
+        ]}, {"_id": 0, "rsvp_list": 0, "comments": 0}).sort("date", 1).to_list(None)
+        tasks = []
+        if subject != "site":
+            tasks = await db.tasks.find(
+                {"assigned_to": subject, "completed": False, "due_date": {"$ne": None}},
+                {"_id": 0, "id": 1, "title": 1, "description": 1, "due_date": 1, "created_at": 1}
+            ).to_list(None)
+        body = render_ics("Growing Together" if subject == "site" else "Growing Together - My Calendar", events, tasks)
+        cached = (versions, f'"{hashlib.sha256(body).hexdigest()[:32]}"', body)
+        ics_cache[token] = cached
+    
+    _, etag, body = cached
+    headers = {"ETag": etag, "Cache-Control": "private, max-age=900"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="text/calendar; charset=utf-8", headers=headers)
 
 # Community Posts
 @api_router.post("/posts", response_model=CommunityPost)
@@ -450,13 +2873,153 @@ async def create_post(post_data: PostCreate, current_user: User = Depends(get_cu
         username=current_user.username,
         **post_data.dict()
     )
-    await db.posts.insert_one(post.dict())
+    async with change_seqs() as seq:
+        await db.posts.insert_one({**post.dict(), "change_seq": seq})
+    await announce_post(post)
     return post
 
-@api_router.get("/posts", response_model=List[CommunityPost])
-async def get_posts(current_user: User = Depends(get_current_user)):
-    posts = await db.posts.find().sort("created_at", -1).to_list(100)
-    return [CommunityPost(**post) for post in posts]
+async def announce_post(post: CommunityPost) -> None:
+    invalidate_featured_posts()
+    await update_search_index("post", post.id, post.dict())
+    await broker.publish(COMMUNITY_TOPIC, "post.created", post.dict())
+
+async def get_my_reactions(user_id: str, post_ids: List[str]) -> Dict[str, List[str]]:
+    """Map post_id -> reaction types the user has used, for a page of posts"""
+    my_reactions: Dict[str, List[str]] = {}
+    if not post_ids:
+        return my_reactions
+    cursor = db.post_reactions.find(
+        {"user_id": user_id, "post_id": {"$in": post_ids}},
+        {"_id": 0, "post_id": 1, "reaction_type": 1}
+    )
+    async for reaction in cursor:
+        my_reactions.setdefault(reaction["post_id"], []).append(reaction["reaction_type"])
+    return my_reactions
+
+@api_router.get("/posts", response_model=List[CommunityPostView])
+async def get_posts(request: Request, current_user: User = Depends(get_current_user)):
+    posts = await db.posts.find({}, {"reactions": 0}).sort("created_at", -1).to_list(100)
+    my_reactions = await get_my_reactions(current_user.id, [post["id"] for post in posts])
+    return NegotiatedResponse(request, [CommunityPostView(**post, my_reactions=my_reactions.get(post["id"], [])) for post in posts])
+
+async def get_featured_posts() -> List[Dict[str, Any]]:
+    """Pinned posts then announcements, held in memory until the next post write"""
+    featured = featured_posts_cache.get("posts")
+    if featured is None:
+        featured = await db.posts.find(
+            {"$or": [{"is_pinned": True}, {"is_announcement": True}]}, {"_id": 0, "reactions": 0}
+        ).sort("created_at", -1).to_list(50)
+        featured.sort(key=lambda post: not post.get("is_pinned"))  # stable, so recency holds within each group
+        featured_posts_cache["posts"] = featured
+    return featured
+
+@api_router.get("/posts/feed", response_model=FeedPage)
+async def get_feed(request: Request, cursor: Optional[str] = None, limit: int = Query(20, ge=1, le=100), current_user: User = Depends(get_current_user)):
+    query: Dict[str, Any] = {"is_pinned": False, "is_announcement": False}
+    if cursor:
+        created_at, post_id = decode_feed_cursor(cursor)
+        query["$or"] = [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "id": {"$lt": post_id}}
+        ]
+    posts = await db.posts.find(query, {"_id": 0, "reactions": 0}).sort(
+        [("created_at", -1), ("id", -1)]
+    ).limit(limit).to_list(limit)
+    next_cursor = encode_feed_cursor(posts[-1]) if len(posts) == limit else None
+    
+    if not cursor:
+        posts = list(await get_featured_posts()) + posts
+    my_reactions = await get_my_reactions(current_user.id, [post["id"] for post in posts])
+    return NegotiatedResponse(request, FeedPage(
+        posts=[CommunityPostView(**post, my_reactions=my_reactions.get(post["id"], [])) for post in posts],
+        next_cursor=next_cursor
+    ))
+
+@api_router.patch("/posts/{post_id}/feature", response_model=CommunityPost)
+async def feature_post(post_id: str, feature_data: PostFeatureUpdate, current_user: User = Depends(get_admin_user)):
+    update_data = feature_data.dict(exclude_none=True)
+    if not update_data:
+        raise HTTPException(status_code=400, detail="Nothing to update")
+    
+    async with change_seqs() as seq:
+        post = await db.posts.find_one_and_update(
+            {"id": post_id},
+            {"$set": {**update_data, "change_seq": seq}},
+            projection={"_id": 0, "reactions": 0},
+            return_document=ReturnDocument.AFTER
+        )
+    if not post:
+        raise HTTPException(status_code=404, detail="Post not found")
+    invalidate_featured_posts()
+    await broker.publish(COMMUNITY_TOPIC, "post.updated", post)
+    return CommunityPost(**post)
+
+@api_router.post("/posts/{post_id}/comments")
+async def add_comment(post_id: str, comment_data: CommentCreate, current_user: User = Depends(get_current_user)):
+    comment = {
+        "id": str(uuid.uuid4()),
+        "user_id": current_user.id,
+        "username": current_user.username,
+        "content": comment_data.content,
+        "created_at": datetime.utcnow()
+    }
+    async with change_seqs() as seq:
+        post = await db.posts.find_one_and_update(
+            {"id": post_id},
+            {"$push": {"comments": comment}, "$set": {"change_seq": seq}},
+            projection={"_id": 0, "is_pinned": 1, "is_announcement": 1}
+        )
+    if not post:
+        raise HTTPException(status_code=404, detail="Post not found")
+    if post.get("is_pinned") or post.get("is_announcement"):
+        invalidate_featured_posts()
+    await broker.publish(COMMUNITY_TOPIC, "post.comment", {"post_id": post_id, "comment": comment})
+    return comment
+
+@api_router.post("/posts/{post_id}/reactions")
+async def toggle_reaction(post_id: str, reaction_data: ReactionToggle, current_user: User = Depends(get_current_user)):
+    if reaction_data.reaction_type not in REACTION_TYPES:
+        raise HTTPException(status_code=400, detail="Invalid reaction type")
+    
+    post = await db.posts.find_one({"id": post_id}, {"_id": 0, "id": 1, "is_pinned": 1, "is_announcement": 1})
+    if not post:
+        raise HTTPException(status_code=404, detail="Post not found")
+    
+    counter_field = f"reaction_counts.{reaction_data.reaction_type}"
+    reaction = PostReaction(
+        post_id=post_id,
+        user_id=current_user.id,
+        reaction_type=reaction_data.reaction_type
+    )
+    try:
+        # The unique (post_id, user_id, reaction_type) index makes the insert the toggle decision
+        await db.post_reactions.insert_one(reaction.dict())
+        reacted = True
+    except DuplicateKeyError:
+        result = await db.post_reactions.delete_one({
+            "post_id": post_id,
+            "user_id": current_user.id,
+            "reaction_type": reaction_data.reaction_type
+        })
+        reacted = False
+        if result.deleted_count == 0:
+            # A concurrent toggle already removed it and decremented the counter
+            post = await db.posts.find_one({"id": post_id}, {"_id": 0, "reaction_counts": 1})
+            return {"reacted": reacted, "reaction_counts": (post or {}).get("reaction_counts", {})}
+    
+    async with change_seqs() as seq:
+        updated = await db.posts.find_one_and_update(
+            {"id": post_id},
+            {"$inc": {counter_field: 1 if reacted else -1}, "$set": {"change_seq": seq}},
+            projection={"_id": 0, "reaction_counts": 1},
+            return_document=ReturnDocument.AFTER
+        )
+    if post.get("is_pinned") or post.get("is_announcement"):
+        # Only once the counter has moved, so a concurrent read can't re-cache the old counts
+        invalidate_featured_posts()
+    reaction_counts = (updated or {}).get("reaction_counts", {})
+    await broker.publish(COMMUNITY_TOPIC, "post.reaction", {"post_id": post_id, "reaction_counts": reaction_counts})
+    return {"reacted": reacted, "reaction_counts": reaction_counts}
 
 # Tasks
 @api_router.post("/tasks", response_model=Task)
@@ -465,11 +3028,12 @@ async def create_task(task_data: TaskCreate, current_user: User = Depends(get_cu
         created_by=current_user.id,
         **task_data.dict()
     )
-    await db.tasks.insert_one(task.dict())
+    async with change_seqs() as seq:
+        await db.tasks.insert_one({**task.dict(), "change_seq": seq})
     return task
 
 @api_router.get("/tasks", response_model=List[Task])
-async def get_tasks(task_type: Optional[str] = None, current_user: User = Depends(get_current_user)):
+async def get_tasks(request: Request, task_type: Optional[str] = None, current_user: User = Depends(get_current_user)):
     query = {}
     if task_type:
         query["task_type"] = task_type
@@ -477,7 +3041,7 @@ async def get_tasks(task_type: Optional[str] = None, current_user: User = Depend
         query["assigned_to"] = current_user.id
     
     tasks = await db.tasks.find(query).sort("created_at", -1).to_list(100)
-    return [Task(**task) for task in tasks]
+    return NegotiatedResponse(request, [Task(**task) for task in tasks])
 
 @api_router.patch("/tasks/{task_id}/complete")
 async def complete_task(task_id: str, proof_photo: Optional[str] = None, current_user: User = Depends(get_current_user)):
@@ -493,69 +3057,282 @@ async def complete_task(task_id: str, proof_photo: Optional[str] = None, current
     if proof_photo:
         update_data["proof_photo"] = proof_photo
     
-    await db.tasks.update_one(
-        {"id": task_id},
-        {"$set": update_data}
-    )
+    async with change_seqs() as seq:
+        await db.tasks.update_one(
+            {"id": task_id},
+            {"$set": {**update_data, "change_seq": seq}}
+        )
     return {"message": "Task completed"}
 
 # Plants Library
 @api_router.get("/plants", response_model=List[Plant])
-async def get_plants(current_user: User = Depends(get_current_user)):
-    plants = await db.plants.find().to_list(100)
-    return [Plant(**plant) for plant in plants]
+async def get_plants(request: Request, current_user: User = Depends(get_current_user)):
+    snapshot = plant_library
+    use_msgpack = accepts_msgpack(request)
+    etag = snapshot.msgpack_etag if use_msgpack else snapshot.etag
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Accept"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    if use_msgpack:
+        return Response(content=snapshot.msgpack_body, media_type=MSGPACK_MEDIA_TYPES[0], headers=headers)
+    return Response(content=snapshot.body, media_type="application/json", headers=headers)
+
+@api_router.get("/plants/calendar")
+async def get_planting_calendar(month: Optional[int] = Query(None, ge=1, le=12), current_user: User = Depends(get_current_user)):
+    month = month or datetime.utcnow().month
+    return {"month": month, "month_name": calendar.month_name[month], **plant_calendar.for_months([month])}
+
+@api_router.get("/plants/calendar/this-week")
+async def get_planting_calendar_this_week(current_user: User = Depends(get_current_user)):
+    """What to sow, plant out and harvest in the coming seven days"""
+    today = datetime.utcnow().date()
+    months = sorted({today.month, (today + timedelta(days=6)).month})
+    return {"week_start": today, "months": months, **plant_calendar.for_months(months)}
+
+@api_router.get("/plants/suggest")
+async def suggest_plants(q: str = Query(..., min_length=1, max_length=100), limit: int = Query(8, ge=1, le=25), current_user: User = Depends(get_current_user)):
+    return plant_suggest_index.suggest(q, limit)
+
+@api_router.post("/plants", response_model=Plant)
+async def create_plant(plant_data: PlantCreate, current_user: User = Depends(get_admin_user)):
+    plant = Plant(**plant_data.dict())
+    await db.plants.insert_one(plant.dict())
+    await update_search_index("plant", plant.id, plant.dict())
+    await invalidate_plant_library()
+    return plant
+
+def build_plant_prompt(query: AIQueryRequest) -> str:
+    # Prepare the query message
+    prompt = f"Question: {query.question}"
+    
+    if query.plant_name:
+        prompt += f"\nPlant: {query.plant_name}"
+    
+    if query.photo_base64:
+        prompt += "\n\nI've attached a photo of my plant. Please analyze any visible issues and provide specific advice based on what you can see."
+    return prompt
+
+async def ask_plant_expert(query: AIQueryRequest) -> str:
+    return await llm_backend.complete(build_plant_prompt(query), query.photo_base64)
+
+async def produce_plant_advice(query: AIQueryRequest, photo_hash: Optional[str], preprocessed: bool = False) -> Dict[str, Any]:
+    """One upstream call through the bounded pool, cached on success"""
+    ai_breaker.check()
+    started = time.monotonic()
+    if not preprocessed:
+        query = await prepare_ai_query(query)
+    try:
+        advice = await llm_pool.run(lambda: ask_plant_expert(query))
+    except Exception:
+        ai_breaker.record(False)
+        raise
+    ai_breaker.record(True)
+    response = {
+        "advice": advice,
+        "can_save_as_task": True,
+        "suggested_actions": []
+    }
+    await ai_advice_cache.store(query.plant_name, query.question, photo_hash, response, (time.monotonic() - started) * 1000)
+    return response
 
 @api_router.post("/plants/ai-advice")
-async def get_ai_plant_advice(query: AIQueryRequest, current_user: User = Depends(get_current_user)):
+async def get_ai_plant_advice(query: AIQueryRequest, request: Request, current_user: User = Depends(get_current_user)):
+    photo_hash = hash_photo(query.photo_base64) if query.photo_base64 else None
+    cached = await ai_advice_cache.lookup(query.plant_name, query.question, photo_hash)
+    if cached:
+        return cached
+    
+    flight_key = AIAdviceCache.make_key(normalise_question(query.plant_name), normalise_question(query.question), photo_hash)
     try:
-        # Initialize LLM Chat with Emergent LLM key
-        chat = LlmChat(
-            api_key=EMERGENT_LLM_KEY,
-            session_id=f"plant_advice_{uuid.uuid4()}",
-            system_message="You are an expert gardener helping allotment holders with plant care advice. Provide practical, actionable advice in a friendly tone. Include specific steps they can take."
-        ).with_model("openai", "gpt-4o-mini")
-        
-        # Prepare the query message
-        prompt = f"Question: {query.question}"
-        
-        if query.plant_name:
-            prompt += f"\nPlant: {query.plant_name}"
-        
-        # Create user message with optional image
-        file_contents = []
-        if query.photo_base64:
-            prompt += "\n\nI've attached a photo of my plant. Please analyze any visible issues and provide specific advice based on what you can see."
-            # Add image content for vision models
-            image_content = ImageContent(image_base64=query.photo_base64)
-            file_contents.append(image_content)
-        
-        user_message = UserMessage(
-            text=prompt,
-            file_contents=file_contents if file_contents else None
+        response = await run_until_disconnected(
+            request, ai_single_flight.do(flight_key, lambda: produce_plant_advice(query, photo_hash))
         )
+    except ClientDisconnected:
+        return Response(status_code=499)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.warning(f"AI advice error: {e}")
+        return AI_FALLBACK_RESPONSE
+    return {**response, "cached": False}
+
+@api_router.post("/plants/ai-advice/stream")
+async def stream_ai_plant_advice(query: AIQueryRequest, current_user: User = Depends(get_current_user)):
+    """Server-Sent Events: "token" events as the answer is generated, then one "done" event with the full payload"""
+    photo_hash = hash_photo(query.photo_base64) if query.photo_base64 else None
+    cached = await ai_advice_cache.lookup(query.plant_name, query.question, photo_hash)
+    if not cached:
+        query = await prepare_ai_query(query)
+    
+    async def event_source():
+        if cached:
+            yield format_sse("token", {"text": cached["advice"]})
+            yield format_sse("done", cached)
+            return
         
-        # Get AI response
-        response = await chat.send_message(user_message)
+        started = time.monotonic()
+        chunks: List[str] = []
+        try:
+            ai_breaker.check()
+            async with llm_pool.slot():
+                deadline = started + llm_pool.timeout
+                tokens = llm_backend.stream(build_plant_prompt(query), query.photo_base64).__aiter__()
+                while True:
+                    try:
+                        token = await asyncio.wait_for(tokens.__anext__(), max(0.0, deadline - time.monotonic()))
+                    except StopAsyncIteration:
+                        break
+                    chunks.append(token)
+                    yield format_sse("token", {"text": token})
+        except Exception as e:
+            if not isinstance(e, CircuitOpen):
+                ai_breaker.record(False)
+            logger.warning(f"AI advice stream error: {e}")
+            yield format_sse("done", AI_FALLBACK_RESPONSE)
+            return
+        ai_breaker.record(True)
         
-        return {
-            "advice": response,
+        response = {
+            "advice": "".join(chunks),
             "can_save_as_task": True,
             "suggested_actions": []
         }
-        
+        await ai_advice_cache.store(query.plant_name, query.question, photo_hash, response, (time.monotonic() - started) * 1000)
+        yield format_sse("done", {**response, "cached": False})
+    
+    return StreamingResponse(event_source(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
+# AI Advice Jobs
+AI_JOB_WORKERS = int(os.environ.get('AI_JOB_WORKERS', 2))
+AI_JOB_MAX_ATTEMPTS = 3
+AI_JOB_LEASE_SECONDS = 120  # a job whose worker died is picked up again after this
+AI_JOB_POLL_SECONDS = 2
+ai_job_wakeup = asyncio.Event()
+
+def ai_job_view(job: Dict[str, Any]) -> Dict[str, Any]:
+    return AIAdviceJob(**job).dict(exclude={"photo_base64", "lease_until", "available_at"})
+
+async def fail_abandoned_ai_jobs(now: datetime) -> None:
+    """Jobs whose worker died during their last allowed attempt are reported failed rather than retried"""
+    while True:
+        job = await db.ai_advice_jobs.find_one_and_update(
+            {"status": "running", "lease_until": {"$lt": now}, "attempts": {"$gte": AI_JOB_MAX_ATTEMPTS}},
+            {"$set": {"status": "failed", "result": AI_FALLBACK_RESPONSE, "error": "Worker stopped before finishing", "finished_at": now},
+             "$unset": {"photo_base64": "", "lease_until": ""}},
+            projection={"_id": 0, "id": 1, "user_id": 1}
+        )
+        if not job:
+            return
+        await broker.publish(user_topic(job["user_id"]), "ai_advice.completed", {"job_id": job["id"], "status": "failed"})
+
+async def claim_ai_job() -> Optional[Dict[str, Any]]:
+    now = datetime.utcnow()
+    await fail_abandoned_ai_jobs(now)
+    job = await db.ai_advice_jobs.find_one_and_update(
+        {"$or": [
+            {"status": "queued", "available_at": {"$lte": now}},
+            {"status": "running", "lease_until": {"$lt": now}, "attempts": {"$lt": AI_JOB_MAX_ATTEMPTS}}
+        ]},
+        {"$set": {"status": "running", "started_at": now, "lease_until": now + timedelta(seconds=AI_JOB_LEASE_SECONDS)},
+         "$inc": {"attempts": 1}},
+        sort=[("created_at", 1)],
+        return_document=ReturnDocument.AFTER
+    )
+    if job:
+        job.pop("_id", None)
+    return job
+
+async def process_ai_job(job: Dict[str, Any]) -> None:
+    query = AIQueryRequest(plant_name=job.get("plant_name"), question=job["question"], photo_base64=job.get("photo_base64"))
+    flight_key = AIAdviceCache.make_key(normalise_question(query.plant_name), normalise_question(query.question), job.get("photo_hash"))
+    try:
+        result = await ai_single_flight.do(
+            flight_key, lambda: produce_plant_advice(query, job.get("photo_hash"), preprocessed=True)
+        )
+        update = {"$set": {"status": "done", "result": {**result, "cached": False}, "error": None, "finished_at": datetime.utcnow()},
+                  "$unset": {"photo_base64": "", "lease_until": ""}}
     except Exception as e:
-        print(f"AI advice error: {e}")
-        return {
-            "advice": "I'm having trouble connecting to the AI service right now. Here's some general advice: Check your plant's leaves for signs of disease, ensure proper watering (soil should be moist but not waterlogged), and make sure it's getting adequate sunlight for its species. Please try the AI assistant again later.",
-            "can_save_as_task": False,
-            "suggested_actions": ["Check soil moisture", "Inspect leaves for pests", "Verify sunlight requirements"]
-        }
+        if job["attempts"] < AI_JOB_MAX_ATTEMPTS:
+            # Back off so an open circuit breaker isn't hammered by retries
+            retry_at = datetime.utcnow() + timedelta(seconds=30 * job["attempts"])
+            await db.ai_advice_jobs.update_one({"id": job["id"]}, {
+                "$set": {"status": "queued", "available_at": retry_at, "error": str(e)}, "$unset": {"lease_until": ""}
+            })
+            return
+        update = {"$set": {"status": "failed", "result": AI_FALLBACK_RESPONSE, "error": str(e), "finished_at": datetime.utcnow()},
+                  "$unset": {"photo_base64": "", "lease_until": ""}}
+    await db.ai_advice_jobs.update_one({"id": job["id"]}, update)
+    await broker.publish(user_topic(job["user_id"]), "ai_advice.completed", {"job_id": job["id"], "status": update["$set"]["status"]})
+
+async def run_ai_job_worker() -> None:
+    while True:
+        try:
+            job = await claim_ai_job()
+            if job:
+                await process_ai_job(job)
+                continue
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"AI job worker error: {e}")
+        # Sleep until a local enqueue, or poll for jobs queued by other workers and expired leases
+        ai_job_wakeup.clear()
+        try:
+            await asyncio.wait_for(ai_job_wakeup.wait(), AI_JOB_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+@api_router.post("/plants/ai-advice/jobs")
+async def create_ai_advice_job(query: AIQueryRequest, current_user: User = Depends(get_current_user)):
+    photo_hash = hash_photo(query.photo_base64) if query.photo_base64 else None
+    job = AIAdviceJob(user_id=current_user.id, plant_name=query.plant_name, question=query.question, photo_hash=photo_hash)
+    cached = await ai_advice_cache.lookup(query.plant_name, query.question, photo_hash)
+    if cached:
+        job.status, job.result, job.finished_at = "done", cached, datetime.utcnow()
+    else:
+        job.photo_base64 = (await prepare_ai_query(query)).photo_base64
+    await db.ai_advice_jobs.insert_one(job.dict())
+    ai_job_wakeup.set()
+    return ai_job_view(job.dict())
+
+@api_router.get("/plants/ai-advice/jobs")
+async def get_ai_advice_jobs(request: Request, limit: int = Query(50, ge=1, le=200), current_user: User = Depends(get_current_user)):
+    jobs = await db.ai_advice_jobs.find(
+        {"user_id": current_user.id}, {"_id": 0, "photo_base64": 0}
+    ).sort("created_at", -1).to_list(limit)
+    return NegotiatedResponse(request, [ai_job_view(job) for job in jobs])
+
+@api_router.get("/plants/ai-advice/jobs/{job_id}")
+async def get_ai_advice_job(job_id: str, wait: float = Query(0, ge=0, le=30), current_user: User = Depends(get_current_user)):
+    """Fetch a job; with wait=N, long-poll up to N seconds for it to finish"""
+    job_query = {"id": job_id, "user_id": current_user.id}
+    projection = {"_id": 0, "photo_base64": 0}
+    subscription = broker.subscribe([user_topic(current_user.id)]) if wait else None
+    try:
+        job = await db.ai_advice_jobs.find_one(job_query, projection)
+        if not job:
+            raise HTTPException(status_code=404, detail="Job not found")
+        deadline = time.monotonic() + wait
+        while subscription and job["status"] in ("queued", "running") and time.monotonic() < deadline:
+            try:
+                message = await asyncio.wait_for(subscription.queue.get(), deadline - time.monotonic())
+            except asyncio.TimeoutError:
+                break
+            if message["type"] == "resync" or message["data"].get("job_id") == job_id:
+                job = await db.ai_advice_jobs.find_one(job_query, projection)
+    finally:
+        if subscription:
+            broker.unsubscribe(subscription)
+    return ai_job_view(job)
 
 # Admin Routes
 @api_router.get("/admin/users")
-async def get_pending_users(current_user: User = Depends(get_admin_user)):
+async def get_pending_users(request: Request, current_user: User = Depends(get_admin_user)):
     users = await db.users.find({"is_approved": False}).to_list(100)
-    return [{"id": user['id'], "email": user['email'], "username": user['username'], "plot_number": user.get('plot_number')} for user in users]
+    return NegotiatedResponse(request, [{"id": user['id'], "email": user['email'], "username": user['username'], "plot_number": user.get('plot_number')} for user in users])
 
 @api_router.get("/admin/analytics")
 async def get_analytics(current_user: User = Depends(get_admin_user)):
@@ -672,6 +3449,20 @@ async def export_community_data(current_user: User = Depends(get_admin_user)):
         logger.error(f"Export error: {e}")
         raise HTTPException(status_code=500, detail="Failed to export data")
 
+@api_router.post("/admin/plants/reload")
+async def reload_plants(current_user: User = Depends(get_admin_user)):
+    snapshot = await invalidate_plant_library()
+    return {"message": "Plant library reloaded", "plants": len(snapshot.plants), "etag": snapshot.etag}
+
+@api_router.get("/admin/ai/metrics")
+async def get_ai_metrics(current_user: User = Depends(get_admin_user)):
+    return {
+        "cache": ai_advice_cache.stats(),
+        "single_flight": ai_single_flight.stats(),
+        "pool": llm_pool.stats(),
+        "circuit_breaker": ai_breaker.stats()
+    }
+
 @api_router.patch("/admin/users/{user_id}/approve")
 async def approve_user(user_id: str, current_user: User = Depends(get_admin_user)):
     await db.users.update_one(
@@ -682,17 +3473,16 @@ async def approve_user(user_id: str, current_user: User = Depends(get_admin_user
 
 # Plot Inspections API
 @api_router.get("/plots", response_model=List[Plot])
-async def get_plots(current_user: User = Depends(get_current_user)):
+async def get_plots(request: Request, current_user: User = Depends(get_current_user)):
     plots = await db.plots.find().sort("number", 1).to_list(100)
-    return [Plot(**plot) for plot in plots]
+    return NegotiatedResponse(request, [Plot(**plot) for plot in plots])
 
 @api_router.get("/inspections", response_model=List[Inspection])
-async def get_inspections(current_user: User = Depends(get_admin_user)):
+async def get_inspections(request: Request, current_user: User = Depends(get_admin_user)):
     inspections = await db.inspections.find().sort("date", -1).to_list(100)
-    return [Inspection(**inspection) for inspection in inspections]
+    return NegotiatedResponse(request, [Inspection(**inspection) for inspection in inspections])
 
-@api_router.post("/inspections", response_model=Inspection)
-async def create_inspection(inspection_data: InspectionCreate, current_user: User = Depends(get_admin_user)):
+def build_inspection(inspection_data: InspectionCreate, current_user: User) -> Inspection:
     # Calculate score
     score = calculate_inspection_score(inspection_data.use_status, inspection_data.upkeep)
     
@@ -704,15 +3494,14 @@ async def create_inspection(inspection_data: InspectionCreate, current_user: Use
         except:
             pass
     
-    inspection = Inspection(
+    return Inspection(
         assessor_user_id=current_user.id,
         score=score,
         reinspect_by=reinspect_by,
         **inspection_data.dict(exclude={'reinspect_by'})
     )
-    
-    await db.inspections.insert_one(inspection.dict())
-    
+
+async def notify_inspection(inspection: Inspection) -> None:
     # Create member notice if action is required
     if inspection.action != "none":
         plot = await db.plots.find_one({"id": inspection.plot_id})
@@ -723,35 +3512,43 @@ async def create_inspection(inspection_data: InspectionCreate, current_user: Use
                 title=f"Plot {plot.get('number', 'N/A')} Inspection - {inspection.action.title()}",
                 body=f"Your plot has been inspected with result: {inspection.action}. {inspection.notes or ''}"
             )
-            await db.member_notices.insert_one(notice.dict())
-    
+            async with change_seqs() as seq:
+                await db.member_notices.insert_one({**notice.dict(), "change_seq": seq})
+            await broker.publish(user_topic(notice.user_id), "notice.created", notice.dict())
+
+@api_router.post("/inspections", response_model=Inspection)
+async def create_inspection(inspection_data: InspectionCreate, current_user: User = Depends(get_admin_user)):
+    inspection = build_inspection(inspection_data, current_user)
+    await db.inspections.insert_one(inspection.dict())
+    await notify_inspection(inspection)
     return inspection
 
 @api_router.get("/inspections/my-plot", response_model=List[Inspection])
-async def get_my_plot_inspections(current_user: User = Depends(get_current_user)):
+async def get_my_plot_inspections(request: Request, current_user: User = Depends(get_current_user)):
     # Find user's plot
     plot = await db.plots.find_one({"holder_user_id": current_user.id})
     if not plot:
-        return []
+        return NegotiatedResponse(request, [])
     
     inspections = await db.inspections.find({
         "plot_id": plot["id"], 
         "shared_with_member": True
     }).sort("date", -1).to_list(100)
     
-    return [Inspection(**inspection) for inspection in inspections]
+    return NegotiatedResponse(request, [Inspection(**inspection) for inspection in inspections])
 
 @api_router.get("/member-notices", response_model=List[MemberNotice])
-async def get_member_notices(current_user: User = Depends(get_current_user)):
+async def get_member_notices(request: Request, current_user: User = Depends(get_current_user)):
     notices = await db.member_notices.find({"user_id": current_user.id}).sort("created_at", -1).to_list(100)
-    return [MemberNotice(**notice) for notice in notices]
+    return NegotiatedResponse(request, [MemberNotice(**notice) for notice in notices])
 
 @api_router.patch("/member-notices/{notice_id}/acknowledge")
 async def acknowledge_notice(notice_id: str, current_user: User = Depends(get_current_user)):
-    await db.member_notices.update_one(
-        {"id": notice_id, "user_id": current_user.id},
-        {"$set": {"status": "acknowledged", "updated_at": datetime.utcnow()}}
-    )
+    async with change_seqs() as seq:
+        await db.member_notices.update_one(
+            {"id": notice_id, "user_id": current_user.id},
+            {"$set": {"status": "acknowledged", "updated_at": datetime.utcnow(), "change_seq": seq}}
+        )
     return {"message": "Notice acknowledged"}
 
 # Rules System API
@@ -764,15 +3561,15 @@ async def get_active_rules():
 
 @api_router.post("/rules", response_model=RulesDoc)
 async def create_rules(rules_data: RulesCreate, current_user: User = Depends(get_admin_user)):
-    # Deactivate all existing rules
-    await db.rules.update_many({}, {"$set": {"is_active": False}})
-    
     rules = RulesDoc(
         created_by=current_user.id,
         **rules_data.dict()
     )
     
-    await db.rules.insert_one(rules.dict())
+    async with change_seqs(2) as seq:
+        # Deactivate all existing rules
+        await db.rules.update_many({"is_active": True}, {"$set": {"is_active": False, "change_seq": seq}})
+        await db.rules.insert_one({**rules.dict(), "change_seq": seq + 1})
     return rules
 
 @api_router.post("/rules/acknowledge", response_model=RuleAcknowledgement)
@@ -795,7 +3592,7 @@ async def acknowledge_rules(acknowledge_data: AcknowledgeRules, current_user: Us
     return acknowledgement
 
 @api_router.get("/rules/acknowledgements")
-async def get_rule_acknowledgements(rule_id: Optional[str] = None, current_user: User = Depends(get_admin_user)):
+async def get_rule_acknowledgements(request: Request, rule_id: Optional[str] = None, current_user: User = Depends(get_admin_user)):
     query = {}
     if rule_id:
         query["rule_id"] = rule_id
@@ -808,7 +3605,7 @@ async def get_rule_acknowledgements(rule_id: Optional[str] = None, current_user:
         if '_id' in ack_dict:
             del ack_dict['_id']
         result.append(ack_dict)
-    return result
+    return NegotiatedResponse(request, result)
 
 @api_router.get("/rules/my-acknowledgement")
 async def get_my_rule_acknowledgement(rule_id: str, current_user: User = Depends(get_current_user)):
@@ -824,9 +3621,9 @@ async def get_my_rule_acknowledgement(rule_id: str, current_user: User = Depends
 
 # Documents System API
 @api_router.get("/documents", response_model=List[UserDocument])
-async def get_user_documents(current_user: User = Depends(get_current_user)):
+async def get_user_documents(request: Request, current_user: User = Depends(get_current_user)):
     documents = await db.user_documents.find({"user_id": current_user.id}).sort("created_at", -1).to_list(100)
-    return [UserDocument(**doc) for doc in documents]
+    return NegotiatedResponse(request, [UserDocument(**doc) for doc in documents])
 
 @api_router.post("/documents/upload", response_model=UserDocument)
 async def upload_document(document_data: DocumentUpload, current_user: User = Depends(get_current_user)):
@@ -846,11 +3643,12 @@ async def upload_document(document_data: DocumentUpload, current_user: User = De
         **document_data.dict(exclude={'expires_at'})
     )
     
-    await db.user_documents.insert_one(document.dict())
+    async with change_seqs() as seq:
+        await db.user_documents.insert_one({**document.dict(), "change_seq": seq})
     return document
 
 @api_router.get("/admin/documents")
-async def get_all_user_documents(current_user: User = Depends(get_admin_user)):
+async def get_all_user_documents(request: Request, current_user: User = Depends(get_admin_user)):
     # Get all users with their documents
     pipeline = [
         {
@@ -880,7 +3678,7 @@ async def get_all_user_documents(current_user: User = Depends(get_admin_user)):
             for doc in user['documents']:
                 if '_id' in doc:
                     del doc['_id']
-    return users_with_docs
+    return NegotiatedResponse(request, users_with_docs)
 
 @api_router.delete("/documents/{document_id}")
 async def delete_document(document_id: str, current_user: User = Depends(get_current_user)):
@@ -892,13 +3690,753 @@ async def delete_document(document_id: str, current_user: User = Depends(get_cur
     if document["user_id"] != current_user.id and current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Permission denied")
     
-    await db.user_documents.delete_one({"id": document_id})
+    async with change_seqs() as seq:
+        await db.user_documents.delete_one({"id": document_id})
+        await record_tombstone("documents", document_id, seq, document["user_id"])
     return {"message": "Document deleted"}
 
+# Member Chat
+async def get_chat_room(room_id: str, current_user: User) -> ChatRoom:
+    """Load a room the user may access; site and event rooms are created on first use"""
+    room = await db.chat_rooms.find_one({"id": room_id}, {"_id": 0})
+    if not room:
+        if room_id == "site":
+            room = ChatRoom(id="site", kind="site", name="Site chat").dict()
+        elif room_id.startswith("event:"):
+            event = await db.events.find_one({"id": room_id[len("event:"):]}, {"_id": 0, "id": 1, "title": 1})
+            if not event:
+                raise HTTPException(status_code=404, detail="Chat room not found")
+            room = ChatRoom(id=room_id, kind="event", name=event["title"], event_id=event["id"]).dict()
+        else:
+            raise HTTPException(status_code=404, detail="Chat room not found")
+        # last_message_at stays unset until the first message so $max can take over
+        room.pop("last_message_at")
+        await db.chat_rooms.update_one({"id": room_id}, {"$setOnInsert": room}, upsert=True)
+    if room["kind"] == "direct" and current_user.id not in room["member_ids"]:
+        raise HTTPException(status_code=403, detail="Permission denied")
+    return ChatRoom(**room)
+
+async def send_chat_message(room: ChatRoom, current_user: User, content: str) -> ChatMessage:
+    content = content.strip()
+    if not content or len(content) > CHAT_MESSAGE_MAX_LENGTH:
+        raise HTTPException(status_code=400, detail="Invalid message")
+    
+    message = ChatMessage(room_id=room.id, user_id=current_user.id, username=current_user.username, content=content)
+    bucket_update = {
+        "$push": {"messages": message.dict(exclude={"room_id"})},
+        "$inc": {"count": 1}
+    }
+    bucket_key = {"room_id": room.id, "bucket": chat_bucket(message.created_at)}
+    try:
+        await db.chat_buckets.update_one(bucket_key, bucket_update, upsert=True)
+    except DuplicateKeyError:
+        # Lost the race to create this hour's bucket; it exists now
+        await db.chat_buckets.update_one(bucket_key, bucket_update)
+    await db.chat_rooms.update_one({"id": room.id}, {"$max": {"last_message_at": message.created_at}})
+    await broker.publish(chat_topic(room.id), "chat.message", message.dict())
+    return message
+
+async def mark_chat_read(room: ChatRoom, current_user: User, last_read_at: datetime) -> datetime:
+    """Read receipts are a per-user high-water mark that only moves forward"""
+    receipt = await db.chat_reads.find_one_and_update(
+        {"room_id": room.id, "user_id": current_user.id},
+        {"$max": {"last_read_at": to_utc_naive(last_read_at)}},
+        projection={"_id": 0, "last_read_at": 1},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    await broker.publish(chat_topic(room.id), "chat.read", {
+        "room_id": room.id, "user_id": current_user.id, "last_read_at": receipt["last_read_at"]
+    })
+    return receipt["last_read_at"]
+
+@api_router.get("/chat/rooms")
+async def get_chat_rooms(request: Request, current_user: User = Depends(get_current_user)):
+    await get_chat_room("site", current_user)
+    rooms = await db.chat_rooms.find(
+        {"$or": [{"kind": {"$ne": "direct"}}, {"member_ids": current_user.id}]}, {"_id": 0}
+    ).sort("last_message_at", -1).to_list(200)
+    reads = {
+        read["room_id"]: read["last_read_at"]
+        async for read in db.chat_reads.find({"user_id": current_user.id}, {"_id": 0, "room_id": 1, "last_read_at": 1})
+    }
+    result = []
+    for room in rooms:
+        last_read_at = reads.get(room["id"])
+        has_unread = bool(room.get("last_message_at")) and (last_read_at is None or room["last_message_at"] > last_read_at)
+        result.append({**ChatRoom(**room).dict(), "last_read_at": last_read_at, "has_unread": has_unread})
+    return NegotiatedResponse(request, result)
+
+@api_router.post("/chat/direct", response_model=ChatRoom)
+async def open_direct_chat(room_data: DirectRoomCreate, current_user: User = Depends(get_current_user)):
+    if room_data.user_id == current_user.id:
+        raise HTTPException(status_code=400, detail="Cannot open a direct chat with yourself")
+    other = await db.users.find_one({"id": room_data.user_id}, {"_id": 0, "id": 1, "username": 1})
+    if not other:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    room = ChatRoom(
+        id=direct_room_id(current_user.id, other["id"]),
+        kind="direct",
+        name=f"{current_user.username} & {other['username']}",
+        member_ids=sorted([current_user.id, other["id"]])
+    )
+    await db.chat_rooms.update_one({"id": room.id}, {"$setOnInsert": room.dict(exclude={"last_message_at"})}, upsert=True)
+    return await get_chat_room(room.id, current_user)
+
+@api_router.get("/chat/rooms/{room_id}/messages", response_model=ChatHistoryPage)
+async def get_chat_messages(request: Request, room_id: str, cursor: Optional[str] = None, limit: int = Query(50, ge=1, le=200), current_user: User = Depends(get_current_user)):
+    """Newest-first pages of history, read a few hourly bucket documents at a time"""
+    room = await get_chat_room(room_id, current_user)
+    bucket_query: Dict[str, Any] = {"room_id": room.id}
+    before = None
+    if cursor:
+        before = decode_feed_cursor(cursor)
+        bucket_query["bucket"] = {"$lte": chat_bucket(before[0])}
+    
+    messages: List[Dict[str, Any]] = []
+    buckets = db.chat_buckets.find(bucket_query, {"_id": 0, "messages": 1}).sort("bucket", -1).batch_size(CHAT_HISTORY_BUCKET_BATCH)
+    async for bucket in buckets:
+        for message in reversed(bucket["messages"]):
+            if before and (message["created_at"], message["id"]) >= before:
+                continue
+            messages.append(message)
+        if len(messages) >= limit:
+            break
+    messages = messages[:limit]
+    next_cursor = encode_feed_cursor(messages[-1]) if len(messages) == limit else None
+    return NegotiatedResponse(request, ChatHistoryPage(
+        messages=[ChatMessage(room_id=room.id, **message) for message in reversed(messages)],
+        next_cursor=next_cursor
+    ))
+
+@api_router.post("/chat/rooms/{room_id}/messages", response_model=ChatMessage)
+async def post_chat_message(room_id: str, message_data: ChatMessageCreate, current_user: User = Depends(get_current_user)):
+    room = await get_chat_room(room_id, current_user)
+    return await send_chat_message(room, current_user, message_data.content)
+
+@api_router.post("/chat/rooms/{room_id}/read")
+async def mark_chat_room_read(room_id: str, read_data: ChatReadUpdate, current_user: User = Depends(get_current_user)):
+    room = await get_chat_room(room_id, current_user)
+    return {"last_read_at": await mark_chat_read(room, current_user, read_data.last_read_at)}
+
+@api_router.get("/chat/rooms/{room_id}/reads")
+async def get_chat_room_reads(request: Request, room_id: str, current_user: User = Depends(get_current_user)):
+    room = await get_chat_room(room_id, current_user)
+    return NegotiatedResponse(request, await db.chat_reads.find({"room_id": room.id}, {"_id": 0}).to_list(1000))
+
+@api_router.websocket("/chat/rooms/{room_id}/ws")
+async def chat_websocket(websocket: WebSocket, room_id: str, token: str):
+    """Live room delivery; clients send {"type": "message"|"read", ...} frames"""
+    try:
+        current_user = await get_user_from_token(token)
+        room = await get_chat_room(room_id, current_user)
+    except HTTPException:
+        await websocket.close(code=4403)
+        return
+    
+    await websocket.accept()
+    subscription = broker.subscribe([chat_topic(room.id)])
+    
+    async def forward():
+        try:
+            while True:
+                try:
+                    message = await asyncio.wait_for(subscription.queue.get(), timeout=STREAM_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    message = {"type": "ping", "data": {}}
+                await websocket.send_json(message)
+        except (WebSocketDisconnect, RuntimeError):
+            pass
+    
+    sender = asyncio.create_task(forward())
+    try:
+        while True:
+            received = await websocket.receive()
+            if received["type"] == "websocket.disconnect":
+                break
+            # A bad frame gets an error reply; only a disconnect ends the loop
+            try:
+                frame = json.loads(received.get("text") or received.get("bytes") or "")
+                if not isinstance(frame, dict):
+                    raise ValueError("Frame must be a JSON object")
+                if frame.get("type") == "message":
+                    await send_chat_message(room, current_user, str(frame.get("content", "")))
+                elif frame.get("type") == "read":
+                    if not isinstance(frame.get("last_read_at"), str):
+                        raise ValueError("last_read_at must be an ISO timestamp")
+                    await mark_chat_read(room, current_user, datetime.fromisoformat(frame["last_read_at"]))
+            except (HTTPException, KeyError, TypeError, ValueError) as e:
+                await websocket.send_json({"type": "error", "data": {"detail": getattr(e, "detail", "Invalid frame")}})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        broker.unsubscribe(subscription)
+
+# Search
+SEARCH_KINDS = {"diary", "post", "plant", "event"}
+
+@api_router.get("/search")
+async def search(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200),
+    kinds: Optional[str] = None,
+    offset: int = Query(0, ge=0, le=1000),
+    limit: int = Query(20, ge=1, le=100),
+    current_user: User = Depends(get_current_user)
+):
+    """Ranked search over posts, diary entries (owner/admin only), plants and events"""
+    kind_filter = None
+    if kinds:
+        kind_filter = [kind.strip() for kind in kinds.split(",") if kind.strip()]
+        if not set(kind_filter) <= SEARCH_KINDS:
+            raise HTTPException(status_code=400, detail="Invalid search kinds")
+    result = search_index.search(q, current_user, kind_filter, offset, limit)
+    return NegotiatedResponse(request, {"query": q, "offset": offset, "limit": limit, **result})
+
+# Real-time Stream
+@api_router.get("/stream")
+async def stream_updates(request: Request, current_user: User = Depends(get_stream_user)):
+    """Server-Sent Events for community activity plus the caller's own notices"""
+    subscription = broker.subscribe([COMMUNITY_TOPIC, user_topic(current_user.id)])
+    
+    async def event_source():
+        try:
+            yield f"retry: 5000\n{format_sse('ready', {'user_id': current_user.id})}"
+            while True:
+                try:
+                    message = await asyncio.wait_for(subscription.queue.get(), timeout=STREAM_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": heartbeat\n\n"
+                    continue
+                yield format_sse(message["type"], message["data"], next(broker.sequence))
+        finally:
+            broker.unsubscribe(subscription)
+    
+    return StreamingResponse(event_source(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
 @api_router.get("/")
 async def root():
     return {"message": "Growing Together API", "version": "1.0"}
 
+# Offline Sync
+SYNC_BATCH_MAX = 200
+SYNC_MUTATION_TTL_SECONDS = 30 * 24 * 3600  # how long a client may keep retrying a queued mutation
+SYNC_PENDING_TIMEOUT_SECONDS = 600  # a claim left pending this long belongs to a batch that died
+
+class PreparedMutation:
+    """A validated mutation: its single write (built from its change seq), the result to report, and side effects once applied.
+
+    A delete names the synced collection and document id its tombstone is recorded under.
+    """
+    def __init__(self, collection: str, operation, data: Dict[str, Any], after=None, tombstone: Optional[tuple] = None):
+        self.collection = collection
+        self.operation = operation
+        self.data = data
+        self.after = after
+        self.tombstone = tombstone
+
+async def prepare_diary_create(payload: Dict[str, Any], current_user: User) -> PreparedMutation:
+    entry = await build_diary_entry(DiaryEntryCreate(**payload), current_user)
+    async def after():
+        await adjust_tag_facets(entry.user_id, [], entry.tags)
+        await update_search_index("diary", entry.id, entry.dict())
+    return PreparedMutation("diary_entries", lambda seq: InsertOne({**entry.dict(), "change_seq": seq}), {"id": entry.id}, after)
+
+async def prepare_post_create(payload: Dict[str, Any], current_user: User) -> PreparedMutation:
+    post = CommunityPost(user_id=current_user.id, username=current_user.username, **PostCreate(**payload).dict())
+    return PreparedMutation("posts", lambda seq: InsertOne({**post.dict(), "change_seq": seq}), {"id": post.id}, lambda: announce_post(post))
+
+async def prepare_task_create(payload: Dict[str, Any], current_user: User) -> PreparedMutation:
+    task = Task(created_by=current_user.id, **TaskCreate(**payload).dict())
+    return PreparedMutation("tasks", lambda seq: InsertOne({**task.dict(), "change_seq": seq}), {"id": task.id})
+
+async def prepare_inspection_create(payload: Dict[str, Any], current_user: User) -> PreparedMutation:
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    inspection = build_inspection(InspectionCreate(**payload), current_user)
+    return PreparedMutation("inspections", lambda seq: InsertOne(inspection.dict()), {"id": inspection.id}, lambda: notify_inspection(inspection))
+
+async def prepare_event_rsvp(payload: Dict[str, Any], current_user: User) -> PreparedMutation:
+    # Replays carry the intended state rather than toggling, so applying one twice is harmless
+    event_id = payload.get("event_id")
+    rsvp = bool(payload.get("rsvp", True))
+    event = await db.events.find_one({"id": event_id}, {"_id": 0, "rsvp_list": 0, "comments": 0})
+    if not event:
+        raise HTTPException(status_code=404, detail="Event not found")
+    occurrence, tombstone = None, None
+    if event.get("recurrence"):
+        occurrence = check_rsvp_occurrence(event, datetime.fromisoformat(payload["occurrence"]) if payload.get("occurrence") else None)
+        rsvp_key = {"event_id": event_id, "occurrence": occurrence, "user_id": current_user.id}
+        collection = "event_rsvps"
+        document_id = rsvp_id(event_id, occurrence, current_user.id)
+        created_at = datetime.utcnow()
+        operation = lambda seq: UpdateOne(
+            rsvp_key, {"$set": {"change_seq": seq}, "$setOnInsert": {"id": document_id, "created_at": created_at}}, upsert=True
+        ) if rsvp else DeleteOne(rsvp_key)
+        if not rsvp:
+            tombstone = ("rsvps", document_id)
+    else:
+        collection = "events"
+        operation = lambda seq: UpdateOne(
+            {"id": event_id}, {"$addToSet" if rsvp else "$pull": {"rsvp_list": current_user.id}, "$set": {"change_seq": seq}}
+        )
+    data = {"event_id": event_id, "occurrence": occurrence, "user_id": current_user.id, "rsvp": rsvp}
+    return PreparedMutation(collection, operation, data, lambda: broker.publish(COMMUNITY_TOPIC, "event.rsvp", data), tombstone)
+
+SYNC_MUTATION_HANDLERS = {
+    "diary.create": prepare_diary_create,
+    "post.create": prepare_post_create,
+    "task.create": prepare_task_create,
+    "inspection.create": prepare_inspection_create,
+    "event.rsvp": prepare_event_rsvp
+}
+
+async def claim_mutation_keys(user_id: str, mutations: List[SyncMutation]) -> set:
+    """Reserve idempotency keys; a key already reserved by an earlier or concurrent batch isn't returned"""
+    now = datetime.utcnow()
+    claims = [
+        {"user_id": user_id, "key": m.idempotency_key, "type": m.type, "status": "pending", "created_at": now}
+        for m in mutations
+    ]
+    claimed = {claim["key"] for claim in claims}
+    if not claims:
+        return claimed
+    try:
+        await db.sync_mutations.insert_many(claims, ordered=False)
+    except BulkWriteError as e:
+        for error in e.details["writeErrors"]:
+            if error["code"] != 11000:
+                raise
+            claimed.discard(claims[error["index"]]["key"])
+    return claimed
+
+@api_router.post("/sync/mutations", response_model=SyncMutationResponse)
+async def apply_sync_mutations(request: Request, batch: SyncMutationBatch, current_user: User = Depends(get_current_user)):
+    """Replay an offline queue in order; each mutation is applied at most once per idempotency key"""
+    if len(batch.mutations) > SYNC_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {SYNC_BATCH_MAX} mutations per batch")
+    
+    unique: Dict[str, SyncMutation] = {}
+    for mutation in batch.mutations:
+        unique.setdefault(mutation.idempotency_key, mutation)
+    claimed = await claim_mutation_keys(current_user.id, list(unique.values()))
+    
+    results: Dict[str, SyncMutationResult] = {}
+    async for record in db.sync_mutations.find(
+        {"user_id": current_user.id, "key": {"$in": [key for key in unique if key not in claimed]}}, {"_id": 0}
+    ):
+        if record["status"] == "pending" and datetime.utcnow() - record["created_at"] > timedelta(seconds=SYNC_PENDING_TIMEOUT_SECONDS):
+            await db.sync_mutations.delete_one({"user_id": current_user.id, "key": record["key"], "status": "pending"})
+            results[record["key"]] = SyncMutationResult(
+                idempotency_key=record["key"], status="failed", status_code=503, error="Previous attempt was interrupted; retry this mutation"
+            )
+        elif record["status"] == "pending":
+            results[record["key"]] = SyncMutationResult(
+                idempotency_key=record["key"], status="in_progress", status_code=409, error="Mutation is still being applied"
+            )
+        else:
+            results[record["key"]] = SyncMutationResult(
+                idempotency_key=record["key"], status="duplicate", status_code=record["status_code"],
+                data=record.get("data"), error=record.get("error")
+            )
+    
+    # Validate in order, then write in submission order; consecutive writes to one collection share a bulk call
+    prepared: Dict[str, PreparedMutation] = {}
+    runs: List[List[str]] = []
+    for key, mutation in unique.items():
+        if key not in claimed:
+            continue
+        handler = SYNC_MUTATION_HANDLERS.get(mutation.type)
+        try:
+            if not handler:
+                raise HTTPException(status_code=400, detail=f"Unknown mutation type: {mutation.type}")
+            prepared[key] = await handler(mutation.payload, current_user)
+        except HTTPException as e:
+            results[key] = SyncMutationResult(idempotency_key=key, status="rejected", status_code=e.status_code, error=str(e.detail))
+            continue
+        except (ValidationError, TypeError, ValueError) as e:
+            results[key] = SyncMutationResult(idempotency_key=key, status="rejected", status_code=422, error=str(e))
+            continue
+        except Exception as e:
+            # Not the mutation's fault (e.g. the database); give the key back for a retry
+            logger.error(f"Sync mutation {mutation.type} error: {e}")
+            results[key] = SyncMutationResult(idempotency_key=key, status="failed", status_code=503, error="Could not apply; retry this mutation")
+            continue
+        if runs and prepared[runs[-1][0]].collection == prepared[key].collection:
+            runs[-1].append(key)
+        else:
+            runs.append([key])
+    
+    async with change_seqs(max(len(prepared), 1)) as first_seq:
+        seqs = {key: first_seq + position for position, key in enumerate(prepared)}
+        halted = False
+        for keys in runs:
+            # Later mutations may build on earlier ones, so nothing is written after a failure
+            applied = 0
+            if not halted:
+                collection = prepared[keys[0]].collection
+                try:
+                    await db[collection].bulk_write([prepared[key].operation(seqs[key]) for key in keys], ordered=True)
+                    applied = len(keys)
+                except BulkWriteError as e:
+                    # An ordered bulk write stops at the first error; everything before it was applied
+                    applied = e.details["writeErrors"][0]["index"]
+                except Exception as e:
+                    logger.error(f"Sync bulk write error on {collection}: {e}")
+                halted = applied < len(keys)
+            for key in keys[:applied]:
+                results[key] = SyncMutationResult(idempotency_key=key, status="applied", status_code=201, data=jsonable_encoder(prepared[key].data))
+                if prepared[key].tombstone:
+                    try:
+                        await record_tombstone(*prepared[key].tombstone, seqs[key])
+                    except Exception as e:
+                        logger.error(f"Sync tombstone error for {key}: {e}")
+            for key in keys[applied:]:
+                results[key] = SyncMutationResult(idempotency_key=key, status="failed", status_code=503, error="Write failed; retry this mutation")
+    
+    for key in unique:
+        if key in prepared and results[key].status == "applied" and prepared[key].after:
+            try:
+                await prepared[key].after()
+            except Exception as e:
+                logger.warning(f"Sync side effect error for {key}: {e}")
+    
+    # Remember outcomes for retries; failed writes give their key back so the client can try again
+    outcomes = [
+        UpdateOne({"user_id": current_user.id, "key": key}, {"$set": {
+            "status": result.status, "status_code": result.status_code, "data": result.data, "error": result.error
+        }})
+        for key, result in results.items() if key in claimed and result.status in ("applied", "rejected")
+    ]
+    outcomes += [
+        DeleteOne({"user_id": current_user.id, "key": key})
+        for key, result in results.items() if key in claimed and result.status == "failed"
+    ]
+    if outcomes:
+        await db.sync_mutations.bulk_write(outcomes, ordered=False)
+    
+    return NegotiatedResponse(request, SyncMutationResponse(results=[
+        results[m.idempotency_key] if unique[m.idempotency_key] is m else results[m.idempotency_key].copy(update={"status": "duplicate"})
+        for m in batch.mutations
+    ]))
+
+SYNC_CHANGE_COLLECTIONS = {
+    "diary": "diary_entries",
+    "posts": "posts",
+    "events": "events",
+    "tasks": "tasks",
+    "notices": "member_notices",
+    "rules": "rules",
+    "plots": "plots",
+    "documents": "user_documents",
+    "rsvps": "event_rsvps"  # occurrence RSVPs on recurring events; one-off events keep theirs in rsvp_list
+}
+SYNC_CHANGES_MAX = 2000
+
+def sync_visibility(name: str, current_user: User) -> Dict[str, Any]:
+    """What the caller's own device should hold of a synced collection.
+
+    Admins included: their extra reach into other members' diaries and
+    documents goes through the admin endpoints, not onto every device they sync.
+    """
+    if name in ("posts", "events", "rules", "plots", "rsvps"):
+        return {}
+    if name == "tasks":
+        return {"$or": [{"task_type": {"$ne": "personal"}}, {"assigned_to": current_user.id}, {"created_by": current_user.id}]}
+    return {"user_id": current_user.id}
+
+@api_router.get("/sync/changes")
+async def get_sync_changes(
+    request: Request,
+    cursor: int = Query(0, ge=0),
+    limit: int = Query(500, ge=1, le=SYNC_CHANGES_MAX),
+    current_user: User = Depends(get_current_user)
+):
+    """Everything the caller can see that changed after `cursor`; pass back the returned cursor next time"""
+    horizon = await change_seq_horizon()
+    seq_range = {"$gt": cursor, "$lte": horizon}
+    found: List[tuple] = []
+    for name, collection in SYNC_CHANGE_COLLECTIONS.items():
+        query = {"change_seq": seq_range, **sync_visibility(name, current_user)}
+        async for document in db[collection].find(query, {"_id": 0}).sort("change_seq", 1).limit(limit + 1):
+            found.append((document["change_seq"], name, document))
+    tombstone_query = {"change_seq": seq_range, "user_id": {"$in": [None, current_user.id]}}
+    async for tombstone in db.tombstones.find(tombstone_query, {"_id": 0}).sort("change_seq", 1).limit(limit + 1):
+        found.append((tombstone["change_seq"], None, tombstone))
+    found.sort(key=lambda change: change[0])
+    
+    has_more = len(found) > limit
+    if has_more:
+        # Cut on a sequence boundary; writes sharing a seq (update_many) must arrive together
+        boundary = found[limit][0]
+        found = [change for change in found[:limit] if change[0] < boundary]
+        if not found:
+            # One seq covers more than a page (e.g. the startup backfill); send that group whole
+            for name, collection in SYNC_CHANGE_COLLECTIONS.items():
+                query = {"change_seq": boundary, **sync_visibility(name, current_user)}
+                found += [(boundary, name, document) async for document in db[collection].find(query, {"_id": 0})]
+            tombstone_query["change_seq"] = boundary
+            found += [(boundary, None, tombstone) async for tombstone in db.tombstones.find(tombstone_query, {"_id": 0})]
+    
+    changes: Dict[str, List[Dict[str, Any]]] = {name: [] for name in SYNC_CHANGE_COLLECTIONS}
+    deleted: Dict[str, List[str]] = {name: [] for name in SYNC_CHANGE_COLLECTIONS}
+    for _, name, document in found:
+        if name:
+            changes[name].append(document)
+        elif document["collection"] in deleted:
+            deleted[document["collection"]].append(document["id"])
+    next_cursor = found[-1][0] if has_more else max(cursor, horizon)
+    return NegotiatedResponse(request, {"cursor": next_cursor, "has_more": has_more, "changes": changes, "deleted": deleted})
+
+SNAPSHOT_SHARED_PARTS = ("plants", "rules", "plots", "events", "rsvps", "posts")
+SNAPSHOT_POSTS_LIMIT = 500  # older posts arrive through delta sync if they change
+
+class SnapshotPart:
+    """One collection's NDJSON lines, compressed as a standalone gzip member"""
+    def __init__(self, version: Any, covered: int, body: bytes):
+        self.version = version
+        self.covered = covered
+        self.body = body
+
+snapshot_parts: Dict[str, SnapshotPart] = {}
+snapshot_single_flight = SingleFlight()
+
+def ndjson_lines(name: str, documents: List[Dict[str, Any]]) -> bytes:
+    return b"".join(
+        json.dumps({"collection": name, "document": document}, separators=(",", ":")).encode('utf-8') + b"\n"
+        for document in jsonable_encoder(documents)
+    )
+
+async def compress_snapshot(body: bytes) -> bytes:
+    return await asyncio.to_thread(gzip.compress, body, 6)
+
+def shared_part_cursor(name: str, projection: Dict[str, Any]):
+    cursor = db[SYNC_CHANGE_COLLECTIONS[name]].find({}, projection)
+    if name == "posts":
+        cursor = cursor.sort("created_at", -1).limit(SNAPSHOT_POSTS_LIMIT)
+    return cursor
+
+async def latest_tombstone_seq(name: str) -> int:
+    tombstone = await db.tombstones.find_one({"collection": name}, {"_id": 0, "change_seq": 1}, sort=[("change_seq", -1)])
+    return tombstone["change_seq"] if tombstone else 0
+
+async def shared_part_version(name: str) -> Any:
+    """The newest change in a part's collection, writes or deletes; two indexed lookups per request"""
+    if name == "plants":
+        return plant_library.etag
+    document = await db[SYNC_CHANGE_COLLECTIONS[name]].find_one({}, {"_id": 0, "change_seq": 1}, sort=[("change_seq", -1)])
+    latest = document.get("change_seq", 0) if document else 0
+    return max(latest, await latest_tombstone_seq(name))
+
+async def build_shared_part(name: str) -> SnapshotPart:
+    covered = await change_seq_horizon()
+    if name == "plants":
+        library = plant_library
+        return SnapshotPart(library.etag, covered, await compress_snapshot(ndjson_lines(name, list(library.plants))))
+    # Read before the documents, so the part holds at least everything up to it
+    version = await shared_part_version(name)
+    documents = await shared_part_cursor(name, {"_id": 0}).to_list(None)
+    return SnapshotPart(version, covered, await compress_snapshot(ndjson_lines(name, documents)))
+
+async def get_shared_part(name: str) -> bytes:
+    """Prebuilt for everyone; rebuilt only once the collection's latest change moves on"""
+    version = await shared_part_version(name)
+    part = snapshot_parts.get(name)
+    if part and part.version == version:
+        return part.body
+    part = await snapshot_single_flight.do(name, lambda: build_shared_part(name))
+    # Only a part whose every change had landed when it was read is complete enough to reuse
+    if name == "plants" or part.version <= part.covered:
+        snapshot_parts[name] = part
+    return part.body
+
+@api_router.get("/sync/snapshot")
+async def get_sync_snapshot(current_user: User = Depends(get_current_user)):
+    """Everything a fresh install needs as one gzip NDJSON download, plus the cursor to continue with delta sync"""
+    # Taken first: whatever changes while the bundle is assembled is replayed by /sync/changes
+    cursor = await change_seq_horizon()
+    meta = {"type": "snapshot", "cursor": cursor, "generated_at": datetime.utcnow().isoformat(), "user_id": current_user.id}
+    members = [await compress_snapshot(json.dumps(meta).encode('utf-8') + b"\n")]
+    for name in SNAPSHOT_SHARED_PARTS:
+        members.append(await get_shared_part(name))
+    # The caller's own slice is small and built on demand
+    user_lines = []
+    for name, collection in SYNC_CHANGE_COLLECTIONS.items():
+        if name in SNAPSHOT_SHARED_PARTS:
+            continue
+        documents = await db[collection].find(sync_visibility(name, current_user), {"_id": 0}).to_list(None)
+        user_lines.append(ndjson_lines(name, documents))
+    members.append(await compress_snapshot(b"".join(user_lines)))
+    # Concatenated gzip members form one valid gzip file. It's sent as a file rather than with
+    # Content-Encoding because some HTTP clients stop decoding after the first member.
+    return Response(
+        content=b"".join(members),
+        media_type="application/gzip",
+        headers={"Content-Disposition": 'attachment; filename="snapshot.ndjson.gz"', "Cache-Control": "private, no-store"}
+    )
+
+# Idempotency keys
+IDEMPOTENCY_TTL_SECONDS = 24 * 3600
+IDEMPOTENCY_WAIT_SECONDS = 30  # how long a duplicate waits for the original request to finish
+IDEMPOTENCY_ABANDONED_SECONDS = 300  # a claim still running after this belongs to a worker that died
+IDEMPOTENT_METHODS = {"POST", "PATCH"}
+IDEMPOTENCY_UNCACHED_STATUSES = {401, 408, 409, 429}  # outcomes a retry may legitimately change
+
+class IdempotencyStore:
+    """Recorded responses keyed by (caller, method, path, Idempotency-Key).
+
+    A request claims its key in MongoDB before running; a duplicate that
+    arrives meanwhile waits for the claim to resolve (on an in-process event
+    when the original runs in this worker, by polling otherwise) and then
+    replays the recorded response. Finished responses are also held in memory.
+    """
+    def __init__(self, maxsize: int = 2000):
+        self.memory: TTLCache = TTLCache(maxsize=maxsize, ttl=IDEMPOTENCY_TTL_SECONDS)
+        self.running: Dict[str, asyncio.Event] = {}
+        self.metrics = {"executed": 0, "replayed": 0, "waited": 0, "conflicts": 0}
+    
+    @staticmethod
+    def make_key(request: Request, idempotency_key: str) -> Optional[str]:
+        """Scoped to the authenticated user, so a refreshed token still replays; None if the token is invalid"""
+        caller = ""
+        authorization = request.headers.get("authorization", "")
+        if authorization:
+            if not authorization.lower().startswith("bearer "):
+                return None
+            try:
+                caller = verify_jwt_token(authorization[7:])["user_id"]
+            except (HTTPException, KeyError):
+                return None
+        return hashlib.sha256(
+            f"{caller}|{request.method}|{request.url.path}|{request.url.query}|{idempotency_key}".encode('utf-8')
+        ).hexdigest()
+    
+    async def claim(self, key: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+        """Claim the key for this request; returns the existing record if someone else already has"""
+        record = self.memory.get(key)
+        if record:
+            return record
+        for _ in range(2):
+            try:
+                await db.idempotency_keys.insert_one({
+                    "_id": key, "status": "running", "fingerprint": fingerprint, "created_at": datetime.utcnow()
+                })
+                self.running[key] = asyncio.Event()
+                return None
+            except DuplicateKeyError:
+                record = await db.idempotency_keys.find_one({"_id": key})
+            abandoned = record and record["status"] == "running" and key not in self.running and \
+                datetime.utcnow() - record["created_at"] > timedelta(seconds=IDEMPOTENCY_ABANDONED_SECONDS)
+            if not abandoned:
+                return record or {"status": "running"}
+            await db.idempotency_keys.delete_one({"_id": key, "status": "running", "created_at": record["created_at"]})
+        return record
+    
+    async def wait(self, key: str) -> Optional[Dict[str, Any]]:
+        """Wait for a running claim to finish; None if it was released or is still running at the deadline"""
+        self.metrics["waited"] += 1
+        deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+        while time.monotonic() < deadline:
+            event = self.running.get(key)
+            try:
+                if event:
+                    await asyncio.wait_for(event.wait(), deadline - time.monotonic())
+                else:
+                    await asyncio.sleep(0.25)
+            except asyncio.TimeoutError:
+                break
+            record = self.memory.get(key) or await db.idempotency_keys.find_one({"_id": key})
+            if not record or record["status"] == "done":
+                return record
+        return None
+    
+    async def finish(self, key: str, fingerprint: str, status_code: int, headers: Dict[str, str], body: bytes) -> None:
+        record = {
+            "_id": key, "status": "done", "fingerprint": fingerprint, "status_code": status_code,
+            "headers": headers, "body": body, "created_at": datetime.utcnow()
+        }
+        await db.idempotency_keys.replace_one({"_id": key}, record, upsert=True)
+        self.memory[key] = record
+        self.wake(key)
+    
+    async def release(self, key: str) -> None:
+        """Give the key back so a retry runs the request again"""
+        await db.idempotency_keys.delete_one({"_id": key, "status": "running"})
+        self.wake(key)
+    
+    def wake(self, key: str) -> None:
+        event = self.running.pop(key, None)
+        if event:
+            event.set()
+    
+    def stats(self) -> Dict[str, Any]:
+        return {**self.metrics, "memory_entries": len(self.memory), "running": len(self.running)}
+
+idempotency_store = IdempotencyStore()
+
+def replay_response(record: Dict[str, Any]) -> Response:
+    headers = {**record["headers"], "Idempotent-Replayed": "true"}
+    return Response(content=record["body"], status_code=record["status_code"], headers=headers)
+
+@app.middleware("http")
+async def idempotency_middleware(request: Request, call_next):
+    idempotency_key = request.headers.get("idempotency-key")
+    if request.method not in IDEMPOTENT_METHODS or not idempotency_key:
+        return await call_next(request)
+    if len(idempotency_key) > 255:
+        return Response(content=json.dumps({"detail": "Idempotency-Key is too long"}), status_code=400, media_type="application/json")
+    
+    key = IdempotencyStore.make_key(request, idempotency_key)
+    if key is None:
+        # Rejected by authentication anyway; nothing worth recording
+        return await call_next(request)
+    fingerprint = hashlib.sha256(await request.body()).hexdigest()
+    record = await idempotency_store.claim(key, fingerprint)
+    if record and record["status"] == "running":
+        record = await idempotency_store.wait(key)
+        if record is None:
+            # The original is still running, or failed and gave the key back; either way the client retries
+            idempotency_store.metrics["conflicts"] += 1
+            return Response(
+                content=json.dumps({"detail": "A request with this Idempotency-Key is in progress; retry shortly"}),
+                status_code=409, media_type="application/json", headers={"Retry-After": "1"}
+            )
+    if record:
+        if record["fingerprint"] != fingerprint:
+            return Response(
+                content=json.dumps({"detail": "Idempotency-Key was already used with a different request"}),
+                status_code=422, media_type="application/json"
+            )
+        idempotency_store.metrics["replayed"] += 1
+        return replay_response(record)
+    
+    idempotency_store.metrics["executed"] += 1
+    try:
+        response = await call_next(request)
+    except BaseException:
+        await idempotency_store.release(key)
+        raise
+    if response.status_code >= 500 or response.status_code in IDEMPOTENCY_UNCACHED_STATUSES or \
+            response.headers.get("content-type", "").startswith("text/event-stream"):
+        await idempotency_store.release(key)
+        return response
+    
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    headers = {name: value for name, value in response.headers.items() if name.lower() != "content-length"}
+    await idempotency_store.finish(key, fingerprint, response.status_code, headers, body)
+    return Response(content=body, status_code=response.status_code, headers=headers)
+
+@api_router.get("/admin/idempotency/metrics")
+async def get_idempotency_metrics(current_user: User = Depends(get_admin_user)):
+    return idempotency_store.stats()
+
 # Include the router in the main app
 app.include_router(api_router)
 
@@ -919,8 +4457,72 @@ logger = logging.getLogger(__name__)
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    for worker in getattr(app.state, "ai_job_workers", []):
+        worker.cancel()
+    if getattr(app.state, "weather_history_task", None):
+        app.state.weather_history_task.cancel()
+    await broker.stop()
+    if weather_http:
+        await weather_http.aclose()
+    if image_pool:
+        image_pool.shutdown(wait=False, cancel_futures=True)
     client.close()
 
+@app.on_event("startup")
+async def start_broker():
+    await broker.start()
+
+@app.on_event("startup")
+async def warm_ai_advice_cache():
+    await ai_advice_cache.warm()
+
+@app.on_event("startup")
+async def warm_weather_cache():
+    # In the background, so a slow upstream doesn't hold up startup; diary entries need a snapshot soon after
+    weather_cache.start_refresh()
+
+@app.on_event("startup")
+async def start_ai_job_workers():
+    app.state.ai_job_workers = [asyncio.create_task(run_ai_job_worker()) for _ in range(AI_JOB_WORKERS)]
+
+@app.on_event("startup")
+async def ensure_indexes():
+    await db.post_reactions.create_index(
+        [("post_id", 1), ("user_id", 1), ("reaction_type", 1)], unique=True
+    )
+    await db.posts.create_index(
+        [("is_pinned", 1), ("is_announcement", 1), ("created_at", -1), ("id", -1)]
+    )
+    await db.ai_advice_cache.create_index("key", unique=True)
+    await db.ai_advice_cache.create_index("created_at", expireAfterSeconds=AI_CACHE_TTL_SECONDS)
+    await db.weather_snapshots.create_index("key", unique=True)
+    await db.sync_mutations.create_index([("user_id", 1), ("key", 1)], unique=True)
+    await db.idempotency_keys.create_index("created_at", expireAfterSeconds=IDEMPOTENCY_TTL_SECONDS)
+    for collection in SYNC_CHANGE_COLLECTIONS.values():
+        await db[collection].create_index("change_seq")
+    await db.tombstones.create_index([("change_seq", 1), ("user_id", 1)])
+    await db.tombstones.create_index([("collection", 1), ("change_seq", -1)])
+    await db.diary_entries.create_index([("entry_type", 1), ("date", 1)])
+    await db.diary_entries.create_index([("user_id", 1), ("tags", 1), ("date", -1)])
+    await db.diary_entries.create_index([("plot_number", 1), ("tags", 1), ("date", -1)])
+    await db.diary_entries.create_index([("tags", 1), ("date", -1)])
+    await db.tag_facets.create_index([("scope", 1), ("tag", 1)], unique=True)
+    await db.tag_facets.create_index([("scope", 1), ("count", -1), ("tag", 1)])
+    await db.change_inflight.create_index("floor")
+    await db.sync_mutations.create_index("created_at", expireAfterSeconds=SYNC_MUTATION_TTL_SECONDS)
+    await db.ai_advice_jobs.create_index("id", unique=True)
+    await db.ai_advice_jobs.create_index([("status", 1), ("available_at", 1), ("created_at", 1)])
+    await db.ai_advice_jobs.create_index([("user_id", 1), ("created_at", -1)])
+    await db.chat_rooms.create_index("id", unique=True)
+    await db.chat_rooms.create_index("member_ids")
+    await db.chat_buckets.create_index([("room_id", 1), ("bucket", -1)], unique=True)
+    await db.chat_reads.create_index([("room_id", 1), ("user_id", 1)], unique=True)
+    await db.events.create_index([("recurrence", 1), ("date", 1)])
+    await db.events.create_index("recurrence_end")
+    await db.event_rsvps.create_index(
+        [("event_id", 1), ("occurrence", 1), ("user_id", 1)], unique=True
+    )
+
 # Initialize sample data
 @app.on_event("startup")
 async def initialize_db():
@@ -1042,4 +4644,126 @@ async def initialize_db():
         )
         
         await db.rules.insert_one(default_rules.dict())
-        logger.info("Default rules added")
\ No newline at end of file
+        logger.info("Default rules added")
+
+# These run after initialize_db so a fresh database's sample data is included
+@app.on_event("startup")
+async def load_plant_library():
+    snapshot = await reload_plant_library()
+    logger.info(f"Plant library loaded with {len(snapshot.plants)} plants")
+    
+    async def follow_invalidations():
+        subscription = broker.subscribe([SYSTEM_TOPIC])
+        try:
+            while True:
+                message = await subscription.queue.get()
+                if message["type"] in ("plants.reload", "resync") and message["data"].get("origin") != WORKER_ID:
+                    await reload_plant_library()
+        finally:
+            broker.unsubscribe(subscription)
+    app.state.plant_invalidation_task = asyncio.create_task(follow_invalidations())
+
+@app.on_event("startup")
+async def backfill_change_seqs():
+    # Documents written before change tracking (and seeded samples) join the sync stream once
+    async for rsvp in db.event_rsvps.find({"id": {"$exists": False}}, {"event_id": 1, "occurrence": 1, "user_id": 1}):
+        await db.event_rsvps.update_one({"_id": rsvp["_id"]}, {"$set": {"id": rsvp_id(rsvp["event_id"], rsvp["occurrence"], rsvp["user_id"])}})
+    for collection in SYNC_CHANGE_COLLECTIONS.values():
+        if await db[collection].count_documents({"change_seq": {"$exists": False}}, limit=1):
+            async with change_seqs() as seq:
+                await db[collection].update_many({"change_seq": {"$exists": False}}, {"$set": {"change_seq": seq}})
+
+@app.on_event("startup")
+async def migrate_legacy_reactions():
+    # Posts from before reactions had their own collection keep {type: [user_ids]} inline; move them
+    # into post_reactions and reaction_counts once. Re-running is harmless: the unique index skips
+    # reactions already moved and the counts are recomputed from post_reactions.
+    if not await db.posts.count_documents({"reactions": {"$exists": True}}, limit=1):
+        return
+    if not await acquire_lease("legacy_reactions_migration", 600):
+        return
+    migrated = 0
+    async for post in db.posts.find({"reactions": {"$exists": True}}, {"_id": 0, "id": 1, "reactions": 1}):
+        reactions = [
+            PostReaction(post_id=post["id"], user_id=user_id, reaction_type=reaction_type).dict()
+            for reaction_type, user_ids in (post.get("reactions") or {}).items()
+            for user_id in dict.fromkeys(user_ids or [])
+        ]
+        if reactions:
+            try:
+                await db.post_reactions.insert_many(reactions, ordered=False)
+            except BulkWriteError:
+                pass  # already moved by an earlier, interrupted run
+        counts: Dict[str, int] = {}
+        async for reaction in db.post_reactions.find({"post_id": post["id"]}, {"_id": 0, "reaction_type": 1}):
+            counts[reaction["reaction_type"]] = counts.get(reaction["reaction_type"], 0) + 1
+        async with change_seqs() as seq:
+            await db.posts.update_one(
+                {"id": post["id"]},
+                {"$set": {"reaction_counts": counts, "change_seq": seq}, "$unset": {"reactions": ""}}
+            )
+        migrated += 1
+    invalidate_featured_posts()
+    logger.info(f"Migrated legacy reactions on {migrated} posts")
+
+@app.on_event("startup")
+async def backfill_tag_facets():
+    # Diaries written before facets were kept are counted once, by whichever worker gets there first
+    if not await db.tag_facets.count_documents({}, limit=1) and await acquire_lease("tag_facets_backfill", 600):
+        await rebuild_tag_facets()
+
+@app.on_event("startup")
+async def start_weather_history():
+    if "weather_observations" not in await db.list_collection_names():
+        try:
+            await db.create_collection("weather_observations", timeseries={
+                "timeField": "time", "metaField": "site", "granularity": "hours"
+            })
+        except Exception as e:
+            # Time-series collections need MongoDB 5.0+; a plain collection works, just less compactly
+            logger.warning(f"Weather observations stored in a regular collection: {e}")
+    await db.weather_observations.create_index([("site", 1), ("time", -1)])
+    await sync_weather_history()
+    app.state.weather_history_task = asyncio.create_task(run_weather_history_recorder())
+
+@app.on_event("startup")
+async def start_search_index():
+    async def build():
+        try:
+            index = await build_search_index()
+            logger.info(f"Search index built with {index.live_count} documents")
+        except Exception as e:
+            logger.error(f"Search index build error: {e}")
+    
+    resync_requested = asyncio.Event()
+    
+    async def maintain():
+        await build()
+        while True:
+            # Resyncs that pile up during a rebuild collapse into the one rebuild after it
+            await resync_requested.wait()
+            resync_requested.clear()
+            await build()
+    
+    async def follow_updates():
+        subscription = broker.subscribe([SYSTEM_TOPIC])
+        try:
+            while True:
+                message = await subscription.queue.get()
+                if message["type"] == "search.update" and message["data"].get("origin") != WORKER_ID:
+                    try:
+                        await follow_search_update(message["data"])
+                    except (KeyError, TypeError, ValueError) as e:
+                        logger.warning(f"Ignoring malformed search update: {e}")
+                    except PyMongoError as e:
+                        logger.warning(f"Search update read failed, rebuilding: {e}")
+                        resync_requested.set()
+                elif message["type"] == "resync":
+                    # Updates were dropped while this worker lagged; only a full rebuild is sure to catch up.
+                    # It runs beside this loop, which keeps draining updates meanwhile.
+                    resync_requested.set()
+        finally:
+            broker.unsubscribe(subscription)
+    # Build in the background so a large index doesn't hold up startup
+    app.state.search_index_task = asyncio.create_task(maintain())
+    app.state.search_follow_task = asyncio.create_task(follow_updates())
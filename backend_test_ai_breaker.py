@@ -0,0 +1,145 @@
+import requests
+import asyncio
+import os
+import sys
+import uuid
+
+# Checks for the AI circuit breaker: opening on failures, the half-open probe and its metrics.
+# Run from an environment that can import backend/server.py: the state checks drive the breaker directly,
+# since a healthy server has no failures to trip it with.
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+import server
+
+class AIBreakerAPITester:
+    def __init__(self, base_url=os.environ.get("BASE_URL", "http://localhost:8001")):
+        self.base_url = base_url
+        self.api_url = f"{base_url}/api"
+        self.admin_token = None
+        self.tests_run = 0
+        self.tests_passed = 0
+        self.failed_tests = []
+        self.loop = asyncio.new_event_loop()  # one loop, so the Motor client stays on it
+
+    def log_test(self, name, success, details=""):
+        """Log test results"""
+        self.tests_run += 1
+        if success:
+            self.tests_passed += 1
+            print(f"✅ {name} - PASSED")
+        else:
+            print(f"❌ {name} - FAILED: {details}")
+            self.failed_tests.append({"test": name, "error": details})
+
+    def make_request(self, method, endpoint, data=None, use_admin=True):
+        """Make API request with proper headers"""
+        url = f"{self.api_url}/{endpoint}"
+        headers = {'Content-Type': 'application/json'}
+        token = self.admin_token
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        try:
+            response = requests.request(method, url, json=data, headers=headers, timeout=30)
+            return response, None
+        except requests.exceptions.RequestException as e:
+            return None, str(e)
+
+    def run(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+    def test_admin_login(self):
+        """Admin login"""
+        response, error = self.make_request('POST', 'auth/login', {
+            'email': 'admin@staffordallotment.com',
+            'password': 'admin123'
+        })
+        success = not error and response.status_code == 200
+        if success:
+            self.admin_token = response.json()['token']
+        self.log_test("Admin Login", success, error or (response.text if response is not None else ""))
+        return success
+
+    def test_breaker_opens_on_failures(self):
+        """Enough failures in the window open the breaker, which then refuses calls without trying them"""
+        async def check():
+            async def probe():
+                pass
+            breaker = server.CircuitBreaker(probe, min_calls=5, failure_threshold=0.5, open_seconds=30)
+            for succeeded in (True, False, True, False):
+                breaker.record(succeeded)
+            before = breaker.state
+            breaker.record(False)
+            try:
+                breaker.check()
+                refused = False
+            except server.CircuitOpen:
+                refused = True
+            return before, breaker.stats(), refused
+
+        before, stats, refused = self.run(check())
+        self.log_test("Breaker Stays Closed Below Minimum Calls", before == "closed", f"state {before}")
+        self.log_test("Breaker Opens On Failure Rate", stats['state'] == "open" and stats['opened'] == 1, f"stats {stats}")
+        self.log_test("Breaker Short-circuits While Open", refused and stats['short_circuited'] == 1, f"stats {stats}")
+
+    def test_breaker_probe(self):
+        """After the cool-down one background probe decides: success closes the breaker, failure re-opens it"""
+        async def check(probe_succeeds):
+            async def probe():
+                if not probe_succeeds:
+                    raise RuntimeError("still down")
+            breaker = server.CircuitBreaker(probe, min_calls=2, open_seconds=0.05)
+            breaker.record(False)
+            breaker.record(False)
+            await asyncio.sleep(0.1)
+            first_caller_allowed = breaker.allow()  # starts the probe; callers are still refused
+            probing = breaker.state
+            await breaker.probe_task
+            return first_caller_allowed, probing, breaker.stats()
+
+        allowed, probing, recovered = self.run(check(True))
+        self.log_test("Breaker Probe Runs In Background", not allowed and probing == "half_open" and recovered['probes'] == 1,
+                      f"allowed {allowed}, state {probing}")
+        self.log_test("Breaker Closes After Good Probe", recovered['state'] == "closed" and recovered['window_calls'] == 0,
+                      f"stats {recovered}")
+        _, _, still_down = self.run(check(False))
+        self.log_test("Breaker Reopens After Failed Probe", still_down['state'] == "open" and still_down['opened'] == 2,
+                      f"stats {still_down}")
+
+    def test_breaker_metrics(self):
+        """The live breaker's state is reported in the AI metrics"""
+        response, error = self.make_request('GET', 'admin/ai/metrics')
+        if error or response.status_code != 200:
+            self.log_test("Breaker Metrics", False, error or response.text)
+            return
+        breaker = response.json()['circuit_breaker']
+        self.log_test("Breaker Metrics", breaker['state'] in ("closed", "open", "half_open")
+                      and {'opened', 'short_circuited', 'probes', 'failure_rate', 'window_calls'} <= set(breaker), f"breaker {breaker}")
+
+    def run_all_tests(self):
+        """Run all ai circuit breaker tests"""
+        print("🚀 Starting Growing Together AI Circuit Breaker Tests")
+        print("=" * 50)
+
+        if not self.test_admin_login():
+            print("❌ Admin login failed. Stopping tests.")
+            return False
+
+        self.test_breaker_opens_on_failures()
+        self.test_breaker_probe()
+        self.test_breaker_metrics()
+
+        print("\n" + "=" * 50)
+        print(f"📊 Test Summary: {self.tests_passed}/{self.tests_run} tests passed")
+        if self.failed_tests:
+            print("\n❌ Failed Tests:")
+            for test in self.failed_tests:
+                print(f"  - {test['test']}: {test['error']}")
+        return not self.failed_tests
+
+def main():
+    tester = AIBreakerAPITester()
+    success = tester.run_all_tests()
+    return 0 if success else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+import requests
+import os
+import sys
+import uuid
+
+# Checks for the AI advice cache: exact repeats, normalised and paraphrased questions, and its metrics.
+# Start the server with AI_BACKEND=fake so no upstream model is called.
+
+class AICacheAPITester:
+    def __init__(self, base_url=os.environ.get("BASE_URL", "http://localhost:8001")):
+        self.base_url = base_url
+        self.api_url = f"{base_url}/api"
+        self.admin_token = None
+        self.member_token = None
+        self.tests_run = 0
+        self.tests_passed = 0
+        self.failed_tests = []
+
+    def log_test(self, name, success, details=""):
+        """Log test results"""
+        self.tests_run += 1
+        if success:
+            self.tests_passed += 1
+            print(f"✅ {name} - PASSED")
+        else:
+            print(f"❌ {name} - FAILED: {details}")
+            self.failed_tests.append({"test": name, "error": details})
+
+    def make_request(self, method, endpoint, data=None, use_admin=True):
+        """Make API request with proper headers"""
+        url = f"{self.api_url}/{endpoint}"
+        headers = {'Content-Type': 'application/json'}
+        token = self.admin_token if use_admin else self.member_token
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        try:
+            response = requests.request(method, url, json=data, headers=headers, timeout=30)
+            return response, None
+        except requests.exceptions.RequestException as e:
+            return None, str(e)
+
+    def test_admin_login(self):
+        """Admin login"""
+        response, error = self.make_request('POST', 'auth/login', {
+            'email': 'admin@staffordallotment.com',
+            'password': 'admin123'
+        })
+        success = not error and response.status_code == 200
+        if success:
+            self.admin_token = response.json()['token']
+        self.log_test("Admin Login", success, error or (response.text if response is not None else ""))
+        return success
+
+    def test_member_login(self):
+        """Register a member, approve them as admin, log in"""
+        email = f'ai_cache_member_{uuid.uuid4().hex[:8]}@example.com'
+        response, error = self.make_request('POST', 'auth/register', {
+            'email': email, 'username': email.split('@')[0], 'password': 'testpass123', 'join_code': 'GROW2024'
+        })
+        if error or response.status_code != 200:
+            self.log_test("Member Login", False, error or response.text)
+            return False
+        self.make_request('PATCH', f"admin/users/{response.json()['user_id']}/approve")
+        response, error = self.make_request('POST', 'auth/login', {'email': email, 'password': 'testpass123'})
+        success = not error and response.status_code == 200
+        if success:
+            self.member_token = response.json()['token']
+        self.log_test("Member Login", success, error or (response.text if not success else ""))
+        return success
+
+    def ask(self, plant_name, question, use_admin=False):
+        response, error = self.make_request('POST', 'plants/ai-advice', {'plant_name': plant_name, 'question': question}, use_admin=use_admin)
+        return response if not error else None
+
+    def test_exact_repeat_cached(self):
+        """Asking the same question twice answers the second time from the cache"""
+        question = f'Why are the lower leaves curling on plant {uuid.uuid4().hex[:8]}?'
+        first = self.ask('Tomatoes', question)
+        if first is None or first.status_code != 200:
+            self.log_test("AI Advice First Answer", False, first.text if first is not None else "request failed")
+            return
+        self.log_test("AI Advice First Answer", first.json()['cached'] is False and 'soil moisture' in first.json()['advice'],
+                      f"response {first.json()}")
+
+        second = self.ask('Tomatoes', question)
+        self.log_test("AI Advice Repeat Cached",
+                      second.status_code == 200 and second.json()['cached'] is True and second.json()['advice'] == first.json()['advice'],
+                      f"response {second.json()}")
+
+        # Case and punctuation are normalised away before the lookup
+        shouted = self.ask('TOMATOES', question.upper().replace('?', '!!'))
+        self.log_test("AI Advice Normalised Repeat Cached", shouted.json()['cached'] is True, f"response {shouted.json()}")
+
+    def test_near_duplicate_cached(self):
+        """A paraphrase of an earlier question about the same plant reuses its answer; other plants don't"""
+        marker = uuid.uuid4().hex[:8]
+        first = self.ask('Courgettes', f'Why are my courgette {marker} leaves turning yellow?')
+        paraphrase = self.ask('Courgettes', f'courgette {marker} leaves going yellow?')
+        self.log_test("AI Advice Paraphrase Cached",
+                      paraphrase.status_code == 200 and paraphrase.json()['cached'] is True
+                      and paraphrase.json()['advice'] == first.json()['advice'],
+                      f"response {paraphrase.json()}")
+
+        other_plant = self.ask('Runner Beans', f'courgette {marker} leaves going yellow?')
+        self.log_test("AI Advice Other Plant Not Cached", other_plant.json()['cached'] is False, f"response {other_plant.json()}")
+
+    def test_cache_metrics(self):
+        """Admins can see the cache counters; members can't"""
+        response, error = self.make_request('GET', 'admin/ai/metrics')
+        if error or response.status_code != 200:
+            self.log_test("AI Cache Metrics", False, error or response.text)
+            return
+        cache = response.json()['cache']
+        self.log_test("AI Cache Metrics",
+                      cache['lookups'] >= 6 and cache['memory_hits'] + cache['store_hits'] >= 3
+                      and cache['near_duplicate_hits'] >= 1 and cache['indexed_questions'] >= 1 and 0 < cache['hit_rate'] <= 1,
+                      f"cache {cache}")
+        member, _ = self.make_request('GET', 'admin/ai/metrics', use_admin=False)
+        self.log_test("AI Cache Metrics Admin Only", member.status_code == 403, f"Status: {member.status_code}")
+
+    def run_all_tests(self):
+        """Run all ai cache tests"""
+        print("🚀 Starting Growing Together AI Cache Tests")
+        print("=" * 50)
+
+        if not self.test_admin_login():
+            print("❌ Admin login failed. Stopping tests.")
+            return False
+        if not self.test_member_login():
+            print("❌ Member login failed. Stopping tests.")
+            return False
+
+        self.test_exact_repeat_cached()
+        self.test_near_duplicate_cached()
+        self.test_cache_metrics()
+
+        print("\n" + "=" * 50)
+        print(f"📊 Test Summary: {self.tests_passed}/{self.tests_run} tests passed")
+        if self.failed_tests:
+            print("\n❌ Failed Tests:")
+            for test in self.failed_tests:
+                print(f"  - {test['test']}: {test['error']}")
+        return not self.failed_tests
+
+def main():
+    tester = AICacheAPITester()
+    success = tester.run_all_tests()
+    return 0 if success else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
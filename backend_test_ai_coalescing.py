@@ -0,0 +1,191 @@
+import requests
+import asyncio
+import os
+import sys
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# Checks for AI call coordination: coalescing identical questions and the bounded upstream call pool.
+# Start the server with AI_BACKEND=fake, and run this from an environment that can import backend/server.py:
+# the cancellation and pool checks drive those classes directly.
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+import server
+
+class AICoalescingAPITester:
+    def __init__(self, base_url=os.environ.get("BASE_URL", "http://localhost:8001")):
+        self.base_url = base_url
+        self.api_url = f"{base_url}/api"
+        self.admin_token = None
+        self.member_token = None
+        self.tests_run = 0
+        self.tests_passed = 0
+        self.failed_tests = []
+        self.loop = asyncio.new_event_loop()  # one loop, so the Motor client stays on it
+
+    def log_test(self, name, success, details=""):
+        """Log test results"""
+        self.tests_run += 1
+        if success:
+            self.tests_passed += 1
+            print(f"✅ {name} - PASSED")
+        else:
+            print(f"❌ {name} - FAILED: {details}")
+            self.failed_tests.append({"test": name, "error": details})
+
+    def make_request(self, method, endpoint, data=None, use_admin=True):
+        """Make API request with proper headers"""
+        url = f"{self.api_url}/{endpoint}"
+        headers = {'Content-Type': 'application/json'}
+        token = self.admin_token if use_admin else self.member_token
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        try:
+            response = requests.request(method, url, json=data, headers=headers, timeout=30)
+            return response, None
+        except requests.exceptions.RequestException as e:
+            return None, str(e)
+
+    def run(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+    def test_admin_login(self):
+        """Admin login"""
+        response, error = self.make_request('POST', 'auth/login', {
+            'email': 'admin@staffordallotment.com',
+            'password': 'admin123'
+        })
+        success = not error and response.status_code == 200
+        if success:
+            self.admin_token = response.json()['token']
+        self.log_test("Admin Login", success, error or (response.text if response is not None else ""))
+        return success
+
+    def test_member_login(self):
+        """Register a member, approve them as admin, log in"""
+        email = f'ai_flight_member_{uuid.uuid4().hex[:8]}@example.com'
+        response, error = self.make_request('POST', 'auth/register', {
+            'email': email, 'username': email.split('@')[0], 'password': 'testpass123', 'join_code': 'GROW2024'
+        })
+        if error or response.status_code != 200:
+            self.log_test("Member Login", False, error or response.text)
+            return False
+        self.make_request('PATCH', f"admin/users/{response.json()['user_id']}/approve")
+        response, error = self.make_request('POST', 'auth/login', {'email': email, 'password': 'testpass123'})
+        success = not error and response.status_code == 200
+        if success:
+            self.member_token = response.json()['token']
+        self.log_test("Member Login", success, error or (response.text if not success else ""))
+        return success
+
+    def test_concurrent_requests_coalesced(self):
+        """Identical questions asked at once reach the model once: the rest share the call or hit its cached answer"""
+        before, _ = self.make_request('GET', 'admin/ai/metrics')
+        question = f'Concurrent check {uuid.uuid4().hex[:8]}: when should I pinch out side shoots?'
+        with ThreadPoolExecutor(max_workers=6) as executor:
+            responses = list(executor.map(
+                lambda _: self.make_request('POST', 'plants/ai-advice', {'plant_name': 'Tomatoes', 'question': question}, use_admin=False)[0],
+                range(6)
+            ))
+        after, _ = self.make_request('GET', 'admin/ai/metrics')
+        before, after = before.json(), after.json()
+
+        self.log_test("Concurrent Advice Answered",
+                      all(response.status_code == 200 for response in responses) and len({response.json()['advice'] for response in responses}) == 1,
+                      f"statuses {[response.status_code for response in responses]}")
+        upstream = after['pool']['calls'] - before['pool']['calls']
+        shared = after['single_flight']['shared'] - before['single_flight']['shared']
+        cache_hits = after['cache']['memory_hits'] - before['cache']['memory_hits']
+        self.log_test("Concurrent Advice One Upstream Call", upstream == 1 and shared + cache_hits == 5,
+                      f"upstream {upstream}, shared {shared}, cache hits {cache_hits}")
+
+    def test_single_flight_cancellation(self):
+        """The shared call survives one waiter leaving and is cancelled once every waiter has gone"""
+        async def check():
+            flight = server.SingleFlight()
+            started = asyncio.Event()
+            release = asyncio.Event()
+
+            async def slow_call():
+                started.set()
+                await release.wait()
+                return "answer"
+
+            first = asyncio.create_task(flight.do("key", slow_call))
+            second = asyncio.create_task(flight.do("key", slow_call))
+            await started.wait()
+            shared_task = flight.calls["key"]["task"]
+            first.cancel()
+            await asyncio.sleep(0)
+            survived = not shared_task.cancelled()
+            release.set()
+            result = await second
+
+            release.clear()
+            started.clear()
+            lone = asyncio.create_task(flight.do("other", slow_call))
+            await started.wait()
+            abandoned_task = flight.calls["other"]["task"]
+            lone.cancel()
+            await asyncio.wait([abandoned_task])
+            await asyncio.sleep(0)  # let the done callback drop it from the in-flight map
+            return survived, result, flight.stats(), abandoned_task.cancelled()
+
+        survived, result, stats, abandoned = self.run(check())
+        self.log_test("Single Flight Survives One Waiter Leaving", survived and result == "answer", f"result {result}")
+        self.log_test("Single Flight Shares Calls", stats['calls'] == 2 and stats['shared'] == 1 and stats['in_flight'] == 0, f"stats {stats}")
+        self.log_test("Single Flight Cancels Abandoned Call", abandoned)
+
+    def test_call_pool_limits(self):
+        """The pool caps concurrent upstream calls, records queue waits and counts timeouts"""
+        async def check():
+            pool = server.LLMCallPool(max_concurrency=1, timeout=0.2)
+
+            async def call(seconds):
+                await asyncio.sleep(seconds)
+                return seconds
+
+            results = await asyncio.gather(pool.run(lambda: call(0.05)), pool.run(lambda: call(0.05)))
+            try:
+                await pool.run(lambda: call(1))
+                timed_out = False
+            except asyncio.TimeoutError:
+                timed_out = True
+            return results, timed_out, pool.stats()
+
+        results, timed_out, stats = self.run(check())
+        self.log_test("Call Pool Runs Queued Calls", results == [0.05, 0.05] and stats['calls'] == 3, f"results {results}, stats {stats}")
+        self.log_test("Call Pool Queue Wait Recorded", stats['queue_wait_ms_max'] >= 40, f"stats {stats}")
+        self.log_test("Call Pool Timeout Counted", timed_out and stats['timeouts'] == 1 and stats['running'] == 0, f"stats {stats}")
+
+    def run_all_tests(self):
+        """Run all ai coalescing tests"""
+        print("🚀 Starting Growing Together AI Coalescing Tests")
+        print("=" * 50)
+
+        if not self.test_admin_login():
+            print("❌ Admin login failed. Stopping tests.")
+            return False
+        if not self.test_member_login():
+            print("❌ Member login failed. Stopping tests.")
+            return False
+
+        self.test_concurrent_requests_coalesced()
+        self.test_single_flight_cancellation()
+        self.test_call_pool_limits()
+
+        print("\n" + "=" * 50)
+        print(f"📊 Test Summary: {self.tests_passed}/{self.tests_run} tests passed")
+        if self.failed_tests:
+            print("\n❌ Failed Tests:")
+            for test in self.failed_tests:
+                print(f"  - {test['test']}: {test['error']}")
+        return not self.failed_tests
+
+def main():
+    tester = AICoalescingAPITester()
+    success = tester.run_all_tests()
+    return 0 if success else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+import requests
+import asyncio
+import os
+import sys
+import uuid
+from datetime import datetime, timedelta
+
+# Checks for queued AI advice jobs: completion, ownership, cache hits and jobs left behind by a dead worker.
+# Start the server with AI_BACKEND=fake, and run this from an environment that can import backend/server.py
+# pointed at the same MONGO_URL and DB_NAME: the stale-job checks seed their jobs in the database.
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+import server
+
+class AIJobsAPITester:
+    def __init__(self, base_url=os.environ.get("BASE_URL", "http://localhost:8001")):
+        self.base_url = base_url
+        self.api_url = f"{base_url}/api"
+        self.admin_token = None
+        self.member_token = None
+        self.tests_run = 0
+        self.tests_passed = 0
+        self.failed_tests = []
+        self.loop = asyncio.new_event_loop()  # one loop, so the Motor client stays on it
+
+    def log_test(self, name, success, details=""):
+        """Log test results"""
+        self.tests_run += 1
+        if success:
+            self.tests_passed += 1
+            print(f"✅ {name} - PASSED")
+        else:
+            print(f"❌ {name} - FAILED: {details}")
+            self.failed_tests.append({"test": name, "error": details})
+
+    def make_request(self, method, endpoint, data=None, use_admin=True):
+        """Make API request with proper headers"""
+        url = f"{self.api_url}/{endpoint}"
+        headers = {'Content-Type': 'application/json'}
+        token = self.admin_token if use_admin else self.member_token
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        try:
+            response = requests.request(method, url, json=data, headers=headers, timeout=30)
+            return response, None
+        except requests.exceptions.RequestException as e:
+            return None, str(e)
+
+    def run(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+    def test_admin_login(self):
+        """Admin login"""
+        response, error = self.make_request('POST', 'auth/login', {
+            'email': 'admin@staffordallotment.com',
+            'password': 'admin123'
+        })
+        success = not error and response.status_code == 200
+        if success:
+            self.admin_token = response.json()['token']
+        self.log_test("Admin Login", success, error or (response.text if response is not None else ""))
+        return success
+
+    def test_member_login(self):
+        """Register a member, approve them as admin, log in"""
+        email = f'ai_job_member_{uuid.uuid4().hex[:8]}@example.com'
+        response, error = self.make_request('POST', 'auth/register', {
+            'email': email, 'username': email.split('@')[0], 'password': 'testpass123', 'join_code': 'GROW2024'
+        })
+        if error or response.status_code != 200:
+            self.log_test("Member Login", False, error or response.text)
+            return False
+        self.make_request('PATCH', f"admin/users/{response.json()['user_id']}/approve")
+        response, error = self.make_request('POST', 'auth/login', {'email': email, 'password': 'testpass123'})
+        success = not error and response.status_code == 200
+        if success:
+            self.member_token = response.json()['token']
+        self.log_test("Member Login", success, error or (response.text if not success else ""))
+        return success
+
+    def create_job(self, question, use_admin=False):
+        response, error = self.make_request('POST', 'plants/ai-advice/jobs', {'plant_name': 'Tomatoes', 'question': question}, use_admin=use_admin)
+        return response if not error else None
+
+    def wait_for_job(self, job_id, use_admin=False):
+        response, _ = self.make_request('GET', f"plants/ai-advice/jobs/{job_id}?wait=15", use_admin=use_admin)
+        return response
+
+    def insert_stale_job(self, attempts):
+        """A job whose worker died mid-call: still running, lease long expired"""
+        response, _ = self.make_request('GET', 'auth/me', use_admin=False)
+        job = server.AIAdviceJob(user_id=response.json()['id'], plant_name='Tomatoes', status='running', attempts=attempts,
+                                 question=f'Stale job check {uuid.uuid4().hex[:8]}: are my seedlings leggy?',
+                                 lease_until=datetime.utcnow() - timedelta(seconds=server.AI_JOB_LEASE_SECONDS))
+        self.run(server.db.ai_advice_jobs.insert_one(job.dict()))
+        return job.id
+
+    def test_fake_ai_job(self):
+        """An AI advice job completes against the fake backend and only its owner can see it"""
+        response = self.create_job(f'Job check {uuid.uuid4()}: why are the lower leaves curling?')
+        if response is None or response.status_code != 200:
+            self.log_test("Fake AI Job", False, response.text if response is not None else "request failed")
+            return
+        job = response.json()
+        self.log_test("AI Job Queued", job['status'] in ('queued', 'running', 'done') and 'photo_base64' not in job, f"job {job}")
+        job = self.wait_for_job(job['id']).json()
+        self.log_test("Fake AI Job", job['status'] == 'done' and 'soil moisture' in job['result']['advice'], f"job {job}")
+
+        listed, _ = self.make_request('GET', 'plants/ai-advice/jobs', use_admin=False)
+        self.log_test("AI Job Listed", any(entry['id'] == job['id'] for entry in listed.json()), f"jobs {listed.json()}")
+        other, _ = self.make_request('GET', f"plants/ai-advice/jobs/{job['id']}")
+        self.log_test("AI Job Owner Only", other.status_code == 404, f"Status: {other.status_code}")
+
+    def test_cached_job_done_at_once(self):
+        """A job for an already answered question finishes as it is created"""
+        question = f'Cached job check {uuid.uuid4().hex[:8]}: when do I earth up potatoes?'
+        first = self.create_job(question)
+        self.wait_for_job(first.json()['id'])
+        second = self.create_job(question).json()
+        self.log_test("Cached AI Job Done At Once", second['status'] == 'done' and second['result']['cached'] is True, f"job {second}")
+
+    def test_expired_lease_reclaimed(self):
+        """A job whose worker died is picked up again by another worker"""
+        job_id = self.insert_stale_job(attempts=1)
+        job = self.wait_for_job(job_id).json()
+        self.log_test("Expired AI Job Reclaimed", job['status'] == 'done' and job['attempts'] == 2, f"job {job}")
+
+    def test_abandoned_job_failed(self):
+        """A job whose worker died on its last allowed attempt is reported failed, not run a fourth time"""
+        job_id = self.insert_stale_job(attempts=server.AI_JOB_MAX_ATTEMPTS)
+        claimed = self.run(server.claim_ai_job())
+        if claimed:  # some other queued job; finish it rather than leave it leased
+            self.run(server.process_ai_job(claimed))
+        response, _ = self.make_request('GET', f"plants/ai-advice/jobs/{job_id}", use_admin=False)
+        job = response.json()
+        self.log_test("Abandoned AI Job Not Reclaimed", not claimed or claimed['id'] != job_id, f"claimed {claimed}")
+        self.log_test("Abandoned AI Job Failed",
+                      job['status'] == 'failed' and job['attempts'] == server.AI_JOB_MAX_ATTEMPTS and job['result'] is not None,
+                      f"job {job}")
+
+    def run_all_tests(self):
+        """Run all ai job tests"""
+        print("🚀 Starting Growing Together AI Job Tests")
+        print("=" * 50)
+
+        if not self.test_admin_login():
+            print("❌ Admin login failed. Stopping tests.")
+            return False
+        if not self.test_member_login():
+            print("❌ Member login failed. Stopping tests.")
+            return False
+
+        self.test_fake_ai_job()
+        self.test_cached_job_done_at_once()
+        self.test_expired_lease_reclaimed()
+        self.test_abandoned_job_failed()
+
+        print("\n" + "=" * 50)
+        print(f"📊 Test Summary: {self.tests_passed}/{self.tests_run} tests passed")
+        if self.failed_tests:
+            print("\n❌ Failed Tests:")
+            for test in self.failed_tests:
+                print(f"  - {test['test']}: {test['error']}")
+        return not self.failed_tests
+
+def main():
+    tester = AIJobsAPITester()
+    success = tester.run_all_tests()
+    return 0 if success else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
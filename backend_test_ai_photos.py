@@ -0,0 +1,136 @@
+import requests
+import os
+import sys
+import uuid
+import base64
+from io import BytesIO
+from PIL import Image
+
+# Checks for AI photo preprocessing: downscaling, EXIF handling and photo questions through the API.
+# Start the server with AI_BACKEND=fake, and run this from an environment that can import backend/server.py
+# and Pillow: the preprocessing checks call it directly.
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+import server
+
+class AIPhotosAPITester:
+    def __init__(self, base_url=os.environ.get("BASE_URL", "http://localhost:8001")):
+        self.base_url = base_url
+        self.api_url = f"{base_url}/api"
+        self.admin_token = None
+        self.tests_run = 0
+        self.tests_passed = 0
+        self.failed_tests = []
+
+    def log_test(self, name, success, details=""):
+        """Log test results"""
+        self.tests_run += 1
+        if success:
+            self.tests_passed += 1
+            print(f"✅ {name} - PASSED")
+        else:
+            print(f"❌ {name} - FAILED: {details}")
+            self.failed_tests.append({"test": name, "error": details})
+
+    def make_request(self, method, endpoint, data=None, use_admin=True):
+        """Make API request with proper headers"""
+        url = f"{self.api_url}/{endpoint}"
+        headers = {'Content-Type': 'application/json'}
+        token = self.admin_token
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        try:
+            response = requests.request(method, url, json=data, headers=headers, timeout=30)
+            return response, None
+        except requests.exceptions.RequestException as e:
+            return None, str(e)
+
+    def test_admin_login(self):
+        """Admin login"""
+        response, error = self.make_request('POST', 'auth/login', {
+            'email': 'admin@staffordallotment.com',
+            'password': 'admin123'
+        })
+        success = not error and response.status_code == 200
+        if success:
+            self.admin_token = response.json()['token']
+        self.log_test("Admin Login", success, error or (response.text if response is not None else ""))
+        return success
+
+    def encode(self, image, format="PNG", **save_args):
+        output = BytesIO()
+        image.save(output, format=format, **save_args)
+        return base64.b64encode(output.getvalue()).decode('ascii')
+
+    def decode(self, photo_base64):
+        return Image.open(BytesIO(base64.b64decode(photo_base64)))
+
+    def test_preprocess_downscales(self):
+        """Large photos shrink to the model's short side and come back as JPEG; small ones aren't enlarged"""
+        large = self.decode(server.preprocess_photo(self.encode(Image.new("RGBA", (4000, 3000), (40, 120, 40, 255)))))
+        self.log_test("Photo Downscaled", large.format == "JPEG" and large.size == (1024, 768), f"{large.format} {large.size}")
+
+        panorama = self.decode(server.preprocess_photo(self.encode(Image.new("RGB", (6000, 1000), (40, 120, 40)), "JPEG")))
+        self.log_test("Photo Long Side Capped", max(panorama.size) == server.AI_IMAGE_LONG_SIDE, f"size {panorama.size}")
+
+        small = self.decode(server.preprocess_photo(self.encode(Image.new("RGB", (300, 200), (40, 120, 40)))))
+        self.log_test("Small Photo Not Enlarged", small.size == (300, 200), f"size {small.size}")
+
+    def test_preprocess_exif(self):
+        """EXIF orientation is applied to the pixels and the metadata is dropped"""
+        image = Image.new("RGB", (400, 200), (40, 120, 40))
+        exif = Image.Exif()
+        exif[0x0112] = 6  # rotate 90° clockwise to display
+        photo = "data:image/jpeg;base64," + self.encode(image, "JPEG", exif=exif.tobytes())
+        processed = self.decode(server.preprocess_photo(photo))
+        self.log_test("Photo EXIF Orientation Applied", processed.size == (200, 400), f"size {processed.size}")
+        self.log_test("Photo EXIF Dropped", not processed.getexif(), f"exif {dict(processed.getexif())}")
+
+    def test_photo_advice(self):
+        """The API accepts a photo, rejects one that isn't an image and caches on the image content"""
+        photo = self.encode(Image.new("RGB", (1200, 900), (uuid.uuid4().int % 256, 120, 40)), "JPEG")
+        question = f'Photo check {uuid.uuid4().hex[:8]}: what is wrong with these leaves?'
+        response, error = self.make_request('POST', 'plants/ai-advice', {'plant_name': 'Tomatoes', 'question': question, 'photo_base64': photo})
+        if error or response.status_code != 200:
+            self.log_test("Photo Advice", False, error or response.text)
+            return
+        self.log_test("Photo Advice", response.json()['cached'] is False and 'photo' in response.json()['advice'], f"response {response.json()}")
+
+        # The same bytes behind a data URL prefix and line breaks are the same photo
+        wrapped = "data:image/jpeg;base64," + "\n".join(photo[i:i + 76] for i in range(0, len(photo), 76))
+        repeat, _ = self.make_request('POST', 'plants/ai-advice', {'plant_name': 'Tomatoes', 'question': question, 'photo_base64': wrapped})
+        self.log_test("Photo Advice Cached By Content", repeat.json()['cached'] is True, f"response {repeat.json()}")
+
+        invalid, _ = self.make_request('POST', 'plants/ai-advice', {'question': question, 'photo_base64': base64.b64encode(b'not an image').decode('ascii')})
+        invalid_job, _ = self.make_request('POST', 'plants/ai-advice/jobs', {'question': question, 'photo_base64': 'bm90IGFuIGltYWdl'})
+        self.log_test("Invalid Photo Rejected", invalid.status_code == 400 and invalid_job.status_code == 400,
+                      f"Status: {invalid.status_code} / {invalid_job.status_code}")
+
+    def run_all_tests(self):
+        """Run all ai photo tests"""
+        print("🚀 Starting Growing Together AI Photo Tests")
+        print("=" * 50)
+
+        if not self.test_admin_login():
+            print("❌ Admin login failed. Stopping tests.")
+            return False
+
+        self.test_preprocess_downscales()
+        self.test_preprocess_exif()
+        self.test_photo_advice()
+
+        print("\n" + "=" * 50)
+        print(f"📊 Test Summary: {self.tests_passed}/{self.tests_run} tests passed")
+        if self.failed_tests:
+            print("\n❌ Failed Tests:")
+            for test in self.failed_tests:
+                print(f"  - {test['test']}: {test['error']}")
+        return not self.failed_tests
+
+def main():
+    tester = AIPhotosAPITester()
+    success = tester.run_all_tests()
+    return 0 if success else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+import requests
+import os
+import sys
+import uuid
+import json
+
+# Checks for streamed AI advice: token and done events, and the cache it shares with the plain endpoint.
+# Start the server with AI_BACKEND=fake so no upstream model is called.
+
+class AIStreamAPITester:
+    def __init__(self, base_url=os.environ.get("BASE_URL", "http://localhost:8001")):
+        self.base_url = base_url
+        self.api_url = f"{base_url}/api"
+        self.admin_token = None
+        self.member_token = None
+        self.tests_run = 0
+        self.tests_passed = 0
+        self.failed_tests = []
+
+    def log_test(self, name, success, details=""):
+        """Log test results"""
+        self.tests_run += 1
+        if success:
+            self.tests_passed += 1
+            print(f"✅ {name} - PASSED")
+        else:
+            print(f"❌ {name} - FAILED: {details}")
+            self.failed_tests.append({"test": name, "error": details})
+
+    def make_request(self, method, endpoint, data=None, use_admin=True):
+        """Make API request with proper headers"""
+        url = f"{self.api_url}/{endpoint}"
+        headers = {'Content-Type': 'application/json'}
+        token = self.admin_token if use_admin else self.member_token
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        try:
+            response = requests.request(method, url, json=data, headers=headers, timeout=30)
+            return response, None
+        except requests.exceptions.RequestException as e:
+            return None, str(e)
+
+    def test_admin_login(self):
+        """Admin login"""
+        response, error = self.make_request('POST', 'auth/login', {
+            'email': 'admin@staffordallotment.com',
+            'password': 'admin123'
+        })
+        success = not error and response.status_code == 200
+        if success:
+            self.admin_token = response.json()['token']
+        self.log_test("Admin Login", success, error or (response.text if response is not None else ""))
+        return success
+
+    def test_member_login(self):
+        """Register a member, approve them as admin, log in"""
+        email = f'ai_stream_member_{uuid.uuid4().hex[:8]}@example.com'
+        response, error = self.make_request('POST', 'auth/register', {
+            'email': email, 'username': email.split('@')[0], 'password': 'testpass123', 'join_code': 'GROW2024'
+        })
+        if error or response.status_code != 200:
+            self.log_test("Member Login", False, error or response.text)
+            return False
+        self.make_request('PATCH', f"admin/users/{response.json()['user_id']}/approve")
+        response, error = self.make_request('POST', 'auth/login', {'email': email, 'password': 'testpass123'})
+        success = not error and response.status_code == 200
+        if success:
+            self.member_token = response.json()['token']
+        self.log_test("Member Login", success, error or (response.text if not success else ""))
+        return success
+
+    def stream_advice(self, question, plant_name='Tomatoes'):
+        response, error = self.make_request('POST', 'plants/ai-advice/stream', {'plant_name': plant_name, 'question': question}, use_admin=False)
+        return response if not error else None
+
+    def parse_events(self, text):
+        """Split an SSE body into (event type, data) pairs"""
+        events = []
+        for block in text.split('\n\n'):
+            fields = dict(line.split(': ', 1) for line in block.splitlines() if ': ' in line)
+            if 'event' in fields:
+                events.append((fields['event'], json.loads(fields['data'])))
+        return events
+
+    def test_stream_tokens_then_done(self):
+        """The answer arrives as token events, then one done event carrying the full payload"""
+        question = f'Stream check {uuid.uuid4().hex[:8]}: how often should I water seedlings?'
+        response = self.stream_advice(question)
+        if response is None or response.status_code != 200:
+            self.log_test("AI Stream Connects", False, response.text if response is not None else "request failed")
+            return
+        self.log_test("AI Stream Connects", response.headers.get('Content-Type', '').startswith('text/event-stream')
+                      and response.headers.get('Cache-Control') == 'no-cache', f"headers {dict(response.headers)}")
+
+        events = self.parse_events(response.text)
+        tokens = [data['text'] for event_type, data in events if event_type == 'token']
+        done = [data for event_type, data in events if event_type == 'done']
+        self.log_test("AI Stream Tokens", len(tokens) > 5 and events[-1][0] == 'done' and len(done) == 1,
+                      f"{len(tokens)} tokens, events {[event_type for event_type, _ in events][-3:]}")
+        self.log_test("AI Stream Done Payload", done and done[0]['advice'] == ''.join(tokens) and done[0]['cached'] is False
+                      and 'soil moisture' in done[0]['advice'], f"done {done}")
+
+        # The streamed answer is cached, so the same question now arrives in one piece
+        repeat = self.parse_events(self.stream_advice(question).text)
+        self.log_test("AI Stream Repeat Cached",
+                      [event_type for event_type, _ in repeat] == ['token', 'done'] and repeat[1][1]['cached'] is True
+                      and repeat[1][1]['advice'] == done[0]['advice'], f"events {repeat}")
+
+        plain, _ = self.make_request('POST', 'plants/ai-advice', {'plant_name': 'Tomatoes', 'question': question}, use_admin=False)
+        self.log_test("AI Stream Shares Cache With Plain Endpoint", plain.json()['cached'] is True, f"response {plain.json()}")
+
+    def test_stream_requires_auth(self):
+        """Anonymous callers can't open an advice stream"""
+        response = requests.post(f"{self.api_url}/plants/ai-advice/stream", json={'question': 'Anyone there?'}, timeout=10)
+        self.log_test("AI Stream Requires Auth", response.status_code in (401, 403), f"Status: {response.status_code}")
+
+    def run_all_tests(self):
+        """Run all ai stream tests"""
+        print("🚀 Starting Growing Together AI Stream Tests")
+        print("=" * 50)
+
+        if not self.test_admin_login():
+            print("❌ Admin login failed. Stopping tests.")
+            return False
+        if not self.test_member_login():
+            print("❌ Member login failed. Stopping tests.")
+            return False
+
+        self.test_stream_tokens_then_done()
+        self.test_stream_requires_auth()
+
+        print("\n" + "=" * 50)
+        print(f"📊 Test Summary: {self.tests_passed}/{self.tests_run} tests passed")
+        if self.failed_tests:
+            print("\n❌ Failed Tests:")
+            for test in self.failed_tests:
+                print(f"  - {test['test']}: {test['error']}")
+        return not self.failed_tests
+
+def main():
+    tester = AIStreamAPITester()
+    success = tester.run_all_tests()
+    return 0 if success else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
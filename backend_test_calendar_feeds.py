@@ -0,0 +1,177 @@
+import requests
+import asyncio
+import os
+import sys
+import uuid
+from datetime import datetime, timedelta
+
+# Checks for the cached iCalendar feeds. Run from an environment that can import backend/server.py,
+# pointed at the same MONGO_URL and DB_NAME as the server (BASE_URL, default http://localhost:8001):
+# one check writes to the database directly, as another worker would.
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+import server
+
+class CalendarFeedsAPITester:
+    def __init__(self, base_url=os.environ.get("BASE_URL", "http://localhost:8001")):
+        self.base_url = base_url
+        self.api_url = f"{base_url}/api"
+        self.admin_token = None
+        self.member_token = None
+        self.tests_run = 0
+        self.tests_passed = 0
+        self.failed_tests = []
+        self.loop = asyncio.new_event_loop()  # one loop, so the Motor client stays on it
+
+    def log_test(self, name, success, details=""):
+        """Log test results"""
+        self.tests_run += 1
+        if success:
+            self.tests_passed += 1
+            print(f"✅ {name} - PASSED")
+        else:
+            print(f"❌ {name} - FAILED: {details}")
+            self.failed_tests.append({"test": name, "error": details})
+
+    def make_request(self, method, endpoint, data=None, use_admin=True):
+        """Make API request with proper headers"""
+        url = f"{self.api_url}/{endpoint}"
+        headers = {'Content-Type': 'application/json'}
+        token = self.admin_token if use_admin else self.member_token
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        try:
+            response = requests.request(method, url, json=data, headers=headers, timeout=30)
+            return response, None
+        except requests.exceptions.RequestException as e:
+            return None, str(e)
+
+    def run(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+    def test_admin_login(self):
+        """Admin login"""
+        response, error = self.make_request('POST', 'auth/login', {
+            'email': 'admin@staffordallotment.com',
+            'password': 'admin123'
+        })
+        success = not error and response.status_code == 200
+        if success:
+            self.admin_token = response.json()['token']
+        self.log_test("Admin Login", success, error or (response.text if response is not None else ""))
+        return success
+
+    def test_member_login(self):
+        """Register a member, approve them as admin, log in"""
+        email = f'calendar_member_{uuid.uuid4().hex[:8]}@example.com'
+        response, error = self.make_request('POST', 'auth/register', {
+            'email': email, 'username': email.split('@')[0], 'password': 'testpass123', 'join_code': 'GROW2024'
+        })
+        if error or response.status_code != 200:
+            self.log_test("Member Login", False, error or response.text)
+            return False
+        self.make_request('PATCH', f"admin/users/{response.json()['user_id']}/approve")
+        response, error = self.make_request('POST', 'auth/login', {'email': email, 'password': 'testpass123'})
+        success = not error and response.status_code == 200
+        if success:
+            self.member_token = response.json()['token']
+        self.log_test("Member Login", success, error or (response.text if not success else ""))
+        return success
+
+    def feed_url(self, use_admin=True, site=True):
+        response, error = self.make_request('GET', 'calendar/token', use_admin=use_admin)
+        if error or response.status_code != 200:
+            return None
+        return f"{self.base_url}{response.json()['site_url' if site else 'member_url']}"
+
+    def test_calendar_not_modified(self):
+        """An unchanged calendar feed answers If-None-Match with 304, even after the render cache expires"""
+        feed_url = self.feed_url()
+        if not feed_url:
+            self.log_test("Calendar Feed", False, "No feed URL")
+            return
+        first = requests.get(feed_url, timeout=10)
+        etag = first.headers.get('ETag')
+        self.log_test("Calendar Feed", first.status_code == 200 and etag and first.text.startswith("BEGIN:VCALENDAR"),
+                      f"Status: {first.status_code}")
+
+        # The server's render cache expires between polls; a re-render must reproduce the same body and ETag
+        self.log_test("Calendar Render Stable",
+                      server.render_ics("Check", [], [{"id": "t", "title": "Weed", "due_date": datetime(2030, 5, 1), "created_at": datetime(2030, 4, 1)}])
+                      == server.render_ics("Check", [], [{"id": "t", "title": "Weed", "due_date": datetime(2030, 5, 1), "created_at": datetime(2030, 4, 1)}]))
+        repeat = requests.get(feed_url, headers={'If-None-Match': etag}, timeout=10)
+        self.log_test("Calendar Not Modified", repeat.status_code == 304, f"Status: {repeat.status_code}")
+
+    def test_calendar_bad_token(self):
+        """A feed token with the wrong signature is not found"""
+        response = requests.get(f"{self.api_url}/calendar/site.{'0' * 32}.ics", timeout=10)
+        self.log_test("Calendar Bad Token", response.status_code == 404, f"Status: {response.status_code}")
+
+    def test_calendar_other_worker_write(self):
+        """An event written by another worker (straight to the database here) changes the feed"""
+        feed_url = self.feed_url()
+        etag = requests.get(feed_url, timeout=10).headers.get('ETag')
+        title = f"Written elsewhere {uuid.uuid4().hex[:8]}"
+
+        async def insert():
+            event = server.Event(title=title, description="x", date=datetime.utcnow() + timedelta(days=7), location="x", created_by="calendar-test")
+            async with server.change_seqs() as seq:
+                await server.db.events.insert_one({**event.dict(), "change_seq": seq})
+            return event.id
+
+        event_id = self.run(insert())
+        try:
+            response = requests.get(feed_url, headers={'If-None-Match': etag}, timeout=10)
+            self.log_test("Calendar Sees Other Worker", response.status_code == 200 and title in response.text,
+                          f"Status: {response.status_code}")
+        finally:
+            self.run(server.db.events.delete_one({"id": event_id}))
+
+    def test_member_calendar_tasks(self):
+        """A member's own feed carries their open tasks with due dates; the site feed doesn't"""
+        me, _ = self.make_request('GET', 'auth/me', use_admin=False)
+        title = f"Calendar task {uuid.uuid4().hex[:8]}"
+        response, _ = self.make_request('POST', 'tasks', {
+            'title': title, 'description': 'Turn the compost', 'task_type': 'personal',
+            'assigned_to': me.json()['id'], 'due_date': (datetime.utcnow() + timedelta(days=3)).isoformat()
+        })
+        if response.status_code != 200:
+            self.log_test("Member Calendar Task", False, response.text)
+            return
+        member_feed = requests.get(self.feed_url(use_admin=False, site=False), timeout=10).text
+        site_feed = requests.get(self.feed_url(use_admin=False), timeout=10).text
+        self.log_test("Member Calendar Task", f"SUMMARY:Task: {title}" in member_feed and title not in site_feed,
+                      f"in member feed: {title in member_feed}, in site feed: {title in site_feed}")
+
+    def run_all_tests(self):
+        """Run all calendar feed tests"""
+        print("🚀 Starting Growing Together Calendar Feed Tests")
+        print("=" * 50)
+
+        if not self.test_admin_login():
+            print("❌ Admin login failed. Stopping tests.")
+            return False
+        if not self.test_member_login():
+            print("❌ Member login failed. Stopping tests.")
+            return False
+
+        self.test_calendar_not_modified()
+        self.test_calendar_bad_token()
+        self.test_calendar_other_worker_write()
+        self.test_member_calendar_tasks()
+
+        print("\n" + "=" * 50)
+        print(f"📊 Test Summary: {self.tests_passed}/{self.tests_run} tests passed")
+        if self.failed_tests:
+            print("\n❌ Failed Tests:")
+            for test in self.failed_tests:
+                print(f"  - {test['test']}: {test['error']}")
+        return not self.failed_tests
+
+def main():
+    tester = CalendarFeedsAPITester()
+    success = tester.run_all_tests()
+    return 0 if success else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
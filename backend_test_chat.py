@@ -0,0 +1,152 @@
+import requests
+import os
+import sys
+import uuid
+
+# Checks for member chat: bucketed room history, direct rooms and read markers.
+# Run against a running server (BASE_URL, default http://localhost:8001).
+
+class ChatAPITester:
+    def __init__(self, base_url=os.environ.get("BASE_URL", "http://localhost:8001")):
+        self.base_url = base_url
+        self.api_url = f"{base_url}/api"
+        self.admin_token = None
+        self.member_token = None
+        self.tests_run = 0
+        self.tests_passed = 0
+        self.failed_tests = []
+
+    def log_test(self, name, success, details=""):
+        """Log test results"""
+        self.tests_run += 1
+        if success:
+            self.tests_passed += 1
+            print(f"✅ {name} - PASSED")
+        else:
+            print(f"❌ {name} - FAILED: {details}")
+            self.failed_tests.append({"test": name, "error": details})
+
+    def make_request(self, method, endpoint, data=None, use_admin=True):
+        """Make API request with proper headers"""
+        url = f"{self.api_url}/{endpoint}"
+        headers = {'Content-Type': 'application/json'}
+        token = self.admin_token if use_admin else self.member_token
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        try:
+            response = requests.request(method, url, json=data, headers=headers, timeout=30)
+            return response, None
+        except requests.exceptions.RequestException as e:
+            return None, str(e)
+
+    def test_admin_login(self):
+        """Admin login"""
+        response, error = self.make_request('POST', 'auth/login', {
+            'email': 'admin@staffordallotment.com',
+            'password': 'admin123'
+        })
+        success = not error and response.status_code == 200
+        if success:
+            self.admin_token = response.json()['token']
+        self.log_test("Admin Login", success, error or (response.text if response is not None else ""))
+        return success
+
+    def test_member_login(self):
+        """Register a member, approve them as admin, log in"""
+        email = f'chat_member_{uuid.uuid4().hex[:8]}@example.com'
+        response, error = self.make_request('POST', 'auth/register', {
+            'email': email, 'username': email.split('@')[0], 'password': 'testpass123', 'join_code': 'GROW2024'
+        })
+        if error or response.status_code != 200:
+            self.log_test("Member Login", False, error or response.text)
+            return False
+        self.make_request('PATCH', f"admin/users/{response.json()['user_id']}/approve")
+        response, error = self.make_request('POST', 'auth/login', {'email': email, 'password': 'testpass123'})
+        success = not error and response.status_code == 200
+        if success:
+            self.member_token = response.json()['token']
+        self.log_test("Member Login", success, error or (response.text if not success else ""))
+        return success
+
+    def test_room_history(self):
+        """Messages come back newest-first in pages, each page in chronological order"""
+        response, _ = self.make_request('POST', 'events', {
+            'title': f'Chat check {uuid.uuid4().hex[:8]}', 'description': 'x', 'location': 'x', 'date': '2031-06-01T10:00:00'
+        })
+        room_id = f"event:{response.json()['id']}"
+        sent = []
+        for i in range(3):
+            response, _ = self.make_request('POST', f'chat/rooms/{room_id}/messages', {'content': f'Message {i}'}, use_admin=False)
+            if response.status_code != 200:
+                self.log_test("Chat Send", False, response.text)
+                return
+            sent.append(response.json()['id'])
+        self.log_test("Chat Send", True)
+
+        response, _ = self.make_request('GET', f'chat/rooms/{room_id}/messages?limit=2')
+        page = response.json()
+        self.log_test("Chat History Page", [m['id'] for m in page['messages']] == sent[1:] and page['next_cursor'],
+                      f"page {[m['content'] for m in page['messages']]}")
+        response, _ = self.make_request('GET', f"chat/rooms/{room_id}/messages?limit=2&cursor={page['next_cursor']}")
+        older = response.json()
+        self.log_test("Chat History Older Page", [m['id'] for m in older['messages']] == sent[:1] and not older['next_cursor'],
+                      f"page {[m['content'] for m in older['messages']]}")
+
+        blank, _ = self.make_request('POST', f'chat/rooms/{room_id}/messages', {'content': '   '}, use_admin=False)
+        self.log_test("Chat Rejects Blank Message", blank.status_code == 400, f"Status: {blank.status_code}")
+
+    def test_direct_room(self):
+        """Direct rooms are private to their two members and track unread state"""
+        admin, _ = self.make_request('GET', 'auth/me')
+        response, _ = self.make_request('POST', 'chat/direct', {'user_id': admin.json()['id']}, use_admin=False)
+        if response.status_code != 200:
+            self.log_test("Direct Room Opened", False, response.text)
+            return
+        room = response.json()
+        self.log_test("Direct Room Opened", room['kind'] == 'direct' and admin.json()['id'] in room['member_ids'], f"room {room}")
+
+        self.make_request('POST', f"chat/rooms/{room['id']}/messages", {'content': 'Can you check the water trough?'})
+        rooms, _ = self.make_request('GET', 'chat/rooms', use_admin=False)
+        listed = next((r for r in rooms.json() if r['id'] == room['id']), None)
+        self.log_test("Direct Room Unread", listed is not None and listed['has_unread'], f"room {listed}")
+
+        self.make_request('POST', f"chat/rooms/{room['id']}/read", {'last_read_at': listed['last_message_at']}, use_admin=False)
+        rooms, _ = self.make_request('GET', 'chat/rooms', use_admin=False)
+        listed = next((r for r in rooms.json() if r['id'] == room['id']), None)
+        reads, _ = self.make_request('GET', f"chat/rooms/{room['id']}/reads")
+        self.log_test("Direct Room Read", listed is not None and not listed['has_unread'] and len(reads.json()) == 1,
+                      f"room {listed}, reads {reads.json()}")
+
+        self_chat, _ = self.make_request('POST', 'chat/direct', {'user_id': admin.json()['id']})
+        self.log_test("Direct Room Needs Another Member", self_chat.status_code == 400, f"Status: {self_chat.status_code}")
+
+    def run_all_tests(self):
+        """Run all chat tests"""
+        print("🚀 Starting Growing Together Chat Tests")
+        print("=" * 50)
+
+        if not self.test_admin_login():
+            print("❌ Admin login failed. Stopping tests.")
+            return False
+        if not self.test_member_login():
+            print("❌ Member login failed. Stopping tests.")
+            return False
+
+        self.test_room_history()
+        self.test_direct_room()
+
+        print("\n" + "=" * 50)
+        print(f"📊 Test Summary: {self.tests_passed}/{self.tests_run} tests passed")
+        if self.failed_tests:
+            print("\n❌ Failed Tests:")
+            for test in self.failed_tests:
+                print(f"  - {test['test']}: {test['error']}")
+        return not self.failed_tests
+
+def main():
+    tester = ChatAPITester()
+    success = tester.run_all_tests()
+    return 0 if success else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
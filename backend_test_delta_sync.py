@@ -0,0 +1,246 @@
+import requests
+import asyncio
+import os
+import sys
+import uuid
+from datetime import datetime, timedelta
+
+# Checks for delta sync: the change seq horizon, page boundaries, deletions and what each device is sent.
+# Run this from an environment that can import backend/server.py pointed at the same MONGO_URL and DB_NAME:
+# some checks reach into the database to set up states the API can't produce on demand.
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+import server
+
+class DeltaSyncAPITester:
+    def __init__(self, base_url=os.environ.get("BASE_URL", "http://localhost:8001")):
+        self.base_url = base_url
+        self.api_url = f"{base_url}/api"
+        self.admin_token = None
+        self.member_token = None
+        self.tests_run = 0
+        self.tests_passed = 0
+        self.failed_tests = []
+        self.loop = asyncio.new_event_loop()  # one loop, so the Motor client stays on it
+
+    def log_test(self, name, success, details=""):
+        """Log test results"""
+        self.tests_run += 1
+        if success:
+            self.tests_passed += 1
+            print(f"✅ {name} - PASSED")
+        else:
+            print(f"❌ {name} - FAILED: {details}")
+            self.failed_tests.append({"test": name, "error": details})
+
+    def make_request(self, method, endpoint, data=None, use_admin=True):
+        """Make API request with proper headers"""
+        url = f"{self.api_url}/{endpoint}"
+        headers = {'Content-Type': 'application/json'}
+        token = self.admin_token if use_admin else self.member_token
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        try:
+            response = requests.request(method, url, json=data, headers=headers, timeout=30)
+            return response, None
+        except requests.exceptions.RequestException as e:
+            return None, str(e)
+
+    def run(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+    def test_admin_login(self):
+        """Admin login"""
+        response, error = self.make_request('POST', 'auth/login', {
+            'email': 'admin@staffordallotment.com',
+            'password': 'admin123'
+        })
+        success = not error and response.status_code == 200
+        if success:
+            self.admin_token = response.json()['token']
+        self.log_test("Admin Login", success, error or (response.text if response is not None else ""))
+        return success
+
+    def test_member_login(self):
+        """Register a member, approve them as admin, log in"""
+        email = f'delta_member_{uuid.uuid4().hex[:8]}@example.com'
+        response, error = self.make_request('POST', 'auth/register', {
+            'email': email, 'username': email.split('@')[0], 'password': 'testpass123', 'join_code': 'GROW2024'
+        })
+        if error or response.status_code != 200:
+            self.log_test("Member Login", False, error or response.text)
+            return False
+        self.make_request('PATCH', f"admin/users/{response.json()['user_id']}/approve")
+        response, error = self.make_request('POST', 'auth/login', {'email': email, 'password': 'testpass123'})
+        success = not error and response.status_code == 200
+        if success:
+            self.member_token = response.json()['token']
+        self.log_test("Member Login", success, error or (response.text if not success else ""))
+        return success
+
+    def pull_changes(self, cursor, use_admin=True, limit=500):
+        """Follow the sync cursor to the end, merging the pages"""
+        changes, deleted = {}, {}
+        while True:
+            response, _ = self.make_request('GET', f'sync/changes?cursor={cursor}&limit={limit}', use_admin=use_admin)
+            page = response.json()
+            for name, documents in page['changes'].items():
+                changes.setdefault(name, []).extend(documents)
+            for name, ids in page['deleted'].items():
+                deleted.setdefault(name, []).extend(ids)
+            cursor = page['cursor']
+            if not page['has_more']:
+                return changes, deleted, cursor
+
+    def test_change_seq_horizon(self):
+        """The sync horizon stays below a reserved seq until its writes land, and ignores abandoned reservations"""
+        async def check():
+            async with server.change_seqs() as seq:
+                during = await server.change_seq_horizon()
+            after = await server.change_seq_horizon()
+            # A reservation older than the grace period belongs to a writer that died
+            stale = await server.db.change_inflight.insert_one({
+                "floor": 0, "at": datetime.utcnow() - timedelta(seconds=server.CHANGE_INFLIGHT_GRACE_SECONDS + 5)
+            })
+            try:
+                with_stale = await server.change_seq_horizon()
+            finally:
+                await server.db.change_inflight.delete_one({"_id": stale.inserted_id})
+            return seq, during, after, with_stale
+
+        seq, during, after, with_stale = self.run(check())
+        self.log_test("Horizon Holds Back In-flight Seq", during < seq, f"seq {seq}, horizon during write {during}")
+        self.log_test("Horizon Passes Landed Seq", after >= seq, f"seq {seq}, horizon after write {after}")
+        self.log_test("Horizon Ignores Stale Reservation", with_stale >= seq, f"seq {seq}, horizon {with_stale}")
+
+    def test_sync_changes_paging(self):
+        """Documents sharing one change seq arrive in the same page, even when they overflow it"""
+        async def seed():
+            async with server.change_seqs() as seq:
+                posts = [server.CommunityPost(user_id="sync-test", username="sync-test", content=f"Shared seq {i}").dict() for i in range(3)]
+                await server.db.posts.insert_many([{**post, "change_seq": seq} for post in posts])
+            async with server.change_seqs() as later:
+                post = server.CommunityPost(user_id="sync-test", username="sync-test", content="Next seq").dict()
+                await server.db.posts.insert_one({**post, "change_seq": later})
+            return seq, later, [post["id"] for post in posts], post["id"]
+
+        seq, later, group_ids, later_id = self.run(seed())
+        try:
+            response, error = self.make_request('GET', f'sync/changes?cursor={seq - 1}&limit=2')
+            if error or response.status_code != 200:
+                self.log_test("Sync Changes Group Page", False, error or response.text)
+                return
+            page = response.json()
+            page_ids = [post['id'] for post in page['changes']['posts']]
+            self.log_test("Sync Changes Group Page", set(group_ids) <= set(page_ids) and later_id not in page_ids,
+                          f"page posts {page_ids}")
+            self.log_test("Sync Changes Group Cursor", page['has_more'] and page['cursor'] == seq, f"cursor {page['cursor']}")
+
+            response, error = self.make_request('GET', f"sync/changes?cursor={page['cursor']}&limit=2")
+            next_ids = [post['id'] for post in response.json()['changes']['posts']] if not error else []
+            self.log_test("Sync Changes Next Page", later_id in next_ids and not set(group_ids) & set(next_ids), f"next posts {next_ids}")
+        finally:
+            self.run(server.db.posts.delete_many({"user_id": "sync-test"}))
+
+    def test_oversized_group_tombstones(self):
+        """A seq group larger than the page arrives whole, deletions included"""
+        async def seed():
+            async with server.change_seqs() as seq:
+                posts = [server.CommunityPost(user_id="sync-test", username="sync-test", content=f"Big group {i}").dict() for i in range(3)]
+                await server.db.posts.insert_many([{**post, "change_seq": seq} for post in posts])
+                gone = str(uuid.uuid4())
+                await server.record_tombstone("posts", gone, seq)
+            return seq, [post["id"] for post in posts], gone
+
+        seq, group_ids, gone = self.run(seed())
+        try:
+            response, _ = self.make_request('GET', f'sync/changes?cursor={seq - 1}&limit=2')
+            page = response.json()
+            page_ids = [post['id'] for post in page['changes']['posts']]
+            self.log_test("Oversized Group Sent Whole", set(group_ids) <= set(page_ids) and page['cursor'] == seq, f"page posts {page_ids}")
+            self.log_test("Oversized Group Tombstones", gone in page['deleted']['posts'], f"deleted {page['deleted']['posts']}")
+        finally:
+            self.run(server.db.posts.delete_many({"user_id": "sync-test"}))
+            self.run(server.db.tombstones.delete_one({"collection": "posts", "id": gone}))
+
+    def test_occurrence_rsvp_sync(self):
+        """Occurrence RSVPs sync as documents, and cancelling one, directly or from the offline queue, syncs a deletion"""
+        response, error = self.make_request('POST', 'events', {
+            'title': f'Sync RSVP check {uuid.uuid4().hex[:8]}', 'description': 'Checks', 'location': 'Main gate',
+            'date': '2034-05-06T10:00:00', 'recurrence': {'freq': 'weekly', 'count': 4}
+        })
+        if error or response.status_code != 200:
+            self.log_test("Occurrence RSVP Synced", False, error or response.text)
+            return
+        event_id = response.json()['id']
+        cursor = self.run(server.change_seq_horizon())
+
+        self.make_request('POST', f'events/{event_id}/rsvp?occurrence=2034-05-06T10:00:00', use_admin=False)
+        self.make_request('POST', f'events/{event_id}/rsvp?occurrence=2034-05-13T10:00:00', use_admin=False)
+        changes, _, cursor = self.pull_changes(cursor, use_admin=False)
+        rsvps = {rsvp['occurrence'][:10]: rsvp['id'] for rsvp in changes['rsvps'] if rsvp['event_id'] == event_id}
+        self.log_test("Occurrence RSVP Synced", set(rsvps) == {'2034-05-06', '2034-05-13'} and all(rsvps.values()), f"rsvps {rsvps}")
+
+        self.make_request('POST', f'events/{event_id}/rsvp?occurrence=2034-05-06T10:00:00', use_admin=False)
+        self.make_request('POST', 'sync/mutations', {'mutations': [{
+            'idempotency_key': str(uuid.uuid4()), 'type': 'event.rsvp',
+            'payload': {'event_id': event_id, 'occurrence': '2034-05-13T10:00:00', 'rsvp': False}
+        }]}, use_admin=False)
+        _, deleted, _ = self.pull_changes(cursor, use_admin=False)
+        self.log_test("Occurrence RSVP Cancel Synced", set(rsvps.values()) <= set(deleted['rsvps']), f"deleted {deleted['rsvps']}")
+        _, deleted, _ = self.pull_changes(cursor)
+        self.log_test("Occurrence RSVP Cancel Visible To All", set(rsvps.values()) <= set(deleted['rsvps']), f"deleted {deleted['rsvps']}")
+        self.run(server.db.events.delete_one({'id': event_id}))  # events have no delete endpoint
+
+    def test_private_changes_stay_private(self):
+        """A member's diary changes reach their own devices, not the admin's"""
+        cursor = self.run(server.change_seq_horizon())
+        response, error = self.make_request('POST', 'diary', {
+            'plot_number': '1', 'entry_type': 'general', 'title': f'Private sync check {uuid.uuid4().hex[:8]}', 'content': 'Mine'
+        }, use_admin=False)
+        if error or response.status_code != 200:
+            self.log_test("Diary Synced To Owner", False, error or response.text)
+            return
+        entry_id = response.json()['id']
+        self.make_request('DELETE', f'diary/{entry_id}', use_admin=False)
+
+        member_changes, member_deleted, _ = self.pull_changes(cursor, use_admin=False)
+        admin_changes, admin_deleted, _ = self.pull_changes(cursor)
+        self.log_test("Diary Deletion Synced To Owner", entry_id in member_deleted['diary'], f"deleted {member_deleted['diary']}")
+        self.log_test("Diary Kept Off Admin Devices",
+                      entry_id not in [entry['id'] for entry in admin_changes['diary']] and entry_id not in admin_deleted['diary'],
+                      f"admin diary {[entry['id'] for entry in admin_changes['diary']]}, deleted {admin_deleted['diary']}")
+
+    def run_all_tests(self):
+        """Run all delta sync tests"""
+        print("🚀 Starting Growing Together Delta Sync Tests")
+        print("=" * 50)
+
+        if not self.test_admin_login():
+            print("❌ Admin login failed. Stopping tests.")
+            return False
+        if not self.test_member_login():
+            print("❌ Member login failed. Stopping tests.")
+            return False
+
+        self.test_change_seq_horizon()
+        self.test_sync_changes_paging()
+        self.test_oversized_group_tombstones()
+        self.test_occurrence_rsvp_sync()
+        self.test_private_changes_stay_private()
+
+        print("\n" + "=" * 50)
+        print(f"📊 Test Summary: {self.tests_passed}/{self.tests_run} tests passed")
+        if self.failed_tests:
+            print("\n❌ Failed Tests:")
+            for test in self.failed_tests:
+                print(f"  - {test['test']}: {test['error']}")
+        return not self.failed_tests
+
+def main():
+    tester = DeltaSyncAPITester()
+    success = tester.run_all_tests()
+    return 0 if success else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+import requests
+import asyncio
+import os
+import sys
+import uuid
+
+# Checks for diary tag facets: normalised tags, per-member and site-wide counts through edits and deletes.
+# Run this from an environment that can import backend/server.py pointed at the same MONGO_URL and DB_NAME:
+# the last check recounts the facets in the database and compares.
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+import server
+
+class DiaryTagsAPITester:
+    def __init__(self, base_url=os.environ.get("BASE_URL", "http://localhost:8001")):
+        self.base_url = base_url
+        self.api_url = f"{base_url}/api"
+        self.admin_token = None
+        self.member_token = None
+        self.tests_run = 0
+        self.tests_passed = 0
+        self.failed_tests = []
+        self.loop = asyncio.new_event_loop()  # one loop, so the Motor client stays on it
+
+    def log_test(self, name, success, details=""):
+        """Log test results"""
+        self.tests_run += 1
+        if success:
+            self.tests_passed += 1
+            print(f"✅ {name} - PASSED")
+        else:
+            print(f"❌ {name} - FAILED: {details}")
+            self.failed_tests.append({"test": name, "error": details})
+
+    def make_request(self, method, endpoint, data=None, use_admin=True):
+        """Make API request with proper headers"""
+        url = f"{self.api_url}/{endpoint}"
+        headers = {'Content-Type': 'application/json'}
+        token = self.admin_token if use_admin else self.member_token
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        try:
+            response = requests.request(method, url, json=data, headers=headers, timeout=30)
+            return response, None
+        except requests.exceptions.RequestException as e:
+            return None, str(e)
+
+    def run(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+    def test_admin_login(self):
+        """Admin login"""
+        response, error = self.make_request('POST', 'auth/login', {
+            'email': 'admin@staffordallotment.com',
+            'password': 'admin123'
+        })
+        success = not error and response.status_code == 200
+        if success:
+            self.admin_token = response.json()['token']
+        self.log_test("Admin Login", success, error or (response.text if response is not None else ""))
+        return success
+
+    def test_member_login(self):
+        """Register a member, approve them as admin, log in"""
+        email = f'tags_member_{uuid.uuid4().hex[:8]}@example.com'
+        response, error = self.make_request('POST', 'auth/register', {
+            'email': email, 'username': email.split('@')[0], 'password': 'testpass123', 'join_code': 'GROW2024'
+        })
+        if error or response.status_code != 200:
+            self.log_test("Member Login", False, error or response.text)
+            return False
+        self.make_request('PATCH', f"admin/users/{response.json()['user_id']}/approve")
+        response, error = self.make_request('POST', 'auth/login', {'email': email, 'password': 'testpass123'})
+        success = not error and response.status_code == 200
+        if success:
+            self.member_token = response.json()['token']
+        self.log_test("Member Login", success, error or (response.text if not success else ""))
+        return success
+
+    def add_entry(self, tags, use_admin=False):
+        response, _ = self.make_request('POST', 'diary', {
+            'plot_number': '1', 'entry_type': 'general', 'title': f'Tag check {uuid.uuid4().hex[:8]}', 'content': 'Tagged', 'tags': tags
+        }, use_admin=use_admin)
+        return response.json()
+
+    def counts(self, scope, marker, use_admin=False):
+        """This run's tags and their counts, keyed without the run marker"""
+        response, _ = self.make_request('GET', f'diary/tags?scope={scope}&limit=500', use_admin=use_admin)
+        return {facet['tag'].replace(f'-{marker}', ''): facet['count'] for facet in response.json() if facet['tag'].endswith(marker)}
+
+    def test_tag_counts(self):
+        """Tags are normalised, counted once per entry, and kept current through edits and deletes"""
+        marker = uuid.uuid4().hex[:8]
+        compost, beans, peas = f'compost-{marker}', f'beans-{marker}', f'peas-{marker}'
+        first = self.add_entry([compost.upper(), f' {compost} ', beans])
+        second = self.add_entry([compost])
+        self.add_entry([compost], use_admin=True)
+        self.log_test("Tags Normalised", first.get('tags') == [compost, beans], f"tags {first.get('tags')}")
+        self.log_test("Tag Counts Mine", self.counts('mine', marker) == {'compost': 2, 'beans': 1}, f"counts {self.counts('mine', marker)}")
+        self.log_test("Tag Counts Site", self.counts('site', marker) == {'compost': 3, 'beans': 1}, f"counts {self.counts('site', marker)}")
+
+        self.make_request('PATCH', f"diary/{first['id']}", {'tags': [compost, peas]}, use_admin=False)
+        self.log_test("Tag Counts After Edit", self.counts('mine', marker) == {'compost': 2, 'peas': 1}, f"counts {self.counts('mine', marker)}")
+        self.make_request('DELETE', f"diary/{second['id']}", use_admin=False)
+        self.log_test("Tag Counts After Delete", self.counts('mine', marker) == {'compost': 1, 'peas': 1}
+                      and self.counts('site', marker) == {'compost': 2, 'peas': 1}, f"counts {self.counts('site', marker)}")
+
+        response, _ = self.make_request('GET', f'diary?tag={compost.upper()}', use_admin=False)
+        self.log_test("Diary Tag Filter", [entry['id'] for entry in response.json()] == [first['id']], f"{len(response.json())} entries")
+
+        # A full recount agrees with the counts kept up on every write
+        before = self.counts('site', marker)
+        self.run(server.rebuild_tag_facets())
+        self.log_test("Tag Counts Match Rebuild", self.counts('site', marker) == before, f"before {before}, after {self.counts('site', marker)}")
+
+    def test_tag_request_validation(self):
+        """Unknown scopes and oversized limits are rejected"""
+        scope, _ = self.make_request('GET', 'diary/tags?scope=everyone', use_admin=False)
+        limit, _ = self.make_request('GET', 'diary/tags?limit=1000', use_admin=False)
+        self.log_test("Tag Request Validation", scope.status_code == 422 and limit.status_code == 422,
+                      f"Status: {scope.status_code} / {limit.status_code}")
+
+    def run_all_tests(self):
+        """Run all diary tag tests"""
+        print("🚀 Starting Growing Together Diary Tag Tests")
+        print("=" * 50)
+
+        if not self.test_admin_login():
+            print("❌ Admin login failed. Stopping tests.")
+            return False
+        if not self.test_member_login():
+            print("❌ Member login failed. Stopping tests.")
+            return False
+
+        self.test_tag_counts()
+        self.test_tag_request_validation()
+
+        print("\n" + "=" * 50)
+        print(f"📊 Test Summary: {self.tests_passed}/{self.tests_run} tests passed")
+        if self.failed_tests:
+            print("\n❌ Failed Tests:")
+            for test in self.failed_tests:
+                print(f"  - {test['test']}: {test['error']}")
+        return not self.failed_tests
+
+def main():
+    tester = DiaryTagsAPITester()
+    success = tester.run_all_tests()
+    return 0 if success else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+import requests
+import os
+import sys
+import uuid
+
+# Checks for the ranked community feed: featured posts first, then cursor pages of regular posts.
+# Run against a running server (BASE_URL, default http://localhost:8001).
+
+class FeedAPITester:
+    def __init__(self, base_url=os.environ.get("BASE_URL", "http://localhost:8001")):
+        self.base_url = base_url
+        self.api_url = f"{base_url}/api"
+        self.admin_token = None
+        self.member_token = None
+        self.tests_run = 0
+        self.tests_passed = 0
+        self.failed_tests = []
+
+    def log_test(self, name, success, details=""):
+        """Log test results"""
+        self.tests_run += 1
+        if success:
+            self.tests_passed += 1
+            print(f"✅ {name} - PASSED")
+        else:
+            print(f"❌ {name} - FAILED: {details}")
+            self.failed_tests.append({"test": name, "error": details})
+
+    def make_request(self, method, endpoint, data=None, use_admin=True):
+        """Make API request with proper headers"""
+        url = f"{self.api_url}/{endpoint}"
+        headers = {'Content-Type': 'application/json'}
+        token = self.admin_token if use_admin else self.member_token
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        try:
+            response = requests.request(method, url, json=data, headers=headers, timeout=30)
+            return response, None
+        except requests.exceptions.RequestException as e:
+            return None, str(e)
+
+    def test_admin_login(self):
+        """Admin login"""
+        response, error = self.make_request('POST', 'auth/login', {
+            'email': 'admin@staffordallotment.com',
+            'password': 'admin123'
+        })
+        success = not error and response.status_code == 200
+        if success:
+            self.admin_token = response.json()['token']
+        self.log_test("Admin Login", success, error or (response.text if response is not None else ""))
+        return success
+
+    def test_member_login(self):
+        """Register a member, approve them as admin, log in"""
+        email = f'feed_member_{uuid.uuid4().hex[:8]}@example.com'
+        response, error = self.make_request('POST', 'auth/register', {
+            'email': email, 'username': email.split('@')[0], 'password': 'testpass123', 'join_code': 'GROW2024'
+        })
+        if error or response.status_code != 200:
+            self.log_test("Member Login", False, error or response.text)
+            return False
+        self.make_request('PATCH', f"admin/users/{response.json()['user_id']}/approve")
+        response, error = self.make_request('POST', 'auth/login', {'email': email, 'password': 'testpass123'})
+        success = not error and response.status_code == 200
+        if success:
+            self.member_token = response.json()['token']
+        self.log_test("Member Login", success, error or (response.text if not success else ""))
+        return success
+
+    def create_post(self, content):
+        response, _ = self.make_request('POST', 'posts', {'content': content})
+        return response.json()['id']
+
+    def feed_ids(self, cursor=None, limit=5):
+        endpoint = f'posts/feed?limit={limit}' + (f'&cursor={cursor}' if cursor else '')
+        response, _ = self.make_request('GET', endpoint, use_admin=False)
+        page = response.json()
+        return [post['id'] for post in page['posts']], page['next_cursor']
+
+    def test_featured_first(self):
+        """Pinned posts lead the first page, then announcements, then the newest regular posts"""
+        tag = uuid.uuid4().hex[:8]
+        pinned = self.create_post(f'Pinned {tag}')
+        announcement = self.create_post(f'Announcement {tag}')
+        regular = self.create_post(f'Regular {tag}')
+        self.make_request('PATCH', f'posts/{pinned}/feature', {'is_pinned': True})
+        self.make_request('PATCH', f'posts/{announcement}/feature', {'is_announcement': True})
+
+        ids, _ = self.feed_ids()
+        order = [ids.index(post_id) if post_id in ids else None for post_id in (pinned, announcement, regular)]
+        self.log_test("Featured Posts First", None not in order and order == sorted(order), f"positions {order}")
+
+        self.make_request('PATCH', f'posts/{pinned}/feature', {'is_pinned': False})
+        self.make_request('PATCH', f'posts/{announcement}/feature', {'is_announcement': False})
+        ids, _ = self.feed_ids(limit=100)
+        self.log_test("Unfeatured Posts Rejoin Feed", pinned in ids and ids.index(pinned) > ids.index(regular),
+                      f"positions {ids.index(pinned) if pinned in ids else None} / {ids.index(regular) if regular in ids else None}")
+
+    def test_feed_pagination(self):
+        """Cursor pages continue where the last one ended, without repeats or featured posts"""
+        for i in range(4):
+            self.create_post(f'Paging check {i}')
+        first, cursor = self.feed_ids(limit=2)
+        if not cursor:
+            self.log_test("Feed Next Cursor", False, "No next_cursor on a full page")
+            return
+        second, _ = self.feed_ids(cursor=cursor, limit=2)
+        self.log_test("Feed Next Cursor", len(second) == 2 and not set(first) & set(second), f"pages {first} / {second}")
+
+        response, _ = self.make_request('GET', 'posts/feed?cursor=not-a-cursor', use_admin=False)
+        self.log_test("Feed Invalid Cursor", response.status_code == 400, f"Status: {response.status_code}")
+
+    def test_feature_admin_only(self):
+        """Members can't pin posts"""
+        post_id = self.create_post('Feature permission check')
+        response, _ = self.make_request('PATCH', f'posts/{post_id}/feature', {'is_pinned': True}, use_admin=False)
+        self.log_test("Feature Admin Only", response.status_code == 403, f"Status: {response.status_code}")
+
+    def run_all_tests(self):
+        """Run all feed tests"""
+        print("🚀 Starting Growing Together Feed Tests")
+        print("=" * 50)
+
+        if not self.test_admin_login():
+            print("❌ Admin login failed. Stopping tests.")
+            return False
+        if not self.test_member_login():
+            print("❌ Member login failed. Stopping tests.")
+            return False
+
+        self.test_featured_first()
+        self.test_feed_pagination()
+        self.test_feature_admin_only()
+
+        print("\n" + "=" * 50)
+        print(f"📊 Test Summary: {self.tests_passed}/{self.tests_run} tests passed")
+        if self.failed_tests:
+            print("\n❌ Failed Tests:")
+            for test in self.failed_tests:
+                print(f"  - {test['test']}: {test['error']}")
+        return not self.failed_tests
+
+def main():
+    tester = FeedAPITester()
+    success = tester.run_all_tests()
+    return 0 if success else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
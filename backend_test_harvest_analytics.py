@@ -0,0 +1,156 @@
+import requests
+import os
+import sys
+import uuid
+from datetime import datetime
+
+# Checks for harvest analytics: per-entry totals, crops from the plant library and freshness after diary changes.
+# Run this from an environment that can import backend/server.py: the totals checks feed known entries to the
+# analytics directly.
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+import server
+
+class HarvestAnalyticsAPITester:
+    def __init__(self, base_url=os.environ.get("BASE_URL", "http://localhost:8001")):
+        self.base_url = base_url
+        self.api_url = f"{base_url}/api"
+        self.admin_token = None
+        self.member_token = None
+        self.tests_run = 0
+        self.tests_passed = 0
+        self.failed_tests = []
+
+    def log_test(self, name, success, details=""):
+        """Log test results"""
+        self.tests_run += 1
+        if success:
+            self.tests_passed += 1
+            print(f"✅ {name} - PASSED")
+        else:
+            print(f"❌ {name} - FAILED: {details}")
+            self.failed_tests.append({"test": name, "error": details})
+
+    def make_request(self, method, endpoint, data=None, use_admin=True):
+        """Make API request with proper headers"""
+        url = f"{self.api_url}/{endpoint}"
+        headers = {'Content-Type': 'application/json'}
+        token = self.admin_token if use_admin else self.member_token
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        try:
+            response = requests.request(method, url, json=data, headers=headers, timeout=30)
+            return response, None
+        except requests.exceptions.RequestException as e:
+            return None, str(e)
+
+    def test_admin_login(self):
+        """Admin login"""
+        response, error = self.make_request('POST', 'auth/login', {
+            'email': 'admin@staffordallotment.com',
+            'password': 'admin123'
+        })
+        success = not error and response.status_code == 200
+        if success:
+            self.admin_token = response.json()['token']
+        self.log_test("Admin Login", success, error or (response.text if response is not None else ""))
+        return success
+
+    def test_member_login(self):
+        """Register a member, approve them as admin, log in"""
+        email = f'harvest_member_{uuid.uuid4().hex[:8]}@example.com'
+        response, error = self.make_request('POST', 'auth/register', {
+            'email': email, 'username': email.split('@')[0], 'password': 'testpass123', 'join_code': 'GROW2024'
+        })
+        if error or response.status_code != 200:
+            self.log_test("Member Login", False, error or response.text)
+            return False
+        self.make_request('PATCH', f"admin/users/{response.json()['user_id']}/approve")
+        response, error = self.make_request('POST', 'auth/login', {'email': email, 'password': 'testpass123'})
+        success = not error and response.status_code == 200
+        if success:
+            self.member_token = response.json()['token']
+        self.log_test("Member Login", success, error or (response.text if not success else ""))
+        return success
+
+    def test_harvest_analytics_totals(self):
+        """Harvest totals count each diary entry once; crops come from the plant library only"""
+        columns = server.HarvestColumns([{"name": "Potatoes", "aliases": ["spuds"]}, {"name": "Carrots", "aliases": []}])
+        columns.add({"entry_type": "sowing", "date": datetime(2030, 3, 20), "plot_number": "4", "tags": ["potatoes"], "title": "Planted earlies"})
+        columns.add({"entry_type": "harvest", "date": datetime(2030, 7, 1), "plot_number": "4", "tags": ["potatoes", "earlies"], "title": "Lifted 2kg"})
+        columns.add({"entry_type": "harvest", "date": datetime(2030, 7, 2), "plot_number": "4", "tags": [], "title": "Spuds and carrots, 1kg"})
+        result = server.compute_harvest_analytics(columns, 2030)
+        crops = {crop['crop']: crop for crop in result['crops']}
+
+        self.log_test("Harvest Site Totals", result['harvests'] == 2 and result['yield_kg'] == 3.0,
+                      f"harvests {result['harvests']}, yield {result['yield_kg']}")
+        self.log_test("Harvest Plot Totals", result['plots'] == [{"plot_number": "4", "harvests": 2, "yield_kg": 3.0, "crops": 2}],
+                      f"plots {result['plots']}")
+        self.log_test("Harvest Crops From Library", set(crops) == {"Potatoes", "Carrots"}, f"crops {sorted(crops)}")
+        # The mixed 1kg harvest names two crops, so only the 2kg one is credited to potatoes
+        self.log_test("Harvest Crop Yield", crops["Potatoes"]["harvests"] == 2 and crops["Potatoes"]["yield_kg"] == 2.0
+                      and crops["Potatoes"]["days_to_harvest"]["p50"] == 103.0, f"potatoes {crops['Potatoes']}")
+
+        admin, _ = self.make_request('GET', 'analytics/harvest')
+        member, _ = self.make_request('GET', 'analytics/harvest', use_admin=False)
+        self.log_test("Harvest Plots Admin Only",
+                      admin.status_code == 200 and 'plots' in admin.json() and member.status_code == 200 and 'plots' not in member.json(),
+                      f"Status: {admin.status_code} / {member.status_code}")
+
+    def crop_row(self, crop):
+        response, _ = self.make_request('GET', f'analytics/harvest?crop={crop}', use_admin=False)
+        rows = response.json()['crops'] if response.status_code == 200 else []
+        return rows[0] if rows else {'harvests': 0, 'yield_kg': 0.0}
+
+    def test_harvest_analytics_freshness(self):
+        """New crops, harvests and deletions show up in the next request, not after a refresh interval"""
+        crop = f'Analytics check {uuid.uuid4().hex[:8]}'
+        response, error = self.make_request('POST', 'plants', {'name': crop, 'category': 'vegetable', 'description': 'x'})
+        if error or response.status_code != 200:
+            self.log_test("Harvest Counted At Once", False, error or response.text)
+            return
+
+        response, _ = self.make_request('POST', 'diary', {
+            'plot_number': '7', 'entry_type': 'harvest', 'title': 'Picked 1.5kg', 'content': 'First pick', 'tags': [crop]
+        }, use_admin=False)
+        entry_id = response.json()['id']
+        row = self.crop_row(crop)
+        self.log_test("Harvest Counted At Once", row['harvests'] == 1 and row['yield_kg'] == 1.5, f"row {row}")
+
+        self.make_request('DELETE', f'diary/{entry_id}', use_admin=False)
+        row = self.crop_row(crop)
+        self.log_test("Harvest Delete Counted At Once", row['harvests'] == 0 and row['yield_kg'] == 0.0, f"row {row}")
+
+        invalid, _ = self.make_request('GET', 'analytics/harvest?season=1999')
+        self.log_test("Harvest Season Validated", invalid.status_code == 422, f"Status: {invalid.status_code}")
+
+    def run_all_tests(self):
+        """Run all harvest analytics tests"""
+        print("🚀 Starting Growing Together Harvest Analytics Tests")
+        print("=" * 50)
+
+        if not self.test_admin_login():
+            print("❌ Admin login failed. Stopping tests.")
+            return False
+        if not self.test_member_login():
+            print("❌ Member login failed. Stopping tests.")
+            return False
+
+        self.test_harvest_analytics_totals()
+        self.test_harvest_analytics_freshness()
+
+        print("\n" + "=" * 50)
+        print(f"📊 Test Summary: {self.tests_passed}/{self.tests_run} tests passed")
+        if self.failed_tests:
+            print("\n❌ Failed Tests:")
+            for test in self.failed_tests:
+                print(f"  - {test['test']}: {test['error']}")
+        return not self.failed_tests
+
+def main():
+    tester = HarvestAnalyticsAPITester()
+    success = tester.run_all_tests()
+    return 0 if success else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+import requests
+import os
+import sys
+import uuid
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Checks for Idempotency-Key handling: replays, mismatched bodies, refreshed tokens, per-user keys and concurrent retries.
+# Run against a running server (BASE_URL, default http://localhost:8001).
+
+class IdempotencyAPITester:
+    def __init__(self, base_url=os.environ.get("BASE_URL", "http://localhost:8001")):
+        self.base_url = base_url
+        self.api_url = f"{base_url}/api"
+        self.admin_token = None
+        self.member_token = None
+        self.tests_run = 0
+        self.tests_passed = 0
+        self.failed_tests = []
+
+    def log_test(self, name, success, details=""):
+        """Log test results"""
+        self.tests_run += 1
+        if success:
+            self.tests_passed += 1
+            print(f"✅ {name} - PASSED")
+        else:
+            print(f"❌ {name} - FAILED: {details}")
+            self.failed_tests.append({"test": name, "error": details})
+
+    def make_request(self, method, endpoint, data=None, use_admin=True, headers=None):
+        """Make API request with proper headers"""
+        url = f"{self.api_url}/{endpoint}"
+        headers = {'Content-Type': 'application/json', **(headers or {})}
+        token = self.admin_token if use_admin else self.member_token
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        try:
+            response = requests.request(method, url, json=data, headers=headers, timeout=30)
+            return response, None
+        except requests.exceptions.RequestException as e:
+            return None, str(e)
+
+    def test_admin_login(self):
+        """Admin login"""
+        response, error = self.make_request('POST', 'auth/login', {
+            'email': 'admin@staffordallotment.com',
+            'password': 'admin123'
+        })
+        success = not error and response.status_code == 200
+        if success:
+            self.admin_token = response.json()['token']
+        self.log_test("Admin Login", success, error or (response.text if response is not None else ""))
+        return success
+
+    def test_member_login(self):
+        """Register a member, approve them as admin, log in"""
+        email = f'idempotency_member_{uuid.uuid4().hex[:8]}@example.com'
+        response, error = self.make_request('POST', 'auth/register', {
+            'email': email, 'username': email.split('@')[0], 'password': 'testpass123', 'join_code': 'GROW2024'
+        })
+        if error or response.status_code != 200:
+            self.log_test("Member Login", False, error or response.text)
+            return False
+        self.make_request('PATCH', f"admin/users/{response.json()['user_id']}/approve")
+        response, error = self.make_request('POST', 'auth/login', {'email': email, 'password': 'testpass123'})
+        success = not error and response.status_code == 200
+        if success:
+            self.member_token = response.json()['token']
+        self.log_test("Member Login", success, error or (response.text if not success else ""))
+        return success
+
+    def diary_entry(self, label):
+        return {'plot_number': '1', 'entry_type': 'general', 'title': f'{label} {uuid.uuid4().hex[:8]}', 'content': 'Retry me'}
+
+    def test_idempotency_replay(self):
+        """A retried POST with the same Idempotency-Key replays the first response; a different body is rejected"""
+        key = str(uuid.uuid4())
+        entry = self.diary_entry('Idempotency check')
+        first, error = self.make_request('POST', 'diary', entry, headers={'Idempotency-Key': key})
+        if error or first.status_code != 200:
+            self.log_test("Idempotent Replay", False, error or first.text)
+            return
+        second, _ = self.make_request('POST', 'diary', entry, headers={'Idempotency-Key': key})
+        self.log_test("Idempotent Replay",
+                      second.status_code == 200 and second.json()['id'] == first.json()['id']
+                      and second.headers.get('Idempotent-Replayed') == 'true',
+                      f"Status: {second.status_code}, ids {first.json()['id']} / {second.json().get('id')}")
+
+        mismatch, _ = self.make_request('POST', 'diary', {**entry, 'content': 'Something else'}, headers={'Idempotency-Key': key})
+        self.log_test("Idempotency Key Mismatch", mismatch.status_code == 422, f"Status: {mismatch.status_code}")
+        self.make_request('DELETE', f"diary/{first.json()['id']}")
+
+    def test_refreshed_token_replays(self):
+        """A client that logs in again between retries still gets the original response"""
+        key = str(uuid.uuid4())
+        entry = self.diary_entry('Refreshed token check')
+        first, _ = self.make_request('POST', 'diary', entry, headers={'Idempotency-Key': key})
+        time.sleep(1.1)  # a new token, not the same one re-issued within the second
+        old_token = self.admin_token
+        response, _ = self.make_request('POST', 'auth/login', {'email': 'admin@staffordallotment.com', 'password': 'admin123'})
+        self.admin_token = response.json()['token']
+        second, _ = self.make_request('POST', 'diary', entry, headers={'Idempotency-Key': key})
+        self.log_test("Idempotent Replay After Refresh",
+                      self.admin_token != old_token and second.headers.get('Idempotent-Replayed') == 'true'
+                      and second.json()['id'] == first.json()['id'], f"ids {first.json()['id']} / {second.json().get('id')}")
+        self.make_request('DELETE', f"diary/{first.json()['id']}")
+
+    def test_keys_scoped_to_user(self):
+        """The same key from another member, or with an invalid token, is not a replay"""
+        key = str(uuid.uuid4())
+        entry = self.diary_entry('Scoped key check')
+        first, _ = self.make_request('POST', 'diary', entry, headers={'Idempotency-Key': key})
+        other, _ = self.make_request('POST', 'diary', entry, use_admin=False, headers={'Idempotency-Key': key})
+        self.log_test("Idempotency Key Per User", other.status_code == 200 and other.json()['id'] != first.json()['id']
+                      and other.headers.get('Idempotent-Replayed') is None, f"ids {first.json()['id']} / {other.json().get('id')}")
+
+        forged = requests.post(f"{self.api_url}/diary", json=entry, timeout=10,
+                               headers={'Authorization': 'Bearer not-a-token', 'Idempotency-Key': key})
+        self.log_test("Idempotency Invalid Token Not Replayed", forged.status_code == 401 and forged.headers.get('Idempotent-Replayed') is None,
+                      f"Status: {forged.status_code}")
+        too_long, _ = self.make_request('POST', 'diary', entry, headers={'Idempotency-Key': 'k' * 256})
+        self.log_test("Idempotency Key Length", too_long.status_code == 400, f"Status: {too_long.status_code}")
+        self.make_request('DELETE', f"diary/{first.json()['id']}")
+        self.make_request('DELETE', f"diary/{other.json()['id']}", use_admin=False)
+
+    def test_concurrent_retries(self):
+        """A retry sent while the original is still running waits for it and replays its response"""
+        key = str(uuid.uuid4())
+        entry = self.diary_entry('Concurrent retry check')
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            responses = list(executor.map(
+                lambda _: self.make_request('POST', 'diary', entry, headers={'Idempotency-Key': key})[0], range(3)
+            ))
+        ids = {response.json().get('id') for response in responses}
+        replayed = [response.headers.get('Idempotent-Replayed') == 'true' for response in responses]
+        self.log_test("Idempotent Concurrent Retries", all(response.status_code == 200 for response in responses)
+                      and len(ids) == 1 and replayed.count(False) == 1, f"ids {ids}, replayed {replayed}")
+        self.make_request('DELETE', f"diary/{ids.pop()}")
+
+    def run_all_tests(self):
+        """Run all idempotency tests"""
+        print("🚀 Starting Growing Together Idempotency Tests")
+        print("=" * 50)
+
+        if not self.test_admin_login():
+            print("❌ Admin login failed. Stopping tests.")
+            return False
+        if not self.test_member_login():
+            print("❌ Member login failed. Stopping tests.")
+            return False
+
+        self.test_idempotency_replay()
+        self.test_refreshed_token_replays()
+        self.test_keys_scoped_to_user()
+        self.test_concurrent_retries()
+
+        print("\n" + "=" * 50)
+        print(f"📊 Test Summary: {self.tests_passed}/{self.tests_run} tests passed")
+        if self.failed_tests:
+            print("\n❌ Failed Tests:")
+            for test in self.failed_tests:
+                print(f"  - {test['test']}: {test['error']}")
+        return not self.failed_tests
+
+def main():
+    tester = IdempotencyAPITester()
+    success = tester.run_all_tests()
+    return 0 if success else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+import requests
+import os
+import sys
+import uuid
+import json
+
+# Checks for live community updates over Server-Sent Events.
+# Run against a running server (BASE_URL, default http://localhost:8001).
+
+class LiveUpdatesAPITester:
+    def __init__(self, base_url=os.environ.get("BASE_URL", "http://localhost:8001")):
+        self.base_url = base_url
+        self.api_url = f"{base_url}/api"
+        self.admin_token = None
+        self.member_token = None
+        self.tests_run = 0
+        self.tests_passed = 0
+        self.failed_tests = []
+
+    def log_test(self, name, success, details=""):
+        """Log test results"""
+        self.tests_run += 1
+        if success:
+            self.tests_passed += 1
+            print(f"✅ {name} - PASSED")
+        else:
+            print(f"❌ {name} - FAILED: {details}")
+            self.failed_tests.append({"test": name, "error": details})
+
+    def make_request(self, method, endpoint, data=None, use_admin=True):
+        """Make API request with proper headers"""
+        url = f"{self.api_url}/{endpoint}"
+        headers = {'Content-Type': 'application/json'}
+        token = self.admin_token if use_admin else self.member_token
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        try:
+            response = requests.request(method, url, json=data, headers=headers, timeout=30)
+            return response, None
+        except requests.exceptions.RequestException as e:
+            return None, str(e)
+
+    def test_admin_login(self):
+        """Admin login"""
+        response, error = self.make_request('POST', 'auth/login', {
+            'email': 'admin@staffordallotment.com',
+            'password': 'admin123'
+        })
+        success = not error and response.status_code == 200
+        if success:
+            self.admin_token = response.json()['token']
+        self.log_test("Admin Login", success, error or (response.text if response is not None else ""))
+        return success
+
+    def test_member_login(self):
+        """Register a member, approve them as admin, log in"""
+        email = f'stream_member_{uuid.uuid4().hex[:8]}@example.com'
+        response, error = self.make_request('POST', 'auth/register', {
+            'email': email, 'username': email.split('@')[0], 'password': 'testpass123', 'join_code': 'GROW2024'
+        })
+        if error or response.status_code != 200:
+            self.log_test("Member Login", False, error or response.text)
+            return False
+        self.make_request('PATCH', f"admin/users/{response.json()['user_id']}/approve")
+        response, error = self.make_request('POST', 'auth/login', {'email': email, 'password': 'testpass123'})
+        success = not error and response.status_code == 200
+        if success:
+            self.member_token = response.json()['token']
+        self.log_test("Member Login", success, error or (response.text if not success else ""))
+        return success
+
+    def read_events(self, lines, wanted, limit=50):
+        """Collect SSE events from a line iterator until one of type `wanted` arrives"""
+        event_type = None
+        for line in lines:
+            if line.startswith('event: '):
+                event_type = line[len('event: '):]
+            elif line.startswith('data: ') and event_type:
+                data = json.loads(line[len('data: '):])
+                if event_type == wanted:
+                    return data
+                event_type = None
+            limit -= 1
+            if limit <= 0:
+                return None
+        return None
+
+    def test_stream_auth(self):
+        """The stream needs a valid token, from the header or ?token="""
+        anonymous = requests.get(f"{self.api_url}/stream", timeout=10)
+        forged = requests.get(f"{self.api_url}/stream?token=not-a-token", timeout=10)
+        self.log_test("Stream Requires Auth", anonymous.status_code == 401 and forged.status_code == 401,
+                      f"Status: {anonymous.status_code} / {forged.status_code}")
+
+    def test_stream_delivery(self):
+        """A connected member sees a new post as it is created"""
+        content = f"Live update check {uuid.uuid4().hex[:8]}"
+        try:
+            with requests.get(f"{self.api_url}/stream?token={self.member_token}", stream=True, timeout=20) as stream:
+                self.log_test("Stream Connects", stream.status_code == 200
+                              and stream.headers.get('Content-Type', '').startswith('text/event-stream'),
+                              f"Status: {stream.status_code}")
+                lines = stream.iter_lines(decode_unicode=True)
+                ready = self.read_events(lines, 'ready')
+                self.log_test("Stream Ready Event", ready is not None and ready.get('user_id'), f"ready {ready}")
+
+                self.make_request('POST', 'posts', {'content': content})
+                created = None
+                while True:
+                    created = self.read_events(lines, 'post.created')
+                    if created is None or created.get('content') == content:
+                        break
+                self.log_test("Stream Post Created", created is not None and created.get('content') == content, f"event {created}")
+        except requests.exceptions.RequestException as e:
+            self.log_test("Stream Post Created", False, str(e))
+
+    def run_all_tests(self):
+        """Run all live update tests"""
+        print("🚀 Starting Growing Together Live Update Tests")
+        print("=" * 50)
+
+        if not self.test_admin_login():
+            print("❌ Admin login failed. Stopping tests.")
+            return False
+        if not self.test_member_login():
+            print("❌ Member login failed. Stopping tests.")
+            return False
+
+        self.test_stream_auth()
+        self.test_stream_delivery()
+
+        print("\n" + "=" * 50)
+        print(f"📊 Test Summary: {self.tests_passed}/{self.tests_run} tests passed")
+        if self.failed_tests:
+            print("\n❌ Failed Tests:")
+            for test in self.failed_tests:
+                print(f"  - {test['test']}: {test['error']}")
+        return not self.failed_tests
+
+def main():
+    tester = LiveUpdatesAPITester()
+    success = tester.run_all_tests()
+    return 0 if success else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+import requests
+import os
+import sys
+import uuid
+import msgpack
+from datetime import datetime
+
+# Checks for MessagePack response negotiation: Accept handling, native timestamps and coverage of the list endpoints.
+# Run against a running server (BASE_URL, default http://localhost:8001).
+
+class MsgpackAPITester:
+    def __init__(self, base_url=os.environ.get("BASE_URL", "http://localhost:8001")):
+        self.base_url = base_url
+        self.api_url = f"{base_url}/api"
+        self.admin_token = None
+        self.member_token = None
+        self.tests_run = 0
+        self.tests_passed = 0
+        self.failed_tests = []
+
+    def log_test(self, name, success, details=""):
+        """Log test results"""
+        self.tests_run += 1
+        if success:
+            self.tests_passed += 1
+            print(f"✅ {name} - PASSED")
+        else:
+            print(f"❌ {name} - FAILED: {details}")
+            self.failed_tests.append({"test": name, "error": details})
+
+    def make_request(self, method, endpoint, data=None, use_admin=True, headers=None):
+        """Make API request with proper headers"""
+        url = f"{self.api_url}/{endpoint}"
+        headers = {'Content-Type': 'application/json', **(headers or {})}
+        token = self.admin_token if use_admin else self.member_token
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        try:
+            response = requests.request(method, url, json=data, headers=headers, timeout=30)
+            return response, None
+        except requests.exceptions.RequestException as e:
+            return None, str(e)
+
+    def test_admin_login(self):
+        """Admin login"""
+        response, error = self.make_request('POST', 'auth/login', {
+            'email': 'admin@staffordallotment.com',
+            'password': 'admin123'
+        })
+        success = not error and response.status_code == 200
+        if success:
+            self.admin_token = response.json()['token']
+        self.log_test("Admin Login", success, error or (response.text if response is not None else ""))
+        return success
+
+    def test_member_login(self):
+        """Register a member, approve them as admin, log in"""
+        email = f'msgpack_member_{uuid.uuid4().hex[:8]}@example.com'
+        response, error = self.make_request('POST', 'auth/register', {
+            'email': email, 'username': email.split('@')[0], 'password': 'testpass123', 'join_code': 'GROW2024'
+        })
+        if error or response.status_code != 200:
+            self.log_test("Member Login", False, error or response.text)
+            return False
+        self.make_request('PATCH', f"admin/users/{response.json()['user_id']}/approve")
+        response, error = self.make_request('POST', 'auth/login', {'email': email, 'password': 'testpass123'})
+        success = not error and response.status_code == 200
+        if success:
+            self.member_token = response.json()['token']
+        self.log_test("Member Login", success, error or (response.text if not success else ""))
+        return success
+
+    def fetch(self, endpoint, accept, use_admin=True):
+        response, error = self.make_request('GET', endpoint, use_admin=use_admin, headers={'Accept': accept})
+        return response if not error else None
+
+    def decode(self, response):
+        return msgpack.unpackb(response.content, raw=False, timestamp=3)
+
+    def test_accept_negotiation(self):
+        """MessagePack only when the client prefers it; JSON stays the default"""
+        cases = [
+            ('application/msgpack', 'application/msgpack'),
+            ('application/x-msgpack', 'application/msgpack'),
+            ('application/json, application/msgpack;q=0.5', 'application/json'),
+            ('application/msgpack;q=0', 'application/json'),
+            ('*/*;q=0.1, application/vnd.msgpack', 'application/msgpack'),
+            ('*/*', 'application/json'),
+        ]
+        for accept, expected in cases:
+            response = self.fetch('posts', accept, use_admin=False)
+            self.log_test(f"Negotiates Accept: {accept}",
+                          response.headers.get('Content-Type', '').startswith(expected) and response.headers.get('Vary') == 'Accept',
+                          f"Content-Type: {response.headers.get('Content-Type')}")
+
+    def test_native_timestamps(self):
+        """MessagePack carries datetimes as timestamps, JSON as ISO strings, for the same documents"""
+        self.make_request('POST', 'posts', {'content': f'Msgpack check {uuid.uuid4().hex[:8]}'}, use_admin=False)
+        as_json = self.fetch('posts', 'application/json', use_admin=False).json()
+        as_msgpack = self.decode(self.fetch('posts', 'application/msgpack', use_admin=False))
+        self.log_test("Msgpack Same Documents", [post['id'] for post in as_json] == [post['id'] for post in as_msgpack],
+                      f"{len(as_json)} / {len(as_msgpack)} posts")
+        first = as_msgpack[0]['created_at'] if as_msgpack else None
+        self.log_test("Msgpack Native Timestamps", isinstance(first, datetime) and first.tzinfo is not None
+                      and first.replace(tzinfo=None).isoformat().startswith(as_json[0]['created_at'][:19]),
+                      f"msgpack {first!r}, json {as_json[0]['created_at'] if as_json else None}")
+
+    def test_list_endpoints(self):
+        """Every list endpoint answers in MessagePack when asked, with the same content as its JSON"""
+        admin, _ = self.make_request('GET', 'auth/me')
+        room, _ = self.make_request('POST', 'chat/direct', {'user_id': admin.json()['id']}, use_admin=False)
+        endpoints = [
+            ('posts', False), ('tasks', False), ('diary', False), ('diary/tags', False), ('events', False),
+            ('plots', False), ('inspections', True), ('inspections/my-plot', False), ('member-notices', False),
+            ('documents', False), ('plants/ai-advice/jobs', False), ('chat/rooms', False), ('sync/changes', False),
+            ('admin/users', True), ('rules/acknowledgements', True), ('admin/documents', True),
+            (f"chat/rooms/{room.json()['id']}/reads", True)
+        ]
+        for endpoint, use_admin in endpoints:
+            as_json = self.fetch(endpoint, 'application/json', use_admin=use_admin)
+            as_msgpack = self.fetch(endpoint, 'application/msgpack', use_admin=use_admin)
+            success = as_json.status_code == 200 and as_msgpack.status_code == 200 \
+                and as_msgpack.headers.get('Content-Type', '').startswith('application/msgpack')
+            if success:
+                decoded = self.decode(as_msgpack)
+                expected = as_json.json()
+                success = type(decoded) is type(expected) and len(decoded) == len(expected)
+            self.log_test(f"Msgpack {endpoint.replace(room.json()['id'], '{id}')}", success,
+                          f"Status: {as_json.status_code} / {as_msgpack.status_code}, Content-Type: {as_msgpack.headers.get('Content-Type')}")
+
+    def run_all_tests(self):
+        """Run all messagepack tests"""
+        print("🚀 Starting Growing Together MessagePack Tests")
+        print("=" * 50)
+
+        if not self.test_admin_login():
+            print("❌ Admin login failed. Stopping tests.")
+            return False
+        if not self.test_member_login():
+            print("❌ Member login failed. Stopping tests.")
+            return False
+
+        self.test_accept_negotiation()
+        self.test_native_timestamps()
+        self.test_list_endpoints()
+
+        print("\n" + "=" * 50)
+        print(f"📊 Test Summary: {self.tests_passed}/{self.tests_run} tests passed")
+        if self.failed_tests:
+            print("\n❌ Failed Tests:")
+            for test in self.failed_tests:
+                print(f"  - {test['test']}: {test['error']}")
+        return not self.failed_tests
+
+def main():
+    tester = MsgpackAPITester()
+    success = tester.run_all_tests()
+    return 0 if success else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
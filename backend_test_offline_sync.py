@@ -0,0 +1,212 @@
+import requests
+import asyncio
+import os
+import sys
+import uuid
+import json
+from starlette.requests import Request
+
+# Checks for offline queue replay: submission order, duplicate keys, rejections and failed writes.
+# Run this from an environment that can import backend/server.py pointed at the same MONGO_URL and DB_NAME:
+# the ordering checks read change seqs from the database, and the failure check replays a batch in-process.
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+import server
+
+class OfflineSyncAPITester:
+    def __init__(self, base_url=os.environ.get("BASE_URL", "http://localhost:8001")):
+        self.base_url = base_url
+        self.api_url = f"{base_url}/api"
+        self.admin_token = None
+        self.member_token = None
+        self.tests_run = 0
+        self.tests_passed = 0
+        self.failed_tests = []
+        self.loop = asyncio.new_event_loop()  # one loop, so the Motor client stays on it
+
+    def log_test(self, name, success, details=""):
+        """Log test results"""
+        self.tests_run += 1
+        if success:
+            self.tests_passed += 1
+            print(f"✅ {name} - PASSED")
+        else:
+            print(f"❌ {name} - FAILED: {details}")
+            self.failed_tests.append({"test": name, "error": details})
+
+    def make_request(self, method, endpoint, data=None, use_admin=True):
+        """Make API request with proper headers"""
+        url = f"{self.api_url}/{endpoint}"
+        headers = {'Content-Type': 'application/json'}
+        token = self.admin_token if use_admin else self.member_token
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        try:
+            response = requests.request(method, url, json=data, headers=headers, timeout=30)
+            return response, None
+        except requests.exceptions.RequestException as e:
+            return None, str(e)
+
+    def run(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+    def test_admin_login(self):
+        """Admin login"""
+        response, error = self.make_request('POST', 'auth/login', {
+            'email': 'admin@staffordallotment.com',
+            'password': 'admin123'
+        })
+        success = not error and response.status_code == 200
+        if success:
+            self.admin_token = response.json()['token']
+        self.log_test("Admin Login", success, error or (response.text if response is not None else ""))
+        return success
+
+    def test_member_login(self):
+        """Register a member, approve them as admin, log in"""
+        email = f'offline_member_{uuid.uuid4().hex[:8]}@example.com'
+        response, error = self.make_request('POST', 'auth/register', {
+            'email': email, 'username': email.split('@')[0], 'password': 'testpass123', 'join_code': 'GROW2024'
+        })
+        if error or response.status_code != 200:
+            self.log_test("Member Login", False, error or response.text)
+            return False
+        self.make_request('PATCH', f"admin/users/{response.json()['user_id']}/approve")
+        response, error = self.make_request('POST', 'auth/login', {'email': email, 'password': 'testpass123'})
+        success = not error and response.status_code == 200
+        if success:
+            self.member_token = response.json()['token']
+        self.log_test("Member Login", success, error or (response.text if not success else ""))
+        return success
+
+    def mutation(self, type, payload, key=None):
+        return {'idempotency_key': key or str(uuid.uuid4()), 'type': type, 'payload': payload}
+
+    def diary(self, title):
+        return self.mutation('diary.create', {'plot_number': '1', 'entry_type': 'general', 'title': title, 'content': 'Queued offline'})
+
+    def replay(self, mutations):
+        response, error = self.make_request('POST', 'sync/mutations', {'mutations': mutations}, use_admin=False)
+        return response if not error else None
+
+    def test_replay_in_order(self):
+        """A mixed queue is applied in submission order, across collections"""
+        marker = uuid.uuid4().hex[:8]
+        mutations = [
+            self.diary(f'Offline {marker} first'),
+            self.mutation('post.create', {'content': f'Offline {marker} post'}),
+            self.diary(f'Offline {marker} second'),
+            self.mutation('task.create', {'title': f'Offline {marker} task', 'description': 'Queued offline', 'task_type': 'personal'})
+        ]
+        response = self.replay(mutations)
+        if response is None or response.status_code != 200:
+            self.log_test("Batch Applied", False, response.text if response is not None else "request failed")
+            return
+        results = response.json()['results']
+        self.log_test("Batch Applied", [result['status'] for result in results] == ['applied'] * 4
+                      and [result['idempotency_key'] for result in results] == [m['idempotency_key'] for m in mutations],
+                      f"results {results}")
+        if any(result['status'] != 'applied' for result in results):
+            return
+
+        async def seqs():
+            found = []
+            for collection, result in zip(('diary_entries', 'posts', 'diary_entries', 'tasks'), results):
+                document = await server.db[collection].find_one({'id': result['data']['id']}, {'_id': 0, 'change_seq': 1})
+                found.append(document['change_seq'] if document else None)
+            return found
+
+        change_seqs = self.run(seqs())
+        self.log_test("Batch Writes In Submission Order", None not in change_seqs and change_seqs == sorted(set(change_seqs)),
+                      f"change seqs {change_seqs}")
+
+    def test_replay_duplicates(self):
+        """A key seen earlier in the batch or in an earlier batch replays the first outcome instead of writing again"""
+        entry = self.diary(f'Duplicate check {uuid.uuid4().hex[:8]}')
+        first = self.replay([entry, entry]).json()['results']
+        self.log_test("Batch Duplicate Within Batch", [result['status'] for result in first] == ['applied', 'duplicate']
+                      and first[0]['data'] == first[1]['data'], f"results {first}")
+
+        retry = self.replay([entry]).json()['results']
+        self.log_test("Batch Duplicate On Retry", retry[0]['status'] == 'duplicate' and retry[0]['data'] == first[0]['data'],
+                      f"results {retry}")
+        count = self.run(server.db.diary_entries.count_documents({'title': entry['payload']['title']}))
+        self.log_test("Batch Duplicate Written Once", count == 1, f"{count} entries")
+
+    def test_replay_rejections(self):
+        """Invalid mutations are rejected on their own, and the rejection is remembered"""
+        unknown = self.mutation('plot.delete', {})
+        invalid = self.mutation('diary.create', {'title': 'Missing fields'})
+        forbidden = self.mutation('inspection.create', {'plot_id': 'x'})
+        valid = self.diary(f'Alongside rejections {uuid.uuid4().hex[:8]}')
+        results = self.replay([unknown, invalid, forbidden, valid]).json()['results']
+        self.log_test("Batch Rejections", [(result['status'], result['status_code']) for result in results]
+                      == [('rejected', 400), ('rejected', 422), ('rejected', 403), ('applied', 201)], f"results {results}")
+        retry = self.replay([unknown]).json()['results']
+        self.log_test("Batch Rejection Remembered", retry[0]['status'] == 'duplicate' and retry[0]['status_code'] == 400, f"results {retry}")
+
+        too_many = self.replay([self.diary('Too many')] * (server.SYNC_BATCH_MAX + 1))
+        self.log_test("Batch Size Limit", too_many.status_code == 400, f"Status: {too_many.status_code}")
+
+    def test_write_failure_halts(self):
+        """A failed write stops the batch there and gives back the keys of everything not written"""
+        response, _ = self.make_request('GET', 'auth/me', use_admin=False)
+        user = server.User(**self.run(server.db.users.find_one({'id': response.json()['id']}, {'_id': 0})))
+        marker = uuid.uuid4().hex[:8]
+        mutations = [self.diary(f'Halt {marker} first'), self.mutation('post.create', {'content': f'Halt {marker} post'}),
+                     self.diary(f'Halt {marker} after')]
+        posts = type(server.db.posts)
+        original = posts.bulk_write
+
+        async def failing_bulk_write(collection, *args, **kwargs):
+            if collection.name == 'posts':
+                raise ConnectionError("database unavailable")
+            return await original(collection, *args, **kwargs)
+
+        posts.bulk_write = failing_bulk_write
+        try:
+            response = self.run(server.apply_sync_mutations(
+                Request({'type': 'http', 'headers': []}), server.SyncMutationBatch(mutations=mutations), current_user=user
+            ))
+        finally:
+            posts.bulk_write = original
+        results = json.loads(response.body)['results']
+        self.log_test("Batch Halts After Failed Write", [(result['status'], result['status_code']) for result in results]
+                      == [('applied', 201), ('failed', 503), ('failed', 503)], f"results {results}")
+
+        retry = self.replay(mutations).json()['results']
+        self.log_test("Batch Failed Keys Released", [result['status'] for result in retry] == ['duplicate', 'applied', 'applied'],
+                      f"results {retry}")
+
+    def run_all_tests(self):
+        """Run all offline sync tests"""
+        print("🚀 Starting Growing Together Offline Sync Tests")
+        print("=" * 50)
+
+        if not self.test_admin_login():
+            print("❌ Admin login failed. Stopping tests.")
+            return False
+        if not self.test_member_login():
+            print("❌ Member login failed. Stopping tests.")
+            return False
+
+        self.test_replay_in_order()
+        self.test_replay_duplicates()
+        self.test_replay_rejections()
+        self.test_write_failure_halts()
+
+        print("\n" + "=" * 50)
+        print(f"📊 Test Summary: {self.tests_passed}/{self.tests_run} tests passed")
+        if self.failed_tests:
+            print("\n❌ Failed Tests:")
+            for test in self.failed_tests:
+                print(f"  - {test['test']}: {test['error']}")
+        return not self.failed_tests
+
+def main():
+    tester = OfflineSyncAPITester()
+    success = tester.run_all_tests()
+    return 0 if success else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
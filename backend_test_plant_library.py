@@ -0,0 +1,137 @@
+import requests
+import os
+import sys
+import uuid
+
+# Checks for the in-memory plant library snapshot and its ETags.
+# Run against a running server (BASE_URL, default http://localhost:8001).
+
+class PlantLibraryAPITester:
+    def __init__(self, base_url=os.environ.get("BASE_URL", "http://localhost:8001")):
+        self.base_url = base_url
+        self.api_url = f"{base_url}/api"
+        self.admin_token = None
+        self.member_token = None
+        self.tests_run = 0
+        self.tests_passed = 0
+        self.failed_tests = []
+
+    def log_test(self, name, success, details=""):
+        """Log test results"""
+        self.tests_run += 1
+        if success:
+            self.tests_passed += 1
+            print(f"✅ {name} - PASSED")
+        else:
+            print(f"❌ {name} - FAILED: {details}")
+            self.failed_tests.append({"test": name, "error": details})
+
+    def make_request(self, method, endpoint, data=None, use_admin=True, headers=None):
+        """Make API request with proper headers"""
+        url = f"{self.api_url}/{endpoint}"
+        headers = {'Content-Type': 'application/json', **(headers or {})}
+        token = self.admin_token if use_admin else self.member_token
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        try:
+            response = requests.request(method, url, json=data, headers=headers, timeout=30)
+            return response, None
+        except requests.exceptions.RequestException as e:
+            return None, str(e)
+
+    def test_admin_login(self):
+        """Admin login"""
+        response, error = self.make_request('POST', 'auth/login', {
+            'email': 'admin@staffordallotment.com',
+            'password': 'admin123'
+        })
+        success = not error and response.status_code == 200
+        if success:
+            self.admin_token = response.json()['token']
+        self.log_test("Admin Login", success, error or (response.text if response is not None else ""))
+        return success
+
+    def test_member_login(self):
+        """Register a member, approve them as admin, log in"""
+        email = f'library_member_{uuid.uuid4().hex[:8]}@example.com'
+        response, error = self.make_request('POST', 'auth/register', {
+            'email': email, 'username': email.split('@')[0], 'password': 'testpass123', 'join_code': 'GROW2024'
+        })
+        if error or response.status_code != 200:
+            self.log_test("Member Login", False, error or response.text)
+            return False
+        self.make_request('PATCH', f"admin/users/{response.json()['user_id']}/approve")
+        response, error = self.make_request('POST', 'auth/login', {'email': email, 'password': 'testpass123'})
+        success = not error and response.status_code == 200
+        if success:
+            self.member_token = response.json()['token']
+        self.log_test("Member Login", success, error or (response.text if not success else ""))
+        return success
+
+    def get_plants(self, headers=None):
+        response, _ = self.make_request('GET', 'plants', use_admin=False, headers=headers)
+        return response
+
+    def test_plants_etag(self):
+        """The library is served with an ETag and answers a matching If-None-Match with 304"""
+        first = self.get_plants()
+        etag = first.headers.get('ETag')
+        self.log_test("Plants ETag", first.status_code == 200 and etag and isinstance(first.json(), list),
+                      f"Status: {first.status_code}, ETag {etag}")
+        repeat = self.get_plants({'If-None-Match': etag})
+        self.log_test("Plants Not Modified", repeat.status_code == 304 and repeat.headers.get('ETag') == etag,
+                      f"Status: {repeat.status_code}")
+
+        packed = self.get_plants({'Accept': 'application/msgpack'})
+        self.log_test("Plants ETag Per Encoding", packed.status_code == 200 and packed.headers.get('ETag') not in (None, etag)
+                      and 'Accept' in packed.headers.get('Vary', ''), f"ETag {packed.headers.get('ETag')}")
+
+    def test_plants_change(self):
+        """Adding a plant replaces the snapshot: new ETag, new plant listed"""
+        etag = self.get_plants().headers.get('ETag')
+        name = f"Snapshot check {uuid.uuid4().hex[:8]}"
+        self.make_request('POST', 'plants', {'name': name, 'category': 'herb', 'description': 'Added by the snapshot check'})
+        after = self.get_plants({'If-None-Match': etag})
+        self.log_test("Plants Snapshot Replaced", after.status_code == 200 and after.headers.get('ETag') != etag
+                      and any(plant['name'] == name for plant in after.json()), f"Status: {after.status_code}")
+
+    def test_plants_reload(self):
+        """Admins can force a reload; the reported ETag is the one being served"""
+        response, _ = self.make_request('POST', 'admin/plants/reload')
+        served = self.get_plants().headers.get('ETag')
+        self.log_test("Plants Reload", response.status_code == 200 and response.json()['etag'] == served,
+                      f"Status: {response.status_code}, {response.text}")
+        member, _ = self.make_request('POST', 'admin/plants/reload', use_admin=False)
+        self.log_test("Plants Reload Admin Only", member.status_code == 403, f"Status: {member.status_code}")
+
+    def run_all_tests(self):
+        """Run all plant library tests"""
+        print("🚀 Starting Growing Together Plant Library Tests")
+        print("=" * 50)
+
+        if not self.test_admin_login():
+            print("❌ Admin login failed. Stopping tests.")
+            return False
+        if not self.test_member_login():
+            print("❌ Member login failed. Stopping tests.")
+            return False
+
+        self.test_plants_etag()
+        self.test_plants_change()
+        self.test_plants_reload()
+
+        print("\n" + "=" * 50)
+        print(f"📊 Test Summary: {self.tests_passed}/{self.tests_run} tests passed")
+        if self.failed_tests:
+            print("\n❌ Failed Tests:")
+            for test in self.failed_tests:
+                print(f"  - {test['test']}: {test['error']}")
+        return not self.failed_tests
+
+def main():
+    tester = PlantLibraryAPITester()
+    success = tester.run_all_tests()
+    return 0 if success else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+import requests
+import os
+import sys
+import uuid
+
+# Checks for plant typeahead: prefix, alias and typo-tolerant lookups.
+# Run against a running server (BASE_URL, default http://localhost:8001).
+
+class PlantSuggestAPITester:
+    def __init__(self, base_url=os.environ.get("BASE_URL", "http://localhost:8001")):
+        self.base_url = base_url
+        self.api_url = f"{base_url}/api"
+        self.admin_token = None
+        self.member_token = None
+        self.tests_run = 0
+        self.tests_passed = 0
+        self.failed_tests = []
+
+    def log_test(self, name, success, details=""):
+        """Log test results"""
+        self.tests_run += 1
+        if success:
+            self.tests_passed += 1
+            print(f"✅ {name} - PASSED")
+        else:
+            print(f"❌ {name} - FAILED: {details}")
+            self.failed_tests.append({"test": name, "error": details})
+
+    def make_request(self, method, endpoint, data=None, use_admin=True):
+        """Make API request with proper headers"""
+        url = f"{self.api_url}/{endpoint}"
+        headers = {'Content-Type': 'application/json'}
+        token = self.admin_token if use_admin else self.member_token
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        try:
+            response = requests.request(method, url, json=data, headers=headers, timeout=30)
+            return response, None
+        except requests.exceptions.RequestException as e:
+            return None, str(e)
+
+    def test_admin_login(self):
+        """Admin login"""
+        response, error = self.make_request('POST', 'auth/login', {
+            'email': 'admin@staffordallotment.com',
+            'password': 'admin123'
+        })
+        success = not error and response.status_code == 200
+        if success:
+            self.admin_token = response.json()['token']
+        self.log_test("Admin Login", success, error or (response.text if response is not None else ""))
+        return success
+
+    def test_member_login(self):
+        """Register a member, approve them as admin, log in"""
+        email = f'suggest_member_{uuid.uuid4().hex[:8]}@example.com'
+        response, error = self.make_request('POST', 'auth/register', {
+            'email': email, 'username': email.split('@')[0], 'password': 'testpass123', 'join_code': 'GROW2024'
+        })
+        if error or response.status_code != 200:
+            self.log_test("Member Login", False, error or response.text)
+            return False
+        self.make_request('PATCH', f"admin/users/{response.json()['user_id']}/approve")
+        response, error = self.make_request('POST', 'auth/login', {'email': email, 'password': 'testpass123'})
+        success = not error and response.status_code == 200
+        if success:
+            self.member_token = response.json()['token']
+        self.log_test("Member Login", success, error or (response.text if not success else ""))
+        return success
+
+    def suggest(self, query, limit=8):
+        response, _ = self.make_request('GET', f'plants/suggest?q={query}&limit={limit}', use_admin=False)
+        return response.json() if response.status_code == 200 else []
+
+    def test_plant_suggestions(self):
+        """New plants are suggested by name, scientific name and alias prefixes, and despite typos"""
+        tag = ''.join(chr(ord('a') + int(c, 16) % 26) for c in uuid.uuid4().hex[:8])
+        response, error = self.make_request('POST', 'plants', {
+            'name': f'Zucchetta {tag}', 'scientific_name': f'Cucurbita {tag}', 'category': 'vegetable',
+            'description': 'Climbing summer squash', 'aliases': [f'Trombetta {tag}']
+        })
+        if error or response.status_code != 200:
+            self.log_test("Suggest By Name Prefix", False, error or response.text)
+            return
+        plant_id = response.json()['id']
+
+        results = self.suggest(f'zucchetta {tag[:3]}')
+        self.log_test("Suggest By Name Prefix", results and results[0]['id'] == plant_id and results[0]['field'] == 'name'
+                      and results[0]['score'] == 1.0, f"results {results[:2]}")
+        results = self.suggest(tag[:5])
+        self.log_test("Suggest By Word Prefix", any(r['id'] == plant_id for r in results), f"results {results[:2]}")
+        results = self.suggest(f'trombetta {tag}')
+        self.log_test("Suggest By Alias", results and results[0]['id'] == plant_id and results[0]['field'] == 'alias',
+                      f"results {results[:2]}")
+        results = self.suggest(f'cucurbita {tag[:4]}')
+        self.log_test("Suggest By Scientific Name", results and results[0]['field'] == 'scientific_name'
+                      and results[0]['id'] == plant_id, f"results {results[:2]}")
+        results = self.suggest(f'zuchetta {tag}')
+        self.log_test("Suggest Despite Typo", any(r['id'] == plant_id and r['score'] < 1.0 for r in results), f"results {results[:2]}")
+
+    def test_suggest_limits(self):
+        """The limit caps results and punctuation-only queries return nothing"""
+        self.log_test("Suggest Limit", len(self.suggest('a', limit=2)) <= 2)
+        self.log_test("Suggest Empty Query", self.suggest('%21%21') == [], "expected no results for '!!'")
+
+    def run_all_tests(self):
+        """Run all plant suggest tests"""
+        print("🚀 Starting Growing Together Plant Suggest Tests")
+        print("=" * 50)
+
+        if not self.test_admin_login():
+            print("❌ Admin login failed. Stopping tests.")
+            return False
+        if not self.test_member_login():
+            print("❌ Member login failed. Stopping tests.")
+            return False
+
+        self.test_plant_suggestions()
+        self.test_suggest_limits()
+
+        print("\n" + "=" * 50)
+        print(f"📊 Test Summary: {self.tests_passed}/{self.tests_run} tests passed")
+        if self.failed_tests:
+            print("\n❌ Failed Tests:")
+            for test in self.failed_tests:
+                print(f"  - {test['test']}: {test['error']}")
+        return not self.failed_tests
+
+def main():
+    tester = PlantSuggestAPITester()
+    success = tester.run_all_tests()
+    return 0 if success else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
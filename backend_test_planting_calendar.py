@@ -0,0 +1,136 @@
+import requests
+import os
+import sys
+import uuid
+from datetime import datetime
+
+# Checks for the planting calendar built from plant planting guides.
+# Run against a running server (BASE_URL, default http://localhost:8001).
+
+class PlantingCalendarAPITester:
+    def __init__(self, base_url=os.environ.get("BASE_URL", "http://localhost:8001")):
+        self.base_url = base_url
+        self.api_url = f"{base_url}/api"
+        self.admin_token = None
+        self.member_token = None
+        self.tests_run = 0
+        self.tests_passed = 0
+        self.failed_tests = []
+
+    def log_test(self, name, success, details=""):
+        """Log test results"""
+        self.tests_run += 1
+        if success:
+            self.tests_passed += 1
+            print(f"✅ {name} - PASSED")
+        else:
+            print(f"❌ {name} - FAILED: {details}")
+            self.failed_tests.append({"test": name, "error": details})
+
+    def make_request(self, method, endpoint, data=None, use_admin=True):
+        """Make API request with proper headers"""
+        url = f"{self.api_url}/{endpoint}"
+        headers = {'Content-Type': 'application/json'}
+        token = self.admin_token if use_admin else self.member_token
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        try:
+            response = requests.request(method, url, json=data, headers=headers, timeout=30)
+            return response, None
+        except requests.exceptions.RequestException as e:
+            return None, str(e)
+
+    def test_admin_login(self):
+        """Admin login"""
+        response, error = self.make_request('POST', 'auth/login', {
+            'email': 'admin@staffordallotment.com',
+            'password': 'admin123'
+        })
+        success = not error and response.status_code == 200
+        if success:
+            self.admin_token = response.json()['token']
+        self.log_test("Admin Login", success, error or (response.text if response is not None else ""))
+        return success
+
+    def test_member_login(self):
+        """Register a member, approve them as admin, log in"""
+        email = f'calendar_member_{uuid.uuid4().hex[:8]}@example.com'
+        response, error = self.make_request('POST', 'auth/register', {
+            'email': email, 'username': email.split('@')[0], 'password': 'testpass123', 'join_code': 'GROW2024'
+        })
+        if error or response.status_code != 200:
+            self.log_test("Member Login", False, error or response.text)
+            return False
+        self.make_request('PATCH', f"admin/users/{response.json()['user_id']}/approve")
+        response, error = self.make_request('POST', 'auth/login', {'email': email, 'password': 'testpass123'})
+        success = not error and response.status_code == 200
+        if success:
+            self.member_token = response.json()['token']
+        self.log_test("Member Login", success, error or (response.text if not success else ""))
+        return success
+
+    def calendar(self, month):
+        response, _ = self.make_request('GET', f'plants/calendar?month={month}', use_admin=False)
+        return response
+
+    def listed(self, month, activity, plant_id):
+        return any(plant['id'] == plant_id for plant in self.calendar(month).json()[activity])
+
+    def test_calendar_windows(self):
+        """Month ranges in a plant's guide become calendar entries, including ranges across the new year"""
+        response, error = self.make_request('POST', 'plants', {
+            'name': f'Calendar check {uuid.uuid4().hex[:8]}', 'category': 'vegetable', 'description': 'x',
+            'planting_guide': {'sowing_time': 'March-April under glass; it may bolt if sown late', 'plant_out': 'June'},
+            'harvest_info': {'harvest_time': 'November to February'}
+        })
+        if error or response.status_code != 200:
+            self.log_test("Calendar Sowing Window", False, error or response.text)
+            return
+        plant_id = response.json()['id']
+
+        self.log_test("Calendar Sowing Window", self.listed(3, 'sow_indoors', plant_id) and self.listed(4, 'sow_indoors', plant_id)
+                      and not self.listed(5, 'sow_indoors', plant_id))
+        self.log_test("Calendar Plant Out", self.listed(6, 'plant_out', plant_id))
+        self.log_test("Calendar Harvest Wraps Year", all(self.listed(month, 'harvest', plant_id) for month in (11, 12, 1, 2))
+                      and not self.listed(3, 'harvest', plant_id))
+        self.log_test("Calendar Ignores Verb May", not any(self.listed(month, 'sow_outdoors', plant_id) for month in range(1, 13)))
+
+    def test_calendar_requests(self):
+        """This week's view covers the current month; out-of-range months are rejected"""
+        response, _ = self.make_request('GET', 'plants/calendar/this-week', use_admin=False)
+        week = response.json()
+        self.log_test("Calendar This Week", response.status_code == 200 and datetime.utcnow().month in week['months']
+                      and all(activity in week for activity in ('sow_indoors', 'sow_outdoors', 'plant_out', 'harvest')),
+                      f"Status: {response.status_code}")
+        self.log_test("Calendar Month Validated", self.calendar(13).status_code == 422)
+
+    def run_all_tests(self):
+        """Run all planting calendar tests"""
+        print("🚀 Starting Growing Together Planting Calendar Tests")
+        print("=" * 50)
+
+        if not self.test_admin_login():
+            print("❌ Admin login failed. Stopping tests.")
+            return False
+        if not self.test_member_login():
+            print("❌ Member login failed. Stopping tests.")
+            return False
+
+        self.test_calendar_windows()
+        self.test_calendar_requests()
+
+        print("\n" + "=" * 50)
+        print(f"📊 Test Summary: {self.tests_passed}/{self.tests_run} tests passed")
+        if self.failed_tests:
+            print("\n❌ Failed Tests:")
+            for test in self.failed_tests:
+                print(f"  - {test['test']}: {test['error']}")
+        return not self.failed_tests
+
+def main():
+    tester = PlantingCalendarAPITester()
+    success = tester.run_all_tests()
+    return 0 if success else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+import requests
+import os
+import sys
+import uuid
+
+# Checks for post reactions: the toggle endpoint, its counters and the featured-post cache.
+# Run against a running server (BASE_URL, default http://localhost:8001).
+
+class ReactionsAPITester:
+    def __init__(self, base_url=os.environ.get("BASE_URL", "http://localhost:8001")):
+        self.base_url = base_url
+        self.api_url = f"{base_url}/api"
+        self.admin_token = None
+        self.member_token = None
+        self.tests_run = 0
+        self.tests_passed = 0
+        self.failed_tests = []
+
+    def log_test(self, name, success, details=""):
+        """Log test results"""
+        self.tests_run += 1
+        if success:
+            self.tests_passed += 1
+            print(f"✅ {name} - PASSED")
+        else:
+            print(f"❌ {name} - FAILED: {details}")
+            self.failed_tests.append({"test": name, "error": details})
+
+    def make_request(self, method, endpoint, data=None, use_admin=True):
+        """Make API request with proper headers"""
+        url = f"{self.api_url}/{endpoint}"
+        headers = {'Content-Type': 'application/json'}
+        token = self.admin_token if use_admin else self.member_token
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        try:
+            response = requests.request(method, url, json=data, headers=headers, timeout=30)
+            return response, None
+        except requests.exceptions.RequestException as e:
+            return None, str(e)
+
+    def test_admin_login(self):
+        """Admin login"""
+        response, error = self.make_request('POST', 'auth/login', {
+            'email': 'admin@staffordallotment.com',
+            'password': 'admin123'
+        })
+        success = not error and response.status_code == 200
+        if success:
+            self.admin_token = response.json()['token']
+        self.log_test("Admin Login", success, error or (response.text if response is not None else ""))
+        return success
+
+    def test_member_login(self):
+        """Register a member, approve them as admin, log in"""
+        email = f'reaction_member_{uuid.uuid4().hex[:8]}@example.com'
+        response, error = self.make_request('POST', 'auth/register', {
+            'email': email, 'username': email.split('@')[0], 'password': 'testpass123', 'join_code': 'GROW2024'
+        })
+        if error or response.status_code != 200:
+            self.log_test("Member Login", False, error or response.text)
+            return False
+        self.make_request('PATCH', f"admin/users/{response.json()['user_id']}/approve")
+        response, error = self.make_request('POST', 'auth/login', {'email': email, 'password': 'testpass123'})
+        success = not error and response.status_code == 200
+        if success:
+            self.member_token = response.json()['token']
+        self.log_test("Member Login", success, error or (response.text if not success else ""))
+        return success
+
+    def test_reaction_toggle(self):
+        """Reacting twice toggles the reaction off again, and the counter follows"""
+        response, error = self.make_request('POST', 'posts', {'content': f'Reaction check {uuid.uuid4().hex[:8]}'})
+        if error or response.status_code != 200:
+            self.log_test("Reaction Toggle On", False, error or response.text)
+            return
+        post_id = response.json()['id']
+
+        on, _ = self.make_request('POST', f'posts/{post_id}/reactions', {'reaction_type': 'like'}, use_admin=False)
+        self.log_test("Reaction Toggle On",
+                      on.status_code == 200 and on.json()['reacted'] and on.json()['reaction_counts'].get('like') == 1,
+                      f"Status: {on.status_code}, {on.text}")
+
+        response, _ = self.make_request('GET', 'posts', use_admin=False)
+        post = next((post for post in response.json() if post['id'] == post_id), None)
+        self.log_test("Reaction Listed As Mine", post is not None and post['my_reactions'] == ['like'], f"post {post}")
+
+        off, _ = self.make_request('POST', f'posts/{post_id}/reactions', {'reaction_type': 'like'}, use_admin=False)
+        self.log_test("Reaction Toggle Off",
+                      off.status_code == 200 and not off.json()['reacted'] and off.json()['reaction_counts'].get('like') == 0,
+                      f"Status: {off.status_code}, {off.text}")
+
+    def test_reaction_validation(self):
+        """Unknown reaction types and posts are rejected"""
+        response, _ = self.make_request('POST', 'posts', {'content': 'Reaction validation check'})
+        post_id = response.json()['id']
+        invalid, _ = self.make_request('POST', f'posts/{post_id}/reactions', {'reaction_type': 'shrug'})
+        self.log_test("Reaction Invalid Type", invalid.status_code == 400, f"Status: {invalid.status_code}")
+        missing, _ = self.make_request('POST', f'posts/{uuid.uuid4()}/reactions', {'reaction_type': 'like'})
+        self.log_test("Reaction Unknown Post", missing.status_code == 404, f"Status: {missing.status_code}")
+
+    def test_featured_reaction_counts(self):
+        """A reaction on a pinned post shows up in the feed straight away, not after the featured cache expires"""
+        response, _ = self.make_request('POST', 'posts', {'content': f'Pinned reaction check {uuid.uuid4().hex[:8]}'})
+        post_id = response.json()['id']
+        self.make_request('PATCH', f'posts/{post_id}/feature', {'is_pinned': True})
+        self.make_request('GET', 'posts/feed')  # caches the featured posts
+        self.make_request('POST', f'posts/{post_id}/reactions', {'reaction_type': 'helpful'}, use_admin=False)
+
+        response, _ = self.make_request('GET', 'posts/feed', use_admin=False)
+        post = next((post for post in response.json()['posts'] if post['id'] == post_id), None)
+        self.log_test("Featured Reaction Count Fresh", post is not None and post['reaction_counts'].get('helpful') == 1,
+                      f"post {post}")
+        self.make_request('PATCH', f'posts/{post_id}/feature', {'is_pinned': False})
+
+    def run_all_tests(self):
+        """Run all reaction tests"""
+        print("🚀 Starting Growing Together Reaction Tests")
+        print("=" * 50)
+
+        if not self.test_admin_login():
+            print("❌ Admin login failed. Stopping tests.")
+            return False
+        if not self.test_member_login():
+            print("❌ Member login failed. Stopping tests.")
+            return False
+
+        self.test_reaction_toggle()
+        self.test_reaction_validation()
+        self.test_featured_reaction_counts()
+
+        print("\n" + "=" * 50)
+        print(f"📊 Test Summary: {self.tests_passed}/{self.tests_run} tests passed")
+        if self.failed_tests:
+            print("\n❌ Failed Tests:")
+            for test in self.failed_tests:
+                print(f"  - {test['test']}: {test['error']}")
+        return not self.failed_tests
+
+def main():
+    tester = ReactionsAPITester()
+    success = tester.run_all_tests()
+    return 0 if success else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
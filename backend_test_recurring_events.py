@@ -0,0 +1,182 @@
+import requests
+import os
+import sys
+import uuid
+
+# Checks for windowed event queries, recurring-event expansion and occurrence RSVPs.
+# Run against a running server (BASE_URL, default http://localhost:8001).
+
+class EventsAPITester:
+    def __init__(self, base_url=os.environ.get("BASE_URL", "http://localhost:8001")):
+        self.base_url = base_url
+        self.api_url = f"{base_url}/api"
+        self.admin_token = None
+        self.member_token = None
+        self.tests_run = 0
+        self.tests_passed = 0
+        self.failed_tests = []
+
+    def log_test(self, name, success, details=""):
+        """Log test results"""
+        self.tests_run += 1
+        if success:
+            self.tests_passed += 1
+            print(f"✅ {name} - PASSED")
+        else:
+            print(f"❌ {name} - FAILED: {details}")
+            self.failed_tests.append({"test": name, "error": details})
+
+    def make_request(self, method, endpoint, data=None, use_admin=True):
+        """Make API request with proper headers"""
+        url = f"{self.api_url}/{endpoint}"
+        headers = {'Content-Type': 'application/json'}
+        token = self.admin_token if use_admin else self.member_token
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        try:
+            response = requests.request(method, url, json=data, headers=headers, timeout=30)
+            return response, None
+        except requests.exceptions.RequestException as e:
+            return None, str(e)
+
+    def test_admin_login(self):
+        """Admin login"""
+        response, error = self.make_request('POST', 'auth/login', {
+            'email': 'admin@staffordallotment.com',
+            'password': 'admin123'
+        })
+        success = not error and response.status_code == 200
+        if success:
+            self.admin_token = response.json()['token']
+        self.log_test("Admin Login", success, error or (response.text if response is not None else ""))
+        return success
+
+    def test_member_login(self):
+        """Register a member, approve them as admin, log in"""
+        email = f'event_member_{uuid.uuid4().hex[:8]}@example.com'
+        response, error = self.make_request('POST', 'auth/register', {
+            'email': email, 'username': email.split('@')[0], 'password': 'testpass123', 'join_code': 'GROW2024'
+        })
+        if error or response.status_code != 200:
+            self.log_test("Member Login", False, error or response.text)
+            return False
+        self.make_request('PATCH', f"admin/users/{response.json()['user_id']}/approve")
+        response, error = self.make_request('POST', 'auth/login', {'email': email, 'password': 'testpass123'})
+        success = not error and response.status_code == 200
+        if success:
+            self.member_token = response.json()['token']
+        self.log_test("Member Login", success, error or (response.text if not success else ""))
+        return success
+
+    def create_event(self, **fields):
+        response, error = self.make_request('POST', 'events', {
+            'title': f'Recurrence check {uuid.uuid4().hex[:8]}', 'description': 'Checks', 'location': 'Main gate', **fields
+        })
+        if error or response.status_code != 200:
+            return None
+        return response.json()
+
+    def occurrences(self, event_id, window_from, window_to):
+        response, _ = self.make_request('GET', f'events?from={window_from}&to={window_to}&limit=500', use_admin=False)
+        if response.status_code != 200:
+            return []
+        return [event for event in response.json() if event['id'] == event_id]
+
+    def test_weekly_expansion(self):
+        """A weekly series expands into one entry per week inside the window, with exceptions applied"""
+        event = self.create_event(date='2031-01-04T10:00:00', recurrence={'freq': 'weekly'})
+        if not event:
+            self.log_test("Weekly Expansion", False, "Could not create event")
+            return
+        found = self.occurrences(event['id'], '2031-01-01', '2031-02-01')
+        self.log_test("Weekly Expansion",
+                      [o['occurrence_start'][:10] for o in found] == ['2031-01-04', '2031-01-11', '2031-01-18', '2031-01-25'],
+                      f"occurrences {[o['occurrence_start'] for o in found]}")
+
+        self.make_request('POST', f"events/{event['id']}/exceptions", {'occurrence': '2031-01-11T10:00:00', 'cancelled': True})
+        self.make_request('POST', f"events/{event['id']}/exceptions", {
+            'occurrence': '2031-01-18T10:00:00', 'date': '2031-01-19T11:00:00', 'title': 'Moved work party'
+        })
+        found = self.occurrences(event['id'], '2031-01-01', '2031-02-01')
+        moved = next((o for o in found if o['occurrence_start'].startswith('2031-01-18')), None)
+        self.log_test("Cancelled Occurrence Hidden", not any(o['occurrence_start'].startswith('2031-01-11') for o in found),
+                      f"occurrences {[o['occurrence_start'] for o in found]}")
+        self.log_test("Moved Occurrence", moved is not None and moved['date'].startswith('2031-01-19T11:00')
+                      and moved['title'] == 'Moved work party', f"moved {moved}")
+
+        bad, _ = self.make_request('POST', f"events/{event['id']}/exceptions", {'occurrence': '2031-01-12T10:00:00', 'cancelled': True})
+        self.log_test("Exception Needs Real Occurrence", bad.status_code == 400, f"Status: {bad.status_code}")
+
+    def test_monthly_count(self):
+        """COUNT counts occurrences that exist: a monthly series on the 31st skips shorter months"""
+        event = self.create_event(date='2032-01-31T19:00:00', recurrence={'freq': 'monthly', 'count': 3})
+        if not event:
+            self.log_test("Monthly Count", False, "Could not create event")
+            return
+        found = self.occurrences(event['id'], '2032-01-01', '2033-01-01')
+        self.log_test("Monthly Count",
+                      [o['occurrence_start'][:10] for o in found] == ['2032-01-31', '2032-03-31', '2032-05-31']
+                      and event['recurrence_end'].startswith('2032-05-31'),
+                      f"occurrences {[o['occurrence_start'] for o in found]}, end {event['recurrence_end']}")
+
+        invalid, _ = self.make_request('POST', 'events', {
+            'title': 'Invalid rule', 'description': 'x', 'location': 'x', 'date': '2032-01-01T10:00:00',
+            'recurrence': {'freq': 'hourly'}
+        })
+        self.log_test("Invalid Recurrence Rejected", invalid.status_code == 400, f"Status: {invalid.status_code}")
+
+    def test_occurrence_rsvp(self):
+        """Members RSVP to a single occurrence; other occurrences are unaffected"""
+        event = self.create_event(date='2033-03-05T10:00:00', recurrence={'freq': 'weekly', 'count': 4})
+        if not event:
+            self.log_test("Occurrence RSVP", False, "Could not create event")
+            return
+        response, _ = self.make_request('POST', f"events/{event['id']}/rsvp?occurrence=2033-03-12T10:00:00", use_admin=False)
+        self.log_test("Occurrence RSVP", response.status_code == 200 and response.json()['rsvp'], f"Status: {response.status_code}")
+
+        found = self.occurrences(event['id'], '2033-03-01', '2033-04-01')
+        attending = [o['occurrence_start'][:10] for o in found if o['rsvp_list']]
+        self.log_test("Occurrence RSVP Listed", attending == ['2033-03-12'], f"attending {attending}")
+
+        missing, _ = self.make_request('POST', f"events/{event['id']}/rsvp", use_admin=False)
+        wrong, _ = self.make_request('POST', f"events/{event['id']}/rsvp?occurrence=2033-03-13T10:00:00", use_admin=False)
+        self.log_test("Occurrence RSVP Validated", missing.status_code == 400 and wrong.status_code == 400,
+                      f"Status: {missing.status_code} / {wrong.status_code}")
+
+    def test_window_validation(self):
+        """A window that ends before it starts is rejected"""
+        response, _ = self.make_request('GET', 'events?from=2031-02-01&to=2031-01-01', use_admin=False)
+        self.log_test("Event Window Validated", response.status_code == 400, f"Status: {response.status_code}")
+
+    def run_all_tests(self):
+        """Run all event tests"""
+        print("🚀 Starting Growing Together Event Tests")
+        print("=" * 50)
+
+        if not self.test_admin_login():
+            print("❌ Admin login failed. Stopping tests.")
+            return False
+        if not self.test_member_login():
+            print("❌ Member login failed. Stopping tests.")
+            return False
+
+        self.test_weekly_expansion()
+        self.test_monthly_count()
+        self.test_occurrence_rsvp()
+        self.test_window_validation()
+
+        print("\n" + "=" * 50)
+        print(f"📊 Test Summary: {self.tests_passed}/{self.tests_run} tests passed")
+        if self.failed_tests:
+            print("\n❌ Failed Tests:")
+            for test in self.failed_tests:
+                print(f"  - {test['test']}: {test['error']}")
+        return not self.failed_tests
+
+def main():
+    tester = EventsAPITester()
+    success = tester.run_all_tests()
+    return 0 if success else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
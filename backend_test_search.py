@@ -0,0 +1,172 @@
+import requests
+import os
+import sys
+import uuid
+
+# Checks for full-text search over diary entries, posts, plants and events. Run from an environment that
+# can import backend/server.py (BASE_URL, default http://localhost:8001); the index itself is also checked directly.
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+import server
+
+class SearchAPITester:
+    def __init__(self, base_url=os.environ.get("BASE_URL", "http://localhost:8001")):
+        self.base_url = base_url
+        self.api_url = f"{base_url}/api"
+        self.admin_token = None
+        self.member_token = None
+        self.tests_run = 0
+        self.tests_passed = 0
+        self.failed_tests = []
+
+    def log_test(self, name, success, details=""):
+        """Log test results"""
+        self.tests_run += 1
+        if success:
+            self.tests_passed += 1
+            print(f"✅ {name} - PASSED")
+        else:
+            print(f"❌ {name} - FAILED: {details}")
+            self.failed_tests.append({"test": name, "error": details})
+
+    def make_request(self, method, endpoint, data=None, use_admin=True):
+        """Make API request with proper headers"""
+        url = f"{self.api_url}/{endpoint}"
+        headers = {'Content-Type': 'application/json'}
+        token = self.admin_token if use_admin else self.member_token
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        try:
+            response = requests.request(method, url, json=data, headers=headers, timeout=30)
+            return response, None
+        except requests.exceptions.RequestException as e:
+            return None, str(e)
+
+    def test_admin_login(self):
+        """Admin login"""
+        response, error = self.make_request('POST', 'auth/login', {
+            'email': 'admin@staffordallotment.com',
+            'password': 'admin123'
+        })
+        success = not error and response.status_code == 200
+        if success:
+            self.admin_token = response.json()['token']
+        self.log_test("Admin Login", success, error or (response.text if response is not None else ""))
+        return success
+
+    def test_member_login(self):
+        """Register a member, approve them as admin, log in"""
+        email = f'search_member_{uuid.uuid4().hex[:8]}@example.com'
+        response, error = self.make_request('POST', 'auth/register', {
+            'email': email, 'username': email.split('@')[0], 'password': 'testpass123', 'join_code': 'GROW2024'
+        })
+        if error or response.status_code != 200:
+            self.log_test("Member Login", False, error or response.text)
+            return False
+        self.make_request('PATCH', f"admin/users/{response.json()['user_id']}/approve")
+        response, error = self.make_request('POST', 'auth/login', {'email': email, 'password': 'testpass123'})
+        success = not error and response.status_code == 200
+        if success:
+            self.member_token = response.json()['token']
+        self.log_test("Member Login", success, error or (response.text if not success else ""))
+        return success
+
+    def search(self, query, use_admin=True, kinds=None):
+        endpoint = f'search?q={query}' + (f'&kinds={kinds}' if kinds else '')
+        response, _ = self.make_request('GET', endpoint, use_admin=use_admin)
+        return response
+
+    def test_diary_search(self):
+        """Diary entries are found by stemmed words, by their owner only, until deleted"""
+        word = f"mildew{uuid.uuid4().hex[:6]}x"
+        response, _ = self.make_request('POST', 'diary', {
+            'plot_number': '1', 'entry_type': 'general', 'title': f'Courgettes showing {word}', 'content': 'Spraying milk tomorrow'
+        }, use_admin=False)
+        entry_id = response.json()['id']
+
+        found = self.search(word, use_admin=False).json()
+        self.log_test("Search Finds Own Diary", [r['id'] for r in found['results']] == [entry_id], f"results {found['results']}")
+        stemmed = self.search(f"{word} spray", use_admin=False).json()
+        self.log_test("Search Stems Words", any(r['id'] == entry_id for r in stemmed['results']), f"results {stemmed['results']}")
+
+        self.make_request('POST', 'diary', {
+            'plot_number': '2', 'entry_type': 'general', 'title': f'Private {word}', 'content': 'Admin notes'
+        })
+        mine = self.search(word, use_admin=False).json()
+        self.log_test("Search Hides Others' Diaries", mine['total'] == 1, f"total {mine['total']}")
+
+        self.make_request('DELETE', f'diary/{entry_id}', use_admin=False)
+        gone = self.search(word, use_admin=False).json()
+        self.log_test("Search Drops Deleted Entry", gone['total'] == 0, f"results {gone['results']}")
+
+    def test_ranking(self):
+        """A title match outranks a passing mention in body text"""
+        word = f"greenfly{uuid.uuid4().hex[:6]}x"
+        mention, _ = self.make_request('POST', 'events', {
+            'title': 'Open day', 'description': f'Bring spare plants; we will also talk about {word} and other pests at length today',
+            'location': 'x', 'date': '2031-07-01T10:00:00'
+        })
+        titled, _ = self.make_request('POST', 'events', {
+            'title': f'Dealing with {word}', 'description': 'Practical session', 'location': 'x', 'date': '2031-07-08T10:00:00'
+        })
+        results = self.search(word, use_admin=False, kinds='event').json()['results']
+        self.log_test("Search Title Ranks First", [r['id'] for r in results] == [titled.json()['id'], mention.json()['id']],
+                      f"results {[(r['title'], r['score']) for r in results]}")
+
+    def test_validation(self):
+        """Unknown kinds are rejected"""
+        response = self.search('tomato', kinds='recipes')
+        self.log_test("Search Invalid Kinds", response.status_code == 400, f"Status: {response.status_code}")
+
+    def test_index_compaction(self):
+        """Retired documents stop counting toward scores and are compacted away"""
+        index, reference = server.SearchIndex(), server.SearchIndex()
+        for number in range(3000):
+            index.add("post", str(number), "", [f"potato blight report {number}" if number % 3 else "carrot fly"])
+        for number in range(2000):
+            index.remove("post", str(number))
+        for number in range(2000, 3000):
+            reference.add("post", str(number), "", [f"potato blight report {number}" if number % 3 else "carrot fly"])
+
+        class Member:
+            id, role = "search-test", "member"
+        scores = [r['score'] for r in index.search("potato carrot", Member, limit=50)['results']]
+        expected = [r['score'] for r in reference.search("potato carrot", Member, limit=50)['results']]
+        self.log_test("Search Index Live Statistics", scores == expected, f"scores {scores[:3]} vs {expected[:3]}")
+        retired = len(index.docs) - index.live_count
+        self.log_test("Search Index Compacted",
+                      index.live_count == 1000 and len(index.docs) < 3000 and retired <= max(server.SEARCH_COMPACT_MIN_RETIRED, index.live_count),
+                      f"{len(index.docs)} numbers for {index.live_count} documents")
+
+    def run_all_tests(self):
+        """Run all search tests"""
+        print("🚀 Starting Growing Together Search Tests")
+        print("=" * 50)
+
+        if not self.test_admin_login():
+            print("❌ Admin login failed. Stopping tests.")
+            return False
+        if not self.test_member_login():
+            print("❌ Member login failed. Stopping tests.")
+            return False
+
+        self.test_diary_search()
+        self.test_ranking()
+        self.test_validation()
+        self.test_index_compaction()
+
+        print("\n" + "=" * 50)
+        print(f"📊 Test Summary: {self.tests_passed}/{self.tests_run} tests passed")
+        if self.failed_tests:
+            print("\n❌ Failed Tests:")
+            for test in self.failed_tests:
+                print(f"  - {test['test']}: {test['error']}")
+        return not self.failed_tests
+
+def main():
+    tester = SearchAPITester()
+    success = tester.run_all_tests()
+    return 0 if success else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+import requests
+import os
+import sys
+import uuid
+import gzip
+import json
+
+# Checks for the first-sync snapshot: the gzip NDJSON bundle, its cursor, and prebuilt parts following changes.
+# Run against a running server (BASE_URL, default http://localhost:8001).
+
+class SnapshotAPITester:
+    def __init__(self, base_url=os.environ.get("BASE_URL", "http://localhost:8001")):
+        self.base_url = base_url
+        self.api_url = f"{base_url}/api"
+        self.admin_token = None
+        self.member_token = None
+        self.tests_run = 0
+        self.tests_passed = 0
+        self.failed_tests = []
+
+    def log_test(self, name, success, details=""):
+        """Log test results"""
+        self.tests_run += 1
+        if success:
+            self.tests_passed += 1
+            print(f"✅ {name} - PASSED")
+        else:
+            print(f"❌ {name} - FAILED: {details}")
+            self.failed_tests.append({"test": name, "error": details})
+
+    def make_request(self, method, endpoint, data=None, use_admin=True):
+        """Make API request with proper headers"""
+        url = f"{self.api_url}/{endpoint}"
+        headers = {'Content-Type': 'application/json'}
+        token = self.admin_token if use_admin else self.member_token
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        try:
+            response = requests.request(method, url, json=data, headers=headers, timeout=30)
+            return response, None
+        except requests.exceptions.RequestException as e:
+            return None, str(e)
+
+    def test_admin_login(self):
+        """Admin login"""
+        response, error = self.make_request('POST', 'auth/login', {
+            'email': 'admin@staffordallotment.com',
+            'password': 'admin123'
+        })
+        success = not error and response.status_code == 200
+        if success:
+            self.admin_token = response.json()['token']
+        self.log_test("Admin Login", success, error or (response.text if response is not None else ""))
+        return success
+
+    def test_member_login(self):
+        """Register a member, approve them as admin, log in"""
+        email = f'snapshot_member_{uuid.uuid4().hex[:8]}@example.com'
+        response, error = self.make_request('POST', 'auth/register', {
+            'email': email, 'username': email.split('@')[0], 'password': 'testpass123', 'join_code': 'GROW2024'
+        })
+        if error or response.status_code != 200:
+            self.log_test("Member Login", False, error or response.text)
+            return False
+        self.make_request('PATCH', f"admin/users/{response.json()['user_id']}/approve")
+        response, error = self.make_request('POST', 'auth/login', {'email': email, 'password': 'testpass123'})
+        success = not error and response.status_code == 200
+        if success:
+            self.member_token = response.json()['token']
+        self.log_test("Member Login", success, error or (response.text if not success else ""))
+        return success
+
+    def download(self, use_admin=False):
+        """The snapshot's meta line and its documents, grouped by collection"""
+        response, error = self.make_request('GET', 'sync/snapshot', use_admin=use_admin)
+        if error or response.status_code != 200:
+            return response, None, None
+        lines = [json.loads(line) for line in gzip.decompress(response.content).splitlines() if line]
+        documents = {}
+        for line in lines[1:]:
+            documents.setdefault(line['collection'], []).append(line['document'])
+        return response, lines[0], documents
+
+    def ids(self, documents, name):
+        return {document['id'] for document in documents.get(name, [])}
+
+    def test_snapshot_bundle(self):
+        """One gzip download: a meta line with the delta sync cursor, then the shared collections and the caller's own"""
+        response, meta, documents = self.download()
+        if meta is None:
+            self.log_test("Snapshot Download", False, response.text if response is not None else "request failed")
+            return
+        self.log_test("Snapshot Download", response.headers.get('Content-Type') == 'application/gzip'
+                      and response.headers.get('Cache-Control') == 'private, no-store', f"headers {dict(response.headers)}")
+        self.log_test("Snapshot Meta", meta['type'] == 'snapshot' and isinstance(meta['cursor'], int) and meta['user_id'],
+                      f"meta {meta}")
+        self.log_test("Snapshot Plants", len(documents.get('plants', [])) > 0, f"collections {sorted(documents)}")
+
+        anonymous = requests.get(f"{self.api_url}/sync/snapshot", timeout=10)
+        self.log_test("Snapshot Requires Auth", anonymous.status_code in (401, 403), f"Status: {anonymous.status_code}")
+
+    def test_snapshot_follows_changes(self):
+        """A prebuilt part is rebuilt once its collection changes, and the cursor picks up what came after"""
+        _, before, _ = self.download()
+        response, _ = self.make_request('POST', 'posts', {'content': f'Snapshot check {uuid.uuid4().hex[:8]}'}, use_admin=False)
+        post_id = response.json()['id']
+
+        _, after, documents = self.download()
+        self.log_test("Snapshot Includes New Post", post_id in self.ids(documents, 'posts'), f"{len(documents.get('posts', []))} posts")
+        response, _ = self.make_request('GET', f"sync/changes?cursor={before['cursor']}", use_admin=False)
+        self.log_test("Snapshot Cursor Continues", post_id in [post['id'] for post in response.json()['changes']['posts']]
+                      and after['cursor'] > before['cursor'], f"cursors {before['cursor']} / {after['cursor']}")
+
+    def test_snapshot_follows_deletions(self):
+        """Deleting something rebuilds its part too, so the bundle doesn't resurrect it"""
+        response, _ = self.make_request('POST', 'events', {
+            'title': f'Snapshot RSVP check {uuid.uuid4().hex[:8]}', 'description': 'Checks', 'location': 'Main gate',
+            'date': '2035-05-05T10:00:00', 'recurrence': {'freq': 'weekly', 'count': 2}
+        })
+        event_id = response.json()['id']
+        self.make_request('POST', f'events/{event_id}/rsvp?occurrence=2035-05-05T10:00:00', use_admin=False)
+        _, _, documents = self.download()
+        attending = [rsvp for rsvp in documents.get('rsvps', []) if rsvp['event_id'] == event_id]
+        self.make_request('POST', f'events/{event_id}/rsvp?occurrence=2035-05-05T10:00:00', use_admin=False)
+        _, _, documents = self.download()
+        cancelled = [rsvp for rsvp in documents.get('rsvps', []) if rsvp['event_id'] == event_id]
+        self.log_test("Snapshot Drops Cancelled RSVP", len(attending) == 1 and not cancelled, f"before {attending}, after {cancelled}")
+
+    def test_snapshot_own_slice(self):
+        """Private collections hold only the caller's documents"""
+        response, _ = self.make_request('POST', 'diary', {
+            'plot_number': '1', 'entry_type': 'general', 'title': f'Snapshot diary check {uuid.uuid4().hex[:8]}', 'content': 'Mine'
+        }, use_admin=False)
+        entry_id = response.json()['id']
+        _, _, mine = self.download()
+        _, _, admin = self.download(use_admin=True)
+        self.log_test("Snapshot Own Diary", entry_id in self.ids(mine, 'diary') and entry_id not in self.ids(admin, 'diary'),
+                      f"member {len(mine.get('diary', []))} entries, admin {len(admin.get('diary', []))}")
+        self.make_request('DELETE', f'diary/{entry_id}', use_admin=False)
+        _, _, mine = self.download()
+        self.log_test("Snapshot Drops Deleted Diary", entry_id not in self.ids(mine, 'diary'))
+
+    def run_all_tests(self):
+        """Run all snapshot tests"""
+        print("🚀 Starting Growing Together Snapshot Tests")
+        print("=" * 50)
+
+        if not self.test_admin_login():
+            print("❌ Admin login failed. Stopping tests.")
+            return False
+        if not self.test_member_login():
+            print("❌ Member login failed. Stopping tests.")
+            return False
+
+        self.test_snapshot_bundle()
+        self.test_snapshot_follows_changes()
+        self.test_snapshot_follows_deletions()
+        self.test_snapshot_own_slice()
+
+        print("\n" + "=" * 50)
+        print(f"📊 Test Summary: {self.tests_passed}/{self.tests_run} tests passed")
+        if self.failed_tests:
+            print("\n❌ Failed Tests:")
+            for test in self.failed_tests:
+                print(f"  - {test['test']}: {test['error']}")
+        return not self.failed_tests
+
+def main():
+    tester = SnapshotAPITester()
+    success = tester.run_all_tests()
+    return 0 if success else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,177 @@
+import requests
+import asyncio
+import os
+import sys
+import uuid
+from datetime import datetime, timedelta
+
+# Checks for the shared weather cache: client caching headers, upstream call sharing, diary entry weather
+# and serving through an outage. Start the server with WEATHER_PROVIDER=stub, and run this from an environment
+# that can import backend/server.py pointed at the same MONGO_URL and DB_NAME: the outage checks seed snapshots there.
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+import server
+
+class WeatherAPITester:
+    def __init__(self, base_url=os.environ.get("BASE_URL", "http://localhost:8001")):
+        self.base_url = base_url
+        self.api_url = f"{base_url}/api"
+        self.admin_token = None
+        self.member_token = None
+        self.tests_run = 0
+        self.tests_passed = 0
+        self.failed_tests = []
+        self.loop = asyncio.new_event_loop()  # one loop, so the Motor client stays on it
+
+    def log_test(self, name, success, details=""):
+        """Log test results"""
+        self.tests_run += 1
+        if success:
+            self.tests_passed += 1
+            print(f"✅ {name} - PASSED")
+        else:
+            print(f"❌ {name} - FAILED: {details}")
+            self.failed_tests.append({"test": name, "error": details})
+
+    def make_request(self, method, endpoint, data=None, use_admin=True):
+        """Make API request with proper headers"""
+        url = f"{self.api_url}/{endpoint}"
+        headers = {'Content-Type': 'application/json'}
+        token = self.admin_token if use_admin else self.member_token
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        try:
+            response = requests.request(method, url, json=data, headers=headers, timeout=30)
+            return response, None
+        except requests.exceptions.RequestException as e:
+            return None, str(e)
+
+    def run(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+    def test_admin_login(self):
+        """Admin login"""
+        response, error = self.make_request('POST', 'auth/login', {
+            'email': 'admin@staffordallotment.com',
+            'password': 'admin123'
+        })
+        success = not error and response.status_code == 200
+        if success:
+            self.admin_token = response.json()['token']
+        self.log_test("Admin Login", success, error or (response.text if response is not None else ""))
+        return success
+
+    def test_member_login(self):
+        """Register a member, approve them as admin, log in"""
+        email = f'weather_member_{uuid.uuid4().hex[:8]}@example.com'
+        response, error = self.make_request('POST', 'auth/register', {
+            'email': email, 'username': email.split('@')[0], 'password': 'testpass123', 'join_code': 'GROW2024'
+        })
+        if error or response.status_code != 200:
+            self.log_test("Member Login", False, error or response.text)
+            return False
+        self.make_request('PATCH', f"admin/users/{response.json()['user_id']}/approve")
+        response, error = self.make_request('POST', 'auth/login', {'email': email, 'password': 'testpass123'})
+        success = not error and response.status_code == 200
+        if success:
+            self.member_token = response.json()['token']
+        self.log_test("Member Login", success, error or (response.text if not success else ""))
+        return success
+
+    def test_stub_weather(self):
+        """The stub provider serves weather without network access, with a cache lifetime for clients"""
+        response, error = self.make_request('GET', 'weather')
+        success = not error and response.status_code == 200 and response.json()['current']['condition'] == "Partly Cloudy"
+        self.log_test("Stub Weather", success, error or response.text)
+        if not success:
+            return
+        cache_control = response.headers.get('Cache-Control', '')
+        max_age = int(cache_control.split('max-age=')[1]) if 'max-age=' in cache_control else -1
+        self.log_test("Weather Cache-Control", cache_control.startswith('public') and 0 <= max_age <= server.WEATHER_TTL_SECONDS,
+                      f"Cache-Control: {cache_control}")
+        self.log_test("Weather Fresh", response.json()['stale'] is False and 'key' not in response.json(), f"weather {response.json()}")
+
+    def test_weather_shared_cache(self):
+        """Repeated requests are served from the cached snapshot, not the upstream provider"""
+        before, _ = self.make_request('GET', 'admin/weather/metrics')
+        for _ in range(3):
+            self.make_request('GET', 'weather', use_admin=False)
+        after, _ = self.make_request('GET', 'admin/weather/metrics')
+        before, after = before.json(), after.json()
+        self.log_test("Weather Served From Cache",
+                      after['requests'] - before['requests'] >= 3 and after['upstream_calls'] == before['upstream_calls'],
+                      f"before {before}, after {after}")
+
+    def test_diary_entry_weather(self):
+        """New diary entries record the current conditions"""
+        response, error = self.make_request('POST', 'diary', {
+            'plot_number': '1', 'entry_type': 'general', 'title': f'Weather check {uuid.uuid4().hex[:8]}', 'content': 'Sunny spell'
+        }, use_admin=False)
+        if error or response.status_code != 200:
+            self.log_test("Diary Entry Weather", False, error or response.text)
+            return
+        self.log_test("Diary Entry Weather", response.json()['weather'] == "Partly Cloudy, 22°C", f"weather {response.json()['weather']}")
+        self.make_request('DELETE', f"diary/{response.json()['id']}", use_admin=False)
+
+    def test_stale_snapshot_served(self):
+        """During an upstream outage the last snapshot is served marked stale, until it is too old to trust"""
+        class FailingProvider(server.WeatherProvider):
+            async def fetch(self, latitude, longitude):
+                raise RuntimeError("upstream down")
+
+        async def check(age_seconds):
+            cache = server.WeatherCache(FailingProvider(), 0.0, 0.0)  # a key of its own, away from the live snapshot
+            await server.db.weather_snapshots.replace_one({"key": cache.key}, {
+                "key": cache.key, "location": "Outage check", "current": {"temperature": 9, "condition": "Overcast"}, "forecast": [],
+                "updated_at": datetime.utcnow() - timedelta(seconds=age_seconds)
+            }, upsert=True)
+            try:
+                first = await cache.get()
+                if cache.refreshing:
+                    await cache.refreshing
+                second = await cache.get()
+                return first, second, cache.stats()
+            finally:
+                await server.db.weather_snapshots.delete_one({"key": cache.key})
+
+        first, second, stats = self.run(check(server.WEATHER_TTL_SECONDS + 60))
+        self.log_test("Stale Weather Served In Outage",
+                      first is not None and first['stale'] and second is not None and second['current']['condition'] == "Overcast",
+                      f"first {first}, second {second}")
+        self.log_test("Weather Outage Counted", stats['upstream_errors'] >= 1 and stats['stale_served'] >= 1, f"stats {stats}")
+
+        first, _, _ = self.run(check(server.WEATHER_MAX_STALE_SECONDS + 60))
+        self.log_test("Expired Weather Not Served", first is None, f"weather {first}")
+
+    def run_all_tests(self):
+        """Run all weather tests"""
+        print("🚀 Starting Growing Together Weather Tests")
+        print("=" * 50)
+
+        if not self.test_admin_login():
+            print("❌ Admin login failed. Stopping tests.")
+            return False
+        if not self.test_member_login():
+            print("❌ Member login failed. Stopping tests.")
+            return False
+
+        self.test_stub_weather()
+        self.test_weather_shared_cache()
+        self.test_diary_entry_weather()
+        self.test_stale_snapshot_served()
+
+        print("\n" + "=" * 50)
+        print(f"📊 Test Summary: {self.tests_passed}/{self.tests_run} tests passed")
+        if self.failed_tests:
+            print("\n❌ Failed Tests:")
+            for test in self.failed_tests:
+                print(f"  - {test['test']}: {test['error']}")
+        return not self.failed_tests
+
+def main():
+    tester = WeatherAPITester()
+    success = tester.run_all_tests()
+    return 0 if success else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
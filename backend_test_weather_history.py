@@ -0,0 +1,147 @@
+import requests
+import os
+import sys
+import uuid
+from datetime import datetime, timedelta
+
+# Checks for the hourly weather history: season summaries, diary date annotations and the history endpoint.
+# Start the server with WEATHER_PROVIDER=stub, and run this from an environment that can import backend/server.py:
+# the summary checks feed a WeatherHistory known observations directly.
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+import server
+
+class WeatherHistoryAPITester:
+    def __init__(self, base_url=os.environ.get("BASE_URL", "http://localhost:8001")):
+        self.base_url = base_url
+        self.api_url = f"{base_url}/api"
+        self.admin_token = None
+        self.tests_run = 0
+        self.tests_passed = 0
+        self.failed_tests = []
+
+    def log_test(self, name, success, details=""):
+        """Log test results"""
+        self.tests_run += 1
+        if success:
+            self.tests_passed += 1
+            print(f"✅ {name} - PASSED")
+        else:
+            print(f"❌ {name} - FAILED: {details}")
+            self.failed_tests.append({"test": name, "error": details})
+
+    def make_request(self, method, endpoint, data=None, use_admin=True):
+        """Make API request with proper headers"""
+        url = f"{self.api_url}/{endpoint}"
+        headers = {'Content-Type': 'application/json'}
+        token = self.admin_token
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        try:
+            response = requests.request(method, url, json=data, headers=headers, timeout=30)
+            return response, None
+        except requests.exceptions.RequestException as e:
+            return None, str(e)
+
+    def test_admin_login(self):
+        """Admin login"""
+        response, error = self.make_request('POST', 'auth/login', {
+            'email': 'admin@staffordallotment.com',
+            'password': 'admin123'
+        })
+        success = not error and response.status_code == 200
+        if success:
+            self.admin_token = response.json()['token']
+        self.log_test("Admin Login", success, error or (response.text if response is not None else ""))
+        return success
+
+    def observations(self, day, temperatures, rain_per_hour=0.0):
+        return [{"time": day + timedelta(hours=hour), "temperature": temperature, "precipitation": rain_per_hour}
+                for hour, temperature in enumerate(temperatures)]
+
+    def test_epoch_round_trip(self):
+        """Epoch seconds convert back to the same naive UTC time"""
+        moment = datetime(2031, 3, 28, 1, 30)
+        back = server.from_epoch_seconds(server.epoch_seconds(moment))
+        self.log_test("Epoch Seconds Round Trip", back == moment and back.tzinfo is None, f"got {back!r}")
+
+    def test_season_summary(self):
+        """Daily extremes, growing degree days, frosts and rainfall come out of the hourly columns"""
+        history = server.WeatherHistory()
+        added = history.extend(
+            self.observations(datetime(2031, 4, 10), [-2.0, 6.0], rain_per_hour=1.5)
+            + self.observations(datetime(2031, 6, 1), [12.0, 20.0])
+            + self.observations(datetime(2031, 10, 20), [-1.0, 9.0], rain_per_hour=0.5)
+        )
+        summary = history.summary(2031, 10.0)
+        self.log_test("History Observations Added", added == 6 and summary['days_recorded'] == 3, f"added {added}, summary {summary}")
+        # Only 1 June averages above the base: (12 + 20) / 2 - 10
+        self.log_test("History Growing Degree Days", summary['growing_degree_days'] == 6.0, f"gdd {summary['growing_degree_days']}")
+        self.log_test("History Frost Dates",
+                      summary['frost_days'] == 2 and summary['last_spring_frost'] == "2031-04-10" and summary['first_autumn_frost'] == "2031-10-20",
+                      f"summary {summary}")
+        self.log_test("History Rainfall",
+                      summary['rainfall_mm'] == 4.0 and summary['monthly_rainfall_mm'][3] == 3.0 and summary['monthly_rainfall_mm'][9] == 1.0,
+                      f"rainfall {summary['rainfall_mm']}, monthly {summary['monthly_rainfall_mm']}")
+
+        contexts = history.annotate([datetime(2031, 6, 1, 14), datetime(2031, 6, 2)])
+        self.log_test("History Annotates Dates",
+                      contexts[0] == {"min_temperature": 12.0, "max_temperature": 20.0, "rainfall_mm": 0.0, "frost": False, "gdd_to_date": 6.0}
+                      and contexts[1] is None, f"contexts {contexts}")
+
+    def test_extend_only_appends_newer(self):
+        """Hours already held are skipped, and a season's cached aggregates are redone once it gains hours"""
+        history = server.WeatherHistory()
+        history.extend(self.observations(datetime(2031, 5, 1), [8.0, 14.0]))
+        before = history.summary(2031, 10.0)
+        repeated = history.extend(self.observations(datetime(2031, 5, 1), [30.0, 30.0]))
+        added = history.extend(list(reversed(self.observations(datetime(2031, 5, 2), [16.0, 24.0]))))
+        after = history.summary(2031, 10.0)
+        self.log_test("History Skips Known Hours", repeated == 0 and before['max_temperature'] == 14.0, f"repeated {repeated}")
+        self.log_test("History Sorts New Hours", added == 2 and list(history.times) == sorted(history.times), f"added {added}")
+        self.log_test("History Season Recomputed", after['days_recorded'] == 2 and after['growing_degree_days'] == 11.0, f"summary {after}")
+
+    def test_history_endpoint(self):
+        """The API summarises the recorded season and validates its parameters"""
+        response, error = self.make_request('GET', 'weather/history')
+        if error or response.status_code != 200:
+            self.log_test("Weather History Endpoint", False, error or response.text)
+            return
+        summary = response.json()
+        self.log_test("Weather History Endpoint", summary['season'] == datetime.utcnow().year and summary['gdd_base'] == server.WEATHER_GDD_BASE
+                      and len(summary['monthly_rainfall_mm']) == 12, f"summary {summary}")
+        empty, _ = self.make_request('GET', 'weather/history?season=1990')
+        self.log_test("Weather History Empty Season", empty.json()['days_recorded'] == 0 and empty.json()['first_day'] is None,
+                      f"summary {empty.json()}")
+        invalid, _ = self.make_request('GET', 'weather/history?base=35')
+        self.log_test("Weather History Base Validated", invalid.status_code == 422, f"Status: {invalid.status_code}")
+
+    def run_all_tests(self):
+        """Run all weather history tests"""
+        print("🚀 Starting Growing Together Weather History Tests")
+        print("=" * 50)
+
+        if not self.test_admin_login():
+            print("❌ Admin login failed. Stopping tests.")
+            return False
+
+        self.test_epoch_round_trip()
+        self.test_season_summary()
+        self.test_extend_only_appends_newer()
+        self.test_history_endpoint()
+
+        print("\n" + "=" * 50)
+        print(f"📊 Test Summary: {self.tests_passed}/{self.tests_run} tests passed")
+        if self.failed_tests:
+            print("\n❌ Failed Tests:")
+            for test in self.failed_tests:
+                print(f"  - {test['test']}: {test['error']}")
+        return not self.failed_tests
+
+def main():
+    tester = WeatherHistoryAPITester()
+    success = tester.run_all_tests()
+    return 0 if success else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
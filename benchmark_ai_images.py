@@ -0,0 +1,74 @@
+import requests
+import base64
+import os
+import sys
+import time
+from io import BytesIO
+from PIL import Image, ImageFilter
+
+# Benchmark photo preprocessing and end-to-end AI advice latency by input size.
+# Run from an environment that can import backend/server.py; point BASE_URL at a
+# server started with AI_BACKEND=fake to isolate upload + preprocessing cost.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+from server import preprocess_photo
+
+base_url = os.environ.get("BASE_URL", "https://harvest-hub-64.preview.emergentagent.com")
+api_url = f"{base_url}/api"
+sizes = [(640, 480), (1280, 960), (2048, 1536), (4032, 3024)]
+runs = 5
+
+
+def make_photo(width, height):
+    """A photo-like JPEG: smooth gradients plus fine detail, with an EXIF block like a phone adds"""
+    image = Image.radial_gradient("L").resize((width, height)).convert("RGB")
+    noise = Image.effect_noise((width, height), 40).convert("RGB").filter(ImageFilter.GaussianBlur(1))
+    image = Image.blend(image, noise, 0.3)
+    exif = Image.Exif()
+    exif[0x0112] = 1  # orientation
+    exif[0x010F] = "Benchmark Phone"
+    output = BytesIO()
+    image.save(output, format="JPEG", quality=92, exif=exif)
+    return base64.b64encode(output.getvalue()).decode("ascii")
+
+
+print(f"{'input':>11} {'in KB':>8} {'out KB':>8} {'preprocess ms':>14}")
+photos = {}
+for width, height in sizes:
+    photo = make_photo(width, height)
+    photos[(width, height)] = photo
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        processed = preprocess_photo(photo)
+        timings.append((time.perf_counter() - start) * 1000)
+    print(f"{width:>5}x{height:<5} {len(photo) * 3 / 4 / 1024:>8.0f} {len(processed) * 3 / 4 / 1024:>8.0f} {sorted(timings)[runs // 2]:>14.1f}")
+
+# End-to-end latency through the API
+login_response = requests.post(f"{api_url}/auth/login", json={
+    'email': 'admin@staffordallotment.com',
+    'password': 'admin123'
+})
+
+if login_response.status_code == 200:
+    token = login_response.json()['token']
+    headers = {'Authorization': f'Bearer {token}'}
+
+    print(f"\n{'input':>11} {'median s':>9} {'max s':>7}")
+    for (width, height), photo in photos.items():
+        durations = []
+        for run in range(runs):
+            start_time = time.time()
+            # A distinct question per run so the advice cache doesn't answer it
+            response = requests.post(f"{api_url}/plants/ai-advice", json={
+                'plant_name': 'Tomatoes',
+                'question': f'Benchmark {width}x{height} run {run} {time.time()}: what is wrong with these leaves?',
+                'photo_base64': photo
+            }, headers=headers, timeout=120)
+            durations.append(time.time() - start_time)
+            if response.status_code != 200:
+                print(f"❌ {width}x{height} - FAILED: {response.text}")
+                break
+        durations.sort()
+        print(f"{width:>5}x{height:<5} {durations[len(durations) // 2]:>9.2f} {durations[-1]:>7.2f}")
+else:
+    print("Failed to login as admin")
@@ -0,0 +1,99 @@
+import requests
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+# Compare JSON and MessagePack list responses: payload size and server-side encode time,
+# then end-to-end fetch time against a running server. Run from an environment that can
+# import backend/server.py (MONGO_URL and DB_NAME set).
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+from server import DiaryEntryView, CommunityPostView, NegotiatedResponse
+
+base_url = os.environ.get("BASE_URL", "http://localhost:8001")
+api_url = f"{base_url}/api"
+sizes = [100, 1000]
+runs = 20
+
+
+class FakeRequest:
+    def __init__(self, accept):
+        self.headers = {"accept": accept}
+
+
+def make_diary(count):
+    now = datetime.utcnow()
+    return [DiaryEntryView(
+        user_id=str(uuid.uuid4()),
+        plot_number=str(i % 20 + 1),
+        entry_type=["sowing", "watering", "harvest", "maintenance"][i % 4],
+        title=f"Bed {i % 7} update",
+        content="Earthed up the potatoes and watered the brassicas after a dry week. " * 3,
+        date=now - timedelta(hours=i),
+        weather="Partly Cloudy, 18°C",
+        tags=["potatoes", "brassicas"],
+        weather_context={"min_temperature": 7.5, "max_temperature": 18.2, "rainfall_mm": 0.4, "frost": False, "gdd_to_date": 812.3}
+    ) for i in range(count)]
+
+
+def make_posts(count):
+    now = datetime.utcnow()
+    return [CommunityPostView(
+        user_id=str(uuid.uuid4()),
+        username=f"member{i % 50}",
+        content="Spare courgette plants by the gate if anyone wants them - help yourselves!",
+        created_at=now - timedelta(minutes=i),
+        comments=[{"id": str(uuid.uuid4()), "username": "neighbour", "content": "Thanks!", "created_at": now}],
+        reaction_counts={"like": i % 9, "helpful": i % 3},
+        my_reactions=["like"] if i % 5 == 0 else []
+    ) for i in range(count)]
+
+
+def median_ms(fn):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return sorted(timings)[runs // 2]
+
+
+print(f"{'list':>6} {'items':>6} {'json KB':>8} {'msgpack KB':>11} {'json ms':>8} {'msgpack ms':>11}")
+for name, factory in [("diary", make_diary), ("posts", make_posts)]:
+    for size in sizes:
+        items = factory(size)
+        json_request = FakeRequest("application/json")
+        msgpack_request = FakeRequest("application/msgpack")
+        json_body = NegotiatedResponse(json_request, items).body
+        msgpack_body = NegotiatedResponse(msgpack_request, items).body
+        json_ms = median_ms(lambda: NegotiatedResponse(json_request, items))
+        msgpack_ms = median_ms(lambda: NegotiatedResponse(msgpack_request, items))
+        print(f"{name:>6} {size:>6} {len(json_body) / 1024:>8.1f} {len(msgpack_body) / 1024:>11.1f} {json_ms:>8.2f} {msgpack_ms:>11.2f}")
+
+# End-to-end through the API
+login_response = requests.post(f"{api_url}/auth/login", json={
+    'email': 'admin@staffordallotment.com',
+    'password': 'admin123'
+})
+
+if login_response.status_code == 200:
+    token = login_response.json()['token']
+    headers = {'Authorization': f'Bearer {token}'}
+
+    print(f"\n{'endpoint':>16} {'json KB':>8} {'msgpack KB':>11} {'json ms':>8} {'msgpack ms':>11}")
+    for endpoint in ["/diary", "/posts", "/plots", "/sync/changes"]:
+        results = {}
+        for accept in ["application/json", "application/msgpack"]:
+            request_headers = {**headers, 'Accept': accept}
+            response = requests.get(f"{api_url}{endpoint}", headers=request_headers)
+            if response.status_code != 200:
+                print(f"❌ {endpoint} - FAILED: {response.text}")
+                break
+            elapsed = median_ms(lambda: requests.get(f"{api_url}{endpoint}", headers=request_headers))
+            results[accept] = (len(response.content) / 1024, elapsed)
+        if len(results) == 2:
+            (json_kb, json_ms), (msgpack_kb, msgpack_ms) = results["application/json"], results["application/msgpack"]
+            print(f"{endpoint:>16} {json_kb:>8.1f} {msgpack_kb:>11.1f} {json_ms:>8.1f} {msgpack_ms:>11.1f}")
+else:
+    print("Failed to login as admin")